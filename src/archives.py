@@ -0,0 +1,475 @@
+""" Module contenant la classe ArchiveArtefacts, rangement des fichiers générés par mois. """
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows : l'archive n'est protégée qu'entre threads
+    fcntl = None
+
+from constants import DOSSIER_PDF, DOSSIER_PNG
+from index_csv import IndexCSV
+from partitions import mois_de
+
+# Nombre de lignes périmées de l'index tolérées avant son compactage
+LIGNES_MIN_COMPACTAGE = 1000
+
+_FORMAT_ANNEE = re.compile(r"^\d{4}$")
+_FORMAT_MOIS = re.compile(r"^\d{2}$")
+# En-tête local d'un membre d'une archive zip (signature, version, options,
+# méthode, heure, date, CRC, tailles, longueurs du nom et du champ extra)
+_EN_TETE_LOCAL = struct.Struct("<4s5H3L2H")
+
+
+def dossier_client(client: str) -> str:
+    """
+    Retourne le sous-dossier d'un client dans un mois : deux caractères
+    hexadécimaux de l'empreinte de son nom normalisé (256 sous-dossiers au
+    plus par mois, quel que soit le nombre de clients).
+    """
+    return hashlib.sha1(IndexCSV.normaliser(client).encode("utf-8")).hexdigest()[:2]
+
+
+class ArchiveArtefacts:
+    """
+    Rangement des fichiers générés (PDF des devis, histogrammes), par mois et
+    par client : dossier/AAAA/MM/<client>/nom. Aucun dossier ne contient ainsi
+    plus que les fichiers d'un mois et d'une fraction des clients.
+
+    Un index (journal JSONL, une ligne par fichier, la dernière l'emporte)
+    associe l'identifiant de chaque fichier (le numéro du devis pour un PDF)
+    à son emplacement : le retrouver ne demande ni parcours de dossier ni
+    ouverture d'archive complète.
+
+    Les mois passés peuvent être empaquetés (empaqueter) dans une archive zip
+    par mois, sans compression (les PDF et PNG sont déjà compressés). L'index
+    retient alors la position du contenu de chaque fichier dans l'archive :
+    la lecture d'un fichier archivé est une seule lecture à cette position.
+    """
+
+    def __init__(self, dossier: str):
+        """
+        Initialise l'archive. L'index n'est lu qu'à la première utilisation.
+
+        Args:
+            dossier (str): Le dossier racine de l'archive.
+        """
+        self.dossier = dossier
+        self.chemin_index = os.path.join(dossier, "index.jsonl")
+        self._verrou = threading.RLock()
+        # Identifiant -> emplacement, et position de lecture du journal
+        self._index = {}
+        self._position_index = (None, 0)
+        self._lignes_index = 0
+
+    def chemin(self, nom: str, date: str = None, client: str = None) -> str:
+        """
+        Retourne le chemin d'un fichier non empaqueté.
+
+        Args:
+            nom (str): Le nom du fichier.
+            date (str, optional): La date du fichier ("AAAA-MM-JJ"), par
+            défaut la date du jour.
+            client (str, optional): Le client du fichier, s'il y en a un.
+
+        Returns:
+            str: dossier/AAAA/MM[/client]/nom.
+        """
+        annee, mois = mois_de(date or datetime.now().strftime("%Y-%m-%d")).split("-")
+        parties = [self.dossier, annee, mois]
+        if client is not None:
+            parties.append(dossier_client(client))
+        return os.path.join(*parties, nom)
+
+    def _verrouiller(self):
+        """Ouvre (et verrouille, entre processus) le verrou de l'archive."""
+        os.makedirs(self.dossier, exist_ok=True)
+        verrou = open(self.chemin_index + ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(verrou, fcntl.LOCK_EX)
+        return verrou
+
+    def _lire_index(self):
+        """Lit les emplacements ajoutés à l'index depuis la dernière lecture."""
+        try:
+            stat = os.stat(self.chemin_index)
+        except FileNotFoundError:
+            self._index, self._position_index = {}, (None, 0)
+            return
+        inode, position = self._position_index
+        if inode != stat.st_ino:
+            # Nouveau fichier (ou index compacté) : relecture complète
+            self._index, position, self._lignes_index = {}, 0, 0
+        if stat.st_size == position:
+            return
+        with open(self.chemin_index, "rb") as fichier:
+            fichier.seek(position)
+            for ligne in fichier:
+                if not ligne.endswith(b"\n"):
+                    break  # ligne en cours d'écriture, relue la prochaine fois
+                position += len(ligne)
+                self._lignes_index += 1
+                emplacement = json.loads(ligne)
+                self._index[emplacement.pop("id")] = emplacement
+        self._position_index = (stat.st_ino, position)
+
+    def _indexer(self, emplacements: dict):
+        """
+        Ajoute des emplacements à l'index (le verrou de l'archive doit être
+        tenu), puis le compacte si la plupart de ses lignes sont périmées.
+        """
+        lignes = "".join(
+            json.dumps({"id": identifiant, **emplacement}) + "\n"
+            for identifiant, emplacement in emplacements.items()
+        )
+        with open(self.chemin_index, "ab", buffering=0) as index:
+            index.write(lignes.encode("utf-8"))
+        self._index.update(emplacements)
+        self._lignes_index += len(emplacements)
+        if self._lignes_index > 2 * len(self._index) + LIGNES_MIN_COMPACTAGE:
+            self._compacter_index()
+
+    def _compacter_index(self):
+        """Réécrit l'index avec une seule ligne par fichier (verrou tenu)."""
+        self._index, self._position_index = {}, (None, 0)
+        self._lire_index()
+        temporaire = f"{self.chemin_index}.{os.getpid()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            for identifiant, emplacement in self._index.items():
+                fichier.write(json.dumps({"id": identifiant, **emplacement}) + "\n")
+        os.replace(temporaire, self.chemin_index)
+        self._position_index = (None, 0)
+
+    def compacter_index(self):
+        """Réécrit l'index avec une seule ligne (la dernière) par fichier."""
+        with self._verrou, self._verrouiller():
+            self._compacter_index()
+
+    def ajouter_fichier(
+        self,
+        identifiant,
+        nom: str,
+        chemin_source: str,
+        date: str = None,
+        client: str = None,
+    ) -> str:
+        """
+        Déplace dans l'archive un fichier déjà écrit (en remplaçant celui de
+        même identifiant) et l'ajoute à l'index. Le fichier source doit être
+        sur le même système de fichiers que l'archive.
+
+        Args:
+            identifiant: L'identifiant du fichier (numéro du devis pour un PDF).
+            nom (str): Le nom du fichier dans l'archive.
+            chemin_source (str): Le chemin du fichier à déplacer.
+            date (str, optional): La date du fichier ("AAAA-MM-JJ"), par
+            défaut la date du jour.
+            client (str, optional): Le client du fichier, s'il y en a un.
+
+        Returns:
+            str: Le chemin du fichier dans l'archive.
+        """
+        chemin = self.chemin(nom, date, client)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with self._verrou, self._verrouiller():
+            # Sous le verrou : le mois ne peut pas être empaqueté entre le
+            # déplacement du fichier et son ajout à l'index
+            os.replace(chemin_source, chemin)
+            self._lire_index()
+            self._indexer(
+                {str(identifiant): {"chemin": os.path.relpath(chemin, self.dossier)}}
+            )
+        return chemin
+
+    def ajouter(
+        self,
+        identifiant,
+        nom: str,
+        contenu: bytes,
+        date: str = None,
+        client: str = None,
+    ) -> str:
+        """
+        Enregistre un fichier (en remplaçant celui de même identifiant) et
+        l'ajoute à l'index (voir ajouter_fichier).
+
+        Args:
+            identifiant: L'identifiant du fichier (numéro du devis pour un PDF).
+            nom (str): Le nom du fichier.
+            contenu (bytes): Le contenu du fichier.
+            date (str, optional): La date du fichier ("AAAA-MM-JJ"), par
+            défaut la date du jour.
+            client (str, optional): Le client du fichier, s'il y en a un.
+
+        Returns:
+            str: Le chemin du fichier.
+        """
+        # Le fichier n'apparaît sous son nom qu'une fois entièrement écrit
+        temporaire = self.temporaire(nom)
+        with open(temporaire, "wb") as fichier:
+            fichier.write(contenu)
+        return self.ajouter_fichier(identifiant, nom, temporaire, date, client)
+
+    def temporaire(self, nom: str) -> str:
+        """
+        Retourne un chemin temporaire (à la racine de l'archive) où écrire un
+        fichier avant de l'ajouter avec ajouter_fichier.
+        """
+        os.makedirs(self.dossier, exist_ok=True)
+        return os.path.join(
+            self.dossier, f"{nom}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+
+    def localiser(self, identifiant) -> dict:
+        """
+        Retourne l'emplacement d'un fichier : {"chemin"} s'il n'est pas
+        empaqueté, sinon {"zip", "nom", "position", "taille"} ; None s'il
+        n'est pas dans l'archive.
+        """
+        with self._verrou:
+            self._lire_index()
+            return self._index.get(str(identifiant))
+
+    def _lire_emplacement(self, emplacement: dict) -> bytes:
+        """Lit le contenu d'un fichier à son emplacement."""
+        if "chemin" in emplacement:
+            with open(
+                os.path.join(self.dossier, emplacement["chemin"]), "rb"
+            ) as fichier:
+                return fichier.read()
+        with open(os.path.join(self.dossier, emplacement["zip"]), "rb") as archive:
+            archive.seek(emplacement["position"])
+            return archive.read(emplacement["taille"])
+
+    def lire(self, identifiant) -> bytes:
+        """
+        Retourne le contenu d'un fichier de l'archive, empaqueté ou non, ou
+        None s'il n'y est pas.
+        """
+        emplacement = self.localiser(identifiant)
+        if emplacement is None:
+            return None
+        try:
+            return self._lire_emplacement(emplacement)
+        except FileNotFoundError:
+            # Fichier empaqueté (ou archive réempaquetée) depuis la dernière
+            # lecture de l'index : son nouvel emplacement y a été ajouté
+            emplacement = self.localiser(identifiant)
+            return self._lire_emplacement(emplacement) if emplacement else None
+
+    def lister_mois(self) -> list:
+        """Retourne les mois ("AAAA-MM") ayant des fichiers non empaquetés."""
+        mois = []
+        if not os.path.isdir(self.dossier):
+            return mois
+        for annee in os.scandir(self.dossier):
+            if not (annee.is_dir() and _FORMAT_ANNEE.match(annee.name)):
+                continue
+            for entree in os.scandir(annee.path):
+                if entree.is_dir() and _FORMAT_MOIS.match(entree.name):
+                    mois.append(f"{annee.name}-{entree.name}")
+        return sorted(mois)
+
+    @staticmethod
+    def _positions_contenus(chemin_zip: str) -> dict:
+        """
+        Retourne, pour chaque membre d'une archive zip non compressée, la
+        position et la taille de son contenu dans le fichier.
+        """
+        positions = {}
+        with zipfile.ZipFile(chemin_zip) as archive, open(chemin_zip, "rb") as brut:
+            for info in archive.infolist():
+                brut.seek(info.header_offset)
+                en_tete = _EN_TETE_LOCAL.unpack(brut.read(_EN_TETE_LOCAL.size))
+                longueur_nom, longueur_extra = en_tete[-2], en_tete[-1]
+                positions[info.filename] = (
+                    info.header_offset
+                    + _EN_TETE_LOCAL.size
+                    + longueur_nom
+                    + longueur_extra,
+                    info.file_size,
+                )
+        return positions
+
+    def _empaqueter_mois(self, mois: str) -> int:
+        """
+        Empaquette les fichiers d'un mois (verrou de l'archive tenu) dans une
+        nouvelle archive zip, avec ceux de ses archives précédentes encore
+        référencés, puis supprime les fichiers et archives remplacés.
+
+        Returns:
+            int: Le nombre de fichiers du mois dans la nouvelle archive.
+        """
+        annee, numero_mois = mois.split("-")
+        prefixe = os.path.join(annee, numero_mois) + os.sep
+        prefixe_zip = os.path.join(annee, numero_mois) + "-"
+        membres = {}
+        for identifiant, emplacement in self._index.items():
+            if emplacement.get("chemin", "").startswith(prefixe):
+                membres[identifiant] = emplacement["chemin"][len(prefixe) :]
+            elif emplacement.get("zip", "").startswith(prefixe_zip):
+                membres[identifiant] = emplacement["nom"]
+        if not membres:
+            return 0
+        anciennes = sorted(
+            nom
+            for nom in os.listdir(os.path.join(self.dossier, annee))
+            if nom.startswith(f"{numero_mois}-") and nom.endswith(".zip")
+        )
+        version = 1 + max(
+            (int(nom[len(numero_mois) + 1 : -4]) for nom in anciennes), default=0
+        )
+        nom_zip = f"{prefixe_zip}{version}.zip"
+        chemin_zip = os.path.join(self.dossier, nom_zip)
+        temporaire = f"{chemin_zip}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(temporaire, "w", zipfile.ZIP_STORED) as archive:
+            for identifiant, nom in membres.items():
+                archive.writestr(nom, self._lire_emplacement(self._index[identifiant]))
+        os.replace(temporaire, chemin_zip)
+        positions = self._positions_contenus(chemin_zip)
+        remplaces = [self._index[identifiant] for identifiant in membres]
+        self._indexer(
+            {
+                identifiant: {
+                    "zip": nom_zip,
+                    "nom": nom,
+                    "position": positions[nom][0],
+                    "taille": positions[nom][1],
+                }
+                for identifiant, nom in membres.items()
+            }
+        )
+        # Les fichiers remplacés ne sont supprimés qu'une fois l'index à jour
+        for emplacement in remplaces:
+            if "chemin" in emplacement:
+                try:
+                    os.remove(os.path.join(self.dossier, emplacement["chemin"]))
+                except FileNotFoundError:
+                    pass
+        for nom in anciennes:
+            os.remove(os.path.join(self.dossier, annee, nom))
+        # Les dossiers vidés sont retirés ; ceux contenant des fichiers absents
+        # de l'index (déposés hors de l'archive) sont conservés
+        for racine, _, _ in os.walk(
+            os.path.join(self.dossier, annee, numero_mois), topdown=False
+        ):
+            try:
+                os.rmdir(racine)
+            except OSError:
+                pass
+        return len(membres)
+
+    def empaqueter(self, avant: str = None) -> dict:
+        """
+        Empaquette les fichiers des mois antérieurs à un mois, une archive
+        zip par mois (dossier/AAAA/MM-<version>.zip).
+
+        Args:
+            avant (str, optional): Le premier mois non empaqueté ("AAAA-MM"),
+            par défaut le mois en cours.
+
+        Returns:
+            dict: Le nombre de fichiers empaquetés par mois.
+        """
+        avant = avant or datetime.now().strftime("%Y-%m")
+        empaquetes = {}
+        with self._verrou, self._verrouiller():
+            self._lire_index()
+            for mois in self.lister_mois():
+                if mois < avant:
+                    empaquetes[mois] = self._empaqueter_mois(mois)
+        return empaquetes
+
+    def ranger(self, analyser) -> int:
+        """
+        Range dans l'archive les fichiers déposés à plat dans son dossier
+        racine (ancienne organisation).
+
+        Args:
+            analyser (callable): Appelée avec le nom d'un fichier, retourne
+            (identifiant, date, client), ou None pour le laisser en place.
+
+        Returns:
+            int: Le nombre de fichiers rangés.
+        """
+        ranges = 0
+        if not os.path.isdir(self.dossier):
+            return ranges
+        for entree in os.scandir(self.dossier):
+            if not entree.is_file():
+                continue
+            analyse = analyser(entree.name)
+            if analyse is None:
+                continue
+            identifiant, date, client = analyse
+            if date is None:
+                # Date inconnue : celle de la dernière modification du fichier
+                date = time.strftime("%Y-%m-%d", time.localtime(entree.stat().st_mtime))
+            self.ajouter_fichier(identifiant, entree.name, entree.path, date, client)
+            ranges += 1
+        return ranges
+
+
+def _date_horodatage(horodatage: str) -> str:
+    """Retourne la date ("AAAA-MM-JJ") d'un horodatage AAAAMMJJHHMMSS, ou None."""
+    if len(horodatage) != 14:
+        return None
+    return f"{horodatage[:4]}-{horodatage[4:6]}-{horodatage[6:8]}"
+
+
+def analyser_nom_pdf(nom: str):
+    """
+    Analyse le nom d'un PDF de devis (devis_<client>_<numéro>.pdf). Les
+    anciens devis sans numéro sont identifiés par l'horodatage de leur PDF,
+    qui en donne aussi la date.
+    """
+    correspondance = re.match(r"^devis_(.*)_(\d+)\.pdf$", nom)
+    if correspondance is None:
+        return None
+    client, numero = correspondance.groups()
+    return numero, _date_horodatage(numero), client
+
+
+def analyser_nom_png(nom: str):
+    """Analyse le nom d'un histogramme (histogram<horodatage>.png)."""
+    correspondance = re.match(r"^(histogram(\d+))\.png$", nom)
+    if correspondance is None:
+        return None
+    identifiant, horodatage = correspondance.groups()
+    return identifiant, _date_horodatage(horodatage), None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Range les PDF des devis et les histogrammes par mois, et "
+        "empaquette les mois passés dans des archives zip."
+    )
+    parser.add_argument(
+        "--avant",
+        help="Premier mois non empaqueté (AAAA-MM, par défaut le mois en cours)",
+    )
+    parser.add_argument(
+        "--ranger",
+        action="store_true",
+        help="Ranger d'abord les fichiers déposés à plat (ancienne organisation)",
+    )
+    arguments = parser.parse_args()
+
+    for dossier, analyser in (
+        (DOSSIER_PDF, analyser_nom_pdf),
+        (DOSSIER_PNG, analyser_nom_png),
+    ):
+        archive = ArchiveArtefacts(dossier)
+        if arguments.ranger:
+            print(f"{dossier} : {archive.ranger(analyser)} fichiers rangés")
+        for mois, nombre in archive.empaqueter(arguments.avant).items():
+            print(f"{dossier} : {mois} empaqueté ({nombre} fichiers)")
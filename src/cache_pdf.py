@@ -0,0 +1,239 @@
+""" Module contenant la classe CachePDF, stockage des PDF adressé par leur contenu. """
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import fcntl
+except ImportError:  # Windows : l'index n'est protégé qu'entre threads
+    fcntl = None
+
+from constants import DOSSIER_CACHE_PDF, TAILLE_MAX_CACHE_PDF
+
+# Nombre de lignes périmées de l'index tolérées avant son compactage
+LIGNES_MIN_COMPACTAGE = 1000
+
+
+class CachePDF:
+    """
+    Stockage des PDF adressé par leur contenu : chaque PDF est enregistré sous
+    l'empreinte (SHA-256) du devis et du client qu'il imprime. Deux demandes
+    d'un même contenu retournent le même fichier, sans nouveau rendu.
+
+    Un index (journal JSONL, une ligne par association, la dernière l'emporte)
+    associe le numéro de chaque devis à l'empreinte de son dernier PDF.
+
+    La taille totale du stockage est bornée : au-delà de taille_max, les PDF
+    les moins récemment utilisés sont supprimés. L'ordre d'utilisation est
+    conservé dans la date de modification des fichiers ; chaque processus
+    n'évince que les fichiers qu'il a vus (parcours du dossier à la première
+    utilisation, puis ses propres ajouts), la borne est donc approximative
+    lorsque plusieurs processus écrivent en même temps.
+    """
+
+    def __init__(
+        self, dossier: str = DOSSIER_CACHE_PDF, taille_max: int = TAILLE_MAX_CACHE_PDF
+    ):
+        """
+        Initialise le stockage. Le dossier n'est parcouru qu'à la première
+        utilisation.
+
+        Args:
+            dossier (str, optional): Le dossier du stockage.
+            taille_max (int, optional): La taille totale maximale, en octets.
+        """
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.chemin_index = os.path.join(dossier, "index.jsonl")
+        self._verrou = threading.RLock()
+        # Empreinte -> taille du PDF, du moins au plus récemment utilisé
+        self._fichiers = None
+        self._taille = 0
+        # Numéro de devis -> empreinte, et position de lecture du journal
+        self._index = {}
+        self._position_index = (None, 0)
+        self._lignes_index = 0
+        self.succes = 0
+        self.echecs = 0
+        self.evictions = 0
+
+    def chemin(self, empreinte: str) -> str:
+        """Retourne le chemin du PDF d'une empreinte (sous-dossier par préfixe)."""
+        return os.path.join(self.dossier, empreinte[:2], empreinte + ".pdf")
+
+    def _parcourir(self):
+        """Charge la liste des PDF du stockage, par date d'utilisation."""
+        fichiers = []
+        if os.path.isdir(self.dossier):
+            for prefixe in os.scandir(self.dossier):
+                if not prefixe.is_dir():
+                    continue
+                for entree in os.scandir(prefixe.path):
+                    if entree.name.endswith(".pdf"):
+                        stat = entree.stat()
+                        fichiers.append((stat.st_mtime, entree.name[:-4], stat.st_size))
+        fichiers.sort()
+        self._fichiers = OrderedDict(
+            (empreinte, taille) for _, empreinte, taille in fichiers
+        )
+        self._taille = sum(self._fichiers.values())
+
+    def lire(self, empreinte: str):
+        """
+        Retourne le chemin du PDF d'une empreinte s'il est dans le stockage
+        (il devient alors le plus récemment utilisé), sinon None.
+        """
+        chemin = self.chemin(empreinte)
+        with self._verrou:
+            if self._fichiers is None:
+                self._parcourir()
+            try:
+                os.utime(chemin)
+            except FileNotFoundError:
+                # Absent, ou évincé par un autre processus
+                self._taille -= self._fichiers.pop(empreinte, 0)
+                self.echecs += 1
+                return None
+            if empreinte not in self._fichiers:
+                self._fichiers[empreinte] = os.path.getsize(chemin)
+                self._taille += self._fichiers[empreinte]
+            self._fichiers.move_to_end(empreinte)
+            self.succes += 1
+            return chemin
+
+    def ajouter(self, empreinte: str, contenu: bytes) -> str:
+        """
+        Enregistre le PDF d'une empreinte (en remplaçant le précédent), puis
+        évince les PDF les moins récemment utilisés si la taille maximale est
+        dépassée.
+
+        Args:
+            empreinte (str): L'empreinte du contenu.
+            contenu (bytes): Le PDF.
+
+        Returns:
+            str: Le chemin du PDF.
+        """
+        chemin = self.chemin(empreinte)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        # Le PDF n'apparaît sous son empreinte qu'une fois entièrement écrit
+        temporaire = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporaire, "wb") as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+        with self._verrou:
+            if self._fichiers is None:
+                self._parcourir()
+            self._taille += len(contenu) - self._fichiers.pop(empreinte, 0)
+            self._fichiers[empreinte] = len(contenu)
+            # Le PDF ajouté n'est jamais évincé, même s'il dépasse à lui seul
+            # la taille maximale
+            while self._taille > self.taille_max and len(self._fichiers) > 1:
+                ancienne, taille = self._fichiers.popitem(last=False)
+                self._taille -= taille
+                try:
+                    os.remove(self.chemin(ancienne))
+                except FileNotFoundError:
+                    pass
+                self.evictions += 1
+        return chemin
+
+    def _verrouiller_index(self):
+        """Ouvre (et verrouille, entre processus) le verrou de l'index."""
+        os.makedirs(self.dossier, exist_ok=True)
+        verrou = open(self.chemin_index + ".lock", "a")
+        if fcntl is not None:
+            fcntl.flock(verrou, fcntl.LOCK_EX)
+        return verrou
+
+    def _lire_index(self):
+        """Lit les associations ajoutées à l'index depuis la dernière lecture."""
+        try:
+            stat = os.stat(self.chemin_index)
+        except FileNotFoundError:
+            self._index, self._position_index = {}, (None, 0)
+            return
+        inode, position = self._position_index
+        if inode != stat.st_ino:
+            # Nouveau fichier (ou index compacté) : relecture complète
+            self._index, position, self._lignes_index = {}, 0, 0
+        if stat.st_size == position:
+            return
+        with open(self.chemin_index, "rb") as fichier:
+            fichier.seek(position)
+            for ligne in fichier:
+                if not ligne.endswith(b"\n"):
+                    break  # ligne en cours d'écriture, relue la prochaine fois
+                position += len(ligne)
+                self._lignes_index += 1
+                association = json.loads(ligne)
+                self._index[association["devis"]] = association["empreinte"]
+        self._position_index = (stat.st_ino, position)
+
+    def empreinte_devis(self, numero) -> str:
+        """Retourne l'empreinte du dernier PDF d'un devis, ou None."""
+        with self._verrou:
+            self._lire_index()
+            return self._index.get(str(numero))
+
+    def chemin_devis(self, numero):
+        """
+        Retourne le chemin du dernier PDF d'un devis s'il est dans le
+        stockage, sinon None.
+        """
+        empreinte = self.empreinte_devis(numero)
+        return self.lire(empreinte) if empreinte else None
+
+    def associer(self, numero, empreinte: str):
+        """
+        Associe un devis à l'empreinte de son PDF dans l'index (rien n'est
+        écrit si l'association est déjà connue).
+        """
+        numero = str(numero)
+        with self._verrou:
+            self._lire_index()
+            if self._index.get(numero) == empreinte:
+                return
+            ligne = json.dumps({"devis": numero, "empreinte": empreinte}) + "\n"
+            with self._verrouiller_index() as verrou:
+                with open(self.chemin_index, "ab", buffering=0) as index:
+                    index.write(ligne.encode("utf-8"))
+                if fcntl is not None:
+                    fcntl.flock(verrou, fcntl.LOCK_UN)
+            self._index[numero] = empreinte
+            # L'index est compacté lorsque la plupart de ses lignes sont périmées
+            if self._lignes_index > 2 * len(self._index) + LIGNES_MIN_COMPACTAGE:
+                self.compacter_index()
+
+    def compacter_index(self):
+        """Réécrit l'index avec une seule ligne (la dernière) par devis."""
+        with self._verrou:
+            with self._verrouiller_index() as verrou:
+                self._index, self._position_index = {}, (None, 0)
+                self._lire_index()
+                temporaire = f"{self.chemin_index}.{os.getpid()}.tmp"
+                with open(temporaire, "w", encoding="utf-8") as fichier:
+                    for numero, empreinte in self._index.items():
+                        fichier.write(
+                            json.dumps({"devis": numero, "empreinte": empreinte}) + "\n"
+                        )
+                os.replace(temporaire, self.chemin_index)
+                self._position_index = (None, 0)
+                if fcntl is not None:
+                    fcntl.flock(verrou, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        """Retourne les statistiques du stockage."""
+        with self._verrou:
+            if self._fichiers is None:
+                self._parcourir()
+            return {
+                "pdf": len(self._fichiers),
+                "taille": self._taille,
+                "taille_max": self.taille_max,
+                "succes": self.succes,
+                "echecs": self.echecs,
+                "evictions": self.evictions,
+            }
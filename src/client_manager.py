@@ -5,13 +5,15 @@ from datetime import datetime
 import flet as ft
 from fpdf import FPDF
 
-from constants import FICHIER_CLIENTS
+from constants import FICHIER_CLIENTS, TAILLE_MAX_JOURNAL_CLIENTS
 from csv_manager import CSVManager
 
 
 class ClientManager:
     """Classe permettant de gérer les clients"""
 
+    EN_TETES = ["Nom", "Adresse", "Code Postal", "Téléphone", "Entreprise"]
+
     def __init__(self, csv_manager: CSVManager):
         """Constructeur de la classe ClientManager"""
         self.csv_manager = csv_manager
@@ -33,27 +35,27 @@ class ClientManager:
             bool: True if the client was added successfully,
             False if a client with the same name already exists.
         """
-        clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
-        # Vérifier si un client avec le même nom existe déjà (comparaison en majuscules)
-        for client in clients:
-            if client["Nom"].upper().strip() == nom.upper().strip():
-                return False
-
-        # Si le nom est unique, on ajoute le client
-        clients.append(
-            {
+        # La vérification et l'ajout se font sous le verrou d'écriture : un
+        # autre processus ne peut pas ajouter le même nom entre les deux
+        with self.csv_manager.verrou_ecriture(FICHIER_CLIENTS):
+            clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
+            # Vérifier si un client avec le même nom existe déjà (comparaison en majuscules)
+            for client in clients:
+                if client["Nom"].upper().strip() == nom.upper().strip():
+                    return False
+
+            # Si le nom est unique, on ajoute le client
+            client = {
                 "Nom": nom.upper(),
                 "Adresse": adresse.upper(),
                 "Code Postal": code_postal,
                 "Téléphone": telephone.replace(" ", ""),
                 "Entreprise": entreprise.replace(" ", "").upper(),
             }
-        )
-        self.csv_manager.write_csv(
-            FICHIER_CLIENTS,
-            clients,
-            en_tetes=["Nom", "Adresse", "Code Postal", "Téléphone", "Entreprise"],
-        )
+            self.csv_manager.journaliser(
+                FICHIER_CLIENTS, "ajout", "Nom", client["Nom"], client
+            )
+        self._compacter_si_necessaire()
         return True
 
     def get_client(self, name: str):
@@ -87,31 +89,32 @@ class ClientManager:
         Avant de modifier, on vérifie que le nouveau nom n'est pas déjà utilisé
         par un autre client (si le nouveau nom diffère de l'ancien).
         """
-        clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
-        # Vérifier que le nouveau nom n'est pas déjà utilisé par un autre client
-        for client in clients:
-            if (
-                client["Nom"].strip() == new_nom.upper().strip()
-                and client["Nom"].strip() != old_name.upper().strip()
-            ):
-                raise Exception("Le nom est déjà pris par un autre client")
-        found = False
-        for client in clients:
-            if client["Nom"].strip() == old_name.strip():
-                client["Nom"] = new_nom.upper()
-                client["Adresse"] = new_adresse.upper()
-                client["Code Postal"] = new_code_postal
-                client["Téléphone"] = new_telephone.replace(" ", "")
-                client["Entreprise"] = new_entreprise.upper()
-                found = True
-                break
-        if not found:
-            raise Exception("Client non trouvé pour modification")
-        self.csv_manager.write_csv(
-            FICHIER_CLIENTS,
-            clients,
-            en_tetes=["Nom", "Adresse", "Code Postal", "Téléphone", "Entreprise"],
-        )
+        # La vérification et la modification se font sous le verrou d'écriture
+        with self.csv_manager.verrou_ecriture(FICHIER_CLIENTS):
+            clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
+            # Vérifier que le nouveau nom n'est pas déjà utilisé par un autre client
+            for client in clients:
+                if (
+                    client["Nom"].strip() == new_nom.upper().strip()
+                    and client["Nom"].strip() != old_name.upper().strip()
+                ):
+                    raise Exception("Le nom est déjà pris par un autre client")
+            found = False
+            for client in clients:
+                if client["Nom"].strip() == old_name.strip():
+                    client["Nom"] = new_nom.upper()
+                    client["Adresse"] = new_adresse.upper()
+                    client["Code Postal"] = new_code_postal
+                    client["Téléphone"] = new_telephone.replace(" ", "")
+                    client["Entreprise"] = new_entreprise.upper()
+                    found = True
+                    break
+            if not found:
+                raise Exception("Client non trouvé pour modification")
+            self.csv_manager.journaliser(
+                FICHIER_CLIENTS, "modification", "Nom", old_name, client
+            )
+        self._compacter_si_necessaire()
 
     def delete_client(self, name: str):
         """
@@ -123,14 +126,23 @@ class ClientManager:
         Raises:
             Exception: If no client is found with the given name.
         """
-        clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
-        new_clients = [
-            client for client in clients if client["Nom"].strip() != name.strip()
-        ]
-        if len(new_clients) == len(clients):
-            raise Exception("Client non trouvé pour suppression")
-        self.csv_manager.write_csv(
-            FICHIER_CLIENTS,
-            new_clients,
-            en_tetes=["Nom", "Adresse", "Code Postal", "Téléphone", "Entreprise"],
-        )
+        with self.csv_manager.verrou_ecriture(FICHIER_CLIENTS):
+            clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
+            new_clients = [
+                client for client in clients if client["Nom"].strip() != name.strip()
+            ]
+            if len(new_clients) == len(clients):
+                raise Exception("Client non trouvé pour suppression")
+            self.csv_manager.journaliser(FICHIER_CLIENTS, "suppression", "Nom", name)
+        self._compacter_si_necessaire()
+
+    def _compacter_si_necessaire(self):
+        """
+        Replie le journal des mutations dans clients.csv lorsqu'il dépasse
+        TAILLE_MAX_JOURNAL_CLIENTS octets.
+        """
+        if (
+            self.csv_manager.taille_journal(FICHIER_CLIENTS)
+            >= TAILLE_MAX_JOURNAL_CLIENTS
+        ):
+            self.csv_manager.compacter(FICHIER_CLIENTS, self.EN_TETES)
@@ -31,3 +31,42 @@ FORME_COEFFICIENT = {
 # =======================
 FICHIER_CLIENTS = "datas/inputs_csv/clients.csv"
 FICHIER_DEVIS = "datas/inputs_csv/devis.csv"
+# Dossier des partitions mensuelles des devis (devis_AAAA-MM.csv)
+DOSSIER_DEVIS = "datas/inputs_csv/devis"
+# Dossier des PDF des devis (générés à la demande)
+DOSSIER_PDF = "datas/outputs_pdf"
+# Dossier des histogrammes des devis
+DOSSIER_PNG = "datas/outputs_png"
+# Stockage des PDF adressé par leur contenu, et sa taille maximale (en octets) :
+# au-delà, les PDF les moins récemment consultés sont supprimés
+DOSSIER_CACHE_PDF = "datas/outputs_pdf/cache"
+TAILLE_MAX_CACHE_PDF = 100 * 1024 * 1024
+# Polices TrueType (Unicode) des PDF, par style ("" : normal, "B" : gras,
+# "I" : italique). Seuls les caractères utilisés sont intégrés à chaque PDF ;
+# si un fichier manque, les PDF utilisent la police Arial intégrée (latin-1)
+POLICES_PDF = {
+    "": "assets/fonts/DejaVuSans.ttf",
+    "B": "assets/fonts/DejaVuSans-Bold.ttf",
+    "I": "assets/fonts/DejaVuSans-Oblique.ttf",
+}
+# Base de données utilisée lorsque le stockage "sqlite" est choisi
+FICHIER_SQLITE = "datas/cutsharp.db"
+# Stockage des données : "csv" (fichiers CSV) ou "sqlite" (base SQLite).
+# Peut être remplacé par la variable d'environnement STOCKAGE.
+STOCKAGE = "csv"
+# Taille (en octets) au-delà de laquelle le journal des clients est replié
+# dans clients.csv
+TAILLE_MAX_JOURNAL_CLIENTS = 64 * 1024
+# Écriture différée des devis : délai maximal (en secondes) avant l'écriture
+# groupée des devis en attente, et forçage sur le disque (fsync) de chaque lot
+INTERVALLE_ECRITURE_DEVIS = 0.5
+FSYNC_DEVIS = True
+# Nombre de calculs de devis gardés en cache par l'application (0 : pas de cache)
+TAILLE_CACHE_DEVIS = 1024
+# Dernier numéro de devis réservé, et nombre de numéros réservés à la fois
+# par chaque processus
+FICHIER_COMPTEUR_DEVIS = "datas/inputs_csv/devis.compteur"
+TAILLE_BLOC_NUMEROS = 20
+# Nombre de devis traités en parallèle par le pipeline de l'application
+# (chiffrage, enregistrement et génération du PDF)
+TRAVAILLEURS_PIPELINE_DEVIS = 2
@@ -1,16 +1,234 @@
-""" Module CSVManager"""
+""" Module CSVManager """
 
 import csv
+import io
+import json
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : les écritures ne sont verrouillées qu'entre threads
+    fcntl = None
+
+from index_csv import IndexCSV
+from schemas import migrer_fichier, schema_pour
+
+# Nombre de lectures tentées tant que le fichier (ou son journal) change pendant
+# la lecture
+TENTATIVES_LECTURE = 3
 
 
 class CSVManager:
+    """
+    Lecture et écriture des fichiers CSV, utilisable depuis plusieurs threads
+    et plusieurs processus.
+
+    Les écritures d'un même fichier sont exclusives : verrou entre threads et
+    verrou fcntl sur "<csv>.lock" entre processus. Les réécritures complètes
+    passent par un fichier temporaire qui remplace l'original en une seule
+    opération : les lectures ne prennent aucun verrou et voient toujours soit
+    l'ancien, soit le nouveau contenu.
+    """
+
     def __init__(self):
-        pass
+        # Cache des fichiers déjà lus : chemin -> (empreinte, en-têtes, lignes)
+        self._cache = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Enregistrements typés : (chemin, type) -> (empreinte, en-têtes, enregistrements)
+        self._enregistrements = {}
+        # Index des positions de lignes : chemin -> IndexCSV
+        self._index = {}
+        # Verrous des écritures entre threads, un par fichier (le dictionnaire
+        # est protégé par un verrou tenu le temps d'une recherche), et fichiers
+        # dont le verrou fcntl est tenu par ce processus
+        self._verrou = threading.Lock()
+        self._verrous = {}
+        self._verrous_fichiers = set()
+
+    def _verrou_fichier(self, file_path: str) -> threading.RLock:
+        """Retourne le verrou des écritures d'un fichier entre threads."""
+        with self._verrou:
+            verrou = self._verrous.get(file_path)
+            if verrou is None:
+                verrou = self._verrous[file_path] = threading.RLock()
+            return verrou
+
+    @contextmanager
+    def _verrou_ecriture(self, file_path: str):
+        """
+        Verrou exclusif des écritures d'un fichier CSV, entre threads et entre
+        processus. Réentrant : une écriture peut en appeler une autre. Les
+        écritures de fichiers différents ne s'attendent pas.
+        """
+        with self._verrou_fichier(file_path):
+            # Seul le thread qui tient le verrou du fichier peut l'y avoir ajouté
+            if fcntl is None or file_path in self._verrous_fichiers:
+                yield
+                return
+            if os.path.dirname(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path + ".lock", "a") as verrou:
+                fcntl.flock(verrou, fcntl.LOCK_EX)
+                self._verrous_fichiers.add(file_path)
+                try:
+                    yield
+                finally:
+                    self._verrous_fichiers.discard(file_path)
+                    fcntl.flock(verrou, fcntl.LOCK_UN)
+
+    def verrou_ecriture(self, file_path: str):
+        """
+        Verrou des écritures d'un fichier, à tenir autour d'une lecture suivie
+        d'une écriture qui en dépend (ex. vérifier qu'un nom est libre, puis
+        ajouter le client) : aucun autre thread ni processus ne peut écrire
+        dans le fichier entre les deux.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+
+        Returns:
+            Un gestionnaire de contexte (réentrant).
+        """
+        return self._verrou_ecriture(file_path)
+
+    @staticmethod
+    def _remplacer(chemin_fichier: str, en_tetes, donnees: list):
+        """
+        Écrit le contenu complet d'un fichier CSV dans un fichier temporaire du
+        même dossier, forcé sur le disque, qui remplace ensuite l'original en
+        une seule opération (os.replace).
+        """
+        dossier = os.path.dirname(chemin_fichier) or "."
+        descripteur, chemin_temporaire = tempfile.mkstemp(
+            dir=dossier, prefix=os.path.basename(chemin_fichier) + ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descripteur, "w", newline="", encoding="utf-8") as fichier:
+                ecrivain = csv.DictWriter(fichier, fieldnames=en_tetes)
+                ecrivain.writeheader()
+                ecrivain.writerows(donnees)
+                fichier.flush()
+                os.fsync(fichier.fileno())
+            if os.path.exists(chemin_fichier):
+                shutil.copymode(chemin_fichier, chemin_temporaire)
+            else:
+                os.chmod(chemin_temporaire, 0o644)
+            os.replace(chemin_temporaire, chemin_fichier)
+        except BaseException:
+            if os.path.exists(chemin_temporaire):
+                os.remove(chemin_temporaire)
+            raise
+
+    @staticmethod
+    def _stat(file_path: str):
+        """Retourne (mtime, taille) d'un fichier, ou None s'il n'existe pas."""
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def _chemin_journal(file_path: str) -> str:
+        """Retourne le chemin du journal des mutations associé à un fichier CSV."""
+        return file_path + ".journal"
+
+    def _empreinte(self, file_path: str):
+        """
+        Retourne l'empreinte d'un fichier CSV et de son journal, ou None si
+        aucun des deux n'existe. Sert à savoir si le fichier a été modifié
+        depuis sa mise en cache.
+        """
+        fichier = self._stat(file_path)
+        journal = self._stat(self._chemin_journal(file_path))
+        if fichier is None and journal is None:
+            return None
+        return (fichier, journal)
+
+    def _lignes_en_cache(self, file_path: str):
+        """
+        Retourne (en-têtes, lignes) en cache pour un fichier s'ils sont encore
+        valides, sinon None.
+        """
+        entree = self._cache.get(file_path)
+        if entree is None:
+            return None
+        empreinte, en_tetes, lignes = entree
+        if empreinte != self._empreinte(file_path):
+            self._cache.pop(file_path, None)
+            return None
+        return en_tetes, lignes
+
+    @staticmethod
+    def _lecteur(fichier, file_path: str) -> csv.DictReader:
+        """
+        Retourne un csv.DictReader dont les en-têtes sont réconciliés avec le
+        schéma du fichier (les anciens noms de colonnes sont remplacés par
+        les noms canoniques).
+        """
+        lecteur = csv.DictReader(fichier)
+        schema = schema_pour(file_path)
+        if schema is not None and lecteur.fieldnames:
+            lecteur.fieldnames = schema.reconcilier(lecteur.fieldnames)
+        return lecteur
+
+    @staticmethod
+    def _en_tetes_fichier(file_path: str) -> list:
+        """Retourne les en-têtes (réconciliés avec le schéma) d'un fichier CSV."""
+        with open(file_path, "r", newline="", encoding="utf-8") as fichier:
+            en_tetes = next(csv.reader(fichier), [])
+        schema = schema_pour(file_path)
+        return schema.reconcilier(en_tetes) if schema is not None else en_tetes
+
+    @staticmethod
+    def _ligne_texte(ligne: dict, en_tetes) -> dict:
+        """Convertit une ligne écrite en la ligne que csv.DictReader relirait."""
+        return {
+            cle: "" if ligne.get(cle) is None else str(ligne.get(cle))
+            for cle in en_tetes
+        }
+
+    def cache_stats(self) -> dict:
+        """
+        Retourne les compteurs du cache de lecture.
+
+        Returns:
+            dict: Le nombre de lectures servies depuis le cache ("hits"),
+            le nombre de lectures ayant nécessité un parsing ("misses")
+            et le nombre de fichiers en cache ("fichiers").
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "fichiers": len(self._cache),
+        }
+
+    def invalider_cache(self, file_path: str = None):
+        """
+        Vide le cache pour un fichier donné, ou pour tous les fichiers.
+
+        Args:
+            file_path (str, optional): Le fichier à retirer du cache.
+            Si None, tout le cache est vidé.
+        """
+        if file_path is None:
+            self._cache.clear()
+            self._enregistrements.clear()
+        else:
+            self._cache.pop(file_path, None)
+            for cle in [cle for cle in self._enregistrements if cle[0] == file_path]:
+                del self._enregistrements[cle]
 
     def read_csv(self, file_path: str):
         """
         Reads a CSV file and returns its contents as a list of dictionaries.
+        The parsed rows are cached in memory and reused as long as the file's
+        mtime and size are unchanged.
 
         Args:
             file_path (str): The path to the CSV file.
@@ -19,16 +237,356 @@ class CSVManager:
             list: A list of dictionaries representing the rows in the CSV file.
                   Returns an empty list if the file does not exist.
         """
-        if not os.path.exists(file_path):
+        # Copie des lignes : les appelants peuvent modifier la liste retournée
+        return [dict(ligne) for ligne in self._charger(file_path)[1]]
+
+    def _charger(self, file_path: str):
+        """
+        Retourne (en-têtes, lignes) d'un fichier CSV depuis le cache, en le
+        lisant (et en rejouant son journal) s'il n'est pas en cache ou périmé.
+        Les lignes retournées sont celles du cache : elles ne doivent pas être
+        modifiées.
+        """
+        en_cache = self._lignes_en_cache(file_path)
+        if en_cache is not None:
+            self.cache_hits += 1
+            return en_cache
+        self.cache_misses += 1
+        # Lecture sans verrou : si le fichier ou son journal change pendant la
+        # lecture (réécriture, compaction), la lecture est recommencée
+        rows, fieldnames = [], []
+        for _ in range(TENTATIVES_LECTURE):
+            empreinte = self._empreinte(file_path)
+            if empreinte is None:
+                return [], []
+            try:
+                rows, fieldnames = [], []
+                if empreinte[0] is not None:
+                    with open(file_path, "r", newline="", encoding="utf-8") as fichier:
+                        lecteur = self._lecteur(fichier, file_path)
+                        rows = list(lecteur)
+                        fieldnames = lecteur.fieldnames or []
+                if empreinte[1] is not None:
+                    rows = self._rejouer(rows, self._lire_journal(file_path))
+            except FileNotFoundError:
+                continue
+            if self._empreinte(file_path) == empreinte:
+                break
+        self._cache[file_path] = (empreinte, fieldnames, rows)
+        return fieldnames, rows
+
+    def _enregistrements_en_cache(self, file_path: str, type_enregistrement):
+        """
+        Retourne les enregistrements typés en cache pour un fichier s'ils sont
+        encore valides, sinon None.
+        """
+        cle = (file_path, type_enregistrement)
+        entree = self._enregistrements.get(cle)
+        if entree is None:
+            return None
+        if entree[0] != self._empreinte(file_path):
+            self._enregistrements.pop(cle, None)
+            return None
+        return entree[2]
+
+    def lire_enregistrements(self, file_path: str, type_enregistrement) -> list:
+        """
+        Retourne le contenu d'un fichier CSV sous forme d'enregistrements typés
+        (Client, Devis), convertis une seule fois puis gardés en cache.
+        Seuls les enregistrements sont gardés en mémoire, pas les lignes texte.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+            type_enregistrement (type): La classe des enregistrements, qui doit
+            fournir une méthode de classe depuis_ligne(ligne).
+
+        Returns:
+            list: Les enregistrements. La liste est partagée avec le cache :
+            elle et ses éléments ne doivent pas être modifiés.
+        """
+        enregistrements = self._enregistrements_en_cache(file_path, type_enregistrement)
+        if enregistrements is not None:
+            self.cache_hits += 1
+            return enregistrements
+        empreinte = self._empreinte(file_path)
+        if empreinte is None:
             return []
+        en_cache = self._lignes_en_cache(file_path)
+        if en_cache is not None or empreinte[1] is not None:
+            # Lignes déjà en mémoire, ou journal à rejouer sur tout le fichier
+            en_tetes, lignes = en_cache or self._charger(file_path)
+            enregistrements = [
+                type_enregistrement.depuis_ligne(ligne) for ligne in lignes
+            ]
+        else:
+            self.cache_misses += 1
+            with open(file_path, "r", newline="", encoding="utf-8") as fichier:
+                lecteur = self._lecteur(fichier, file_path)
+                enregistrements = [
+                    type_enregistrement.depuis_ligne(ligne) for ligne in lecteur
+                ]
+                en_tetes = lecteur.fieldnames or []
+        self._enregistrements[(file_path, type_enregistrement)] = (
+            empreinte,
+            list(en_tetes),
+            enregistrements,
+        )
+        return enregistrements
+
+    def iter_enregistrements(self, file_path: str, type_enregistrement, filtre=None):
+        """
+        Parcourt un fichier CSV sous forme d'enregistrements typés.
+
+        Les enregistrements déjà en cache sont réutilisés ; sinon le fichier est
+        lu en flux, et les enregistrements sont gardés en cache (comme par
+        lire_enregistrements) si le parcours va jusqu'au bout du fichier.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+            type_enregistrement (type): La classe des enregistrements.
+            filtre (callable, optional): Prédicat appliqué à chaque enregistrement.
+
+        Yields:
+            Les enregistrements retenus.
+        """
+        enregistrements = self._enregistrements_en_cache(file_path, type_enregistrement)
+        if enregistrements is None:
+            empreinte = self._empreinte(file_path)
+            if empreinte is None:
+                return
+            if self._lignes_en_cache(file_path) is not None or empreinte[1] is not None:
+                # Lignes déjà en mémoire, ou journal à rejouer sur tout le fichier
+                enregistrements = self.lire_enregistrements(
+                    file_path, type_enregistrement
+                )
+            else:
+                yield from self._lire_enregistrements_en_flux(
+                    file_path, type_enregistrement, filtre, empreinte
+                )
+                return
+        else:
+            self.cache_hits += 1
+        for enregistrement in enregistrements:
+            if filtre is None or filtre(enregistrement):
+                yield enregistrement
+
+    def _lire_enregistrements_en_flux(
+        self, file_path: str, type_enregistrement, filtre, empreinte
+    ):
+        """
+        Lit un fichier CSV en flux sous forme d'enregistrements typés, et les
+        met en cache une fois le fichier lu entièrement, s'il n'a pas changé
+        pendant la lecture.
+        """
+        self.cache_misses += 1
+        lus = []
         with open(file_path, "r", newline="", encoding="utf-8") as fichier:
-            lecteur = csv.DictReader(fichier)
-            rows = list(lecteur)
-            return rows
+            lecteur = self._lecteur(fichier, file_path)
+            for ligne in lecteur:
+                enregistrement = type_enregistrement.depuis_ligne(ligne)
+                lus.append(enregistrement)
+                if filtre is None or filtre(enregistrement):
+                    yield enregistrement
+            en_tetes = lecteur.fieldnames or []
+        if self._empreinte(file_path) == empreinte:
+            self._enregistrements[(file_path, type_enregistrement)] = (
+                empreinte,
+                list(en_tetes),
+                lus,
+            )
+
+    def iter_csv(
+        self,
+        file_path: str,
+        filtre=None,
+        colonnes: list = None,
+        limite: int = None,
+    ):
+        """
+        Parcourt un fichier CSV ligne par ligne sans le charger entièrement
+        en mémoire.
+
+        Si le fichier est déjà en cache (et à jour), les lignes sont lues depuis
+        le cache ; sinon elles sont lues directement depuis le fichier.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+            filtre (callable, optional): Prédicat appliqué à chaque ligne complète ;
+            seules les lignes pour lesquelles il retourne True sont produites.
+            colonnes (list, optional): Les colonnes à conserver dans les lignes
+            produites. Par défaut, toutes les colonnes.
+            limite (int, optional): Le nombre maximal de lignes à produire.
+
+        Yields:
+            dict: Les lignes retenues, restreintes aux colonnes demandées.
+        """
+        if limite is not None and limite <= 0:
+            return
+        en_cache = self._lignes_en_cache(file_path)
+        if en_cache is None and self._stat(self._chemin_journal(file_path)):
+            # Un journal doit être rejoué sur tout le fichier : lecture complète
+            self.read_csv(file_path)
+            en_cache = self._lignes_en_cache(file_path)
+        if en_cache is not None:
+            self.cache_hits += 1
+            lignes = iter(en_cache[1])
+            fichier = None
+        elif os.path.exists(file_path):
+            self.cache_misses += 1
+            fichier = open(file_path, "r", newline="", encoding="utf-8")
+            if filtre is None and colonnes is not None:
+                # Projection sans filtre : accès aux colonnes par position
+                lignes = self._projeter(fichier, file_path, colonnes)
+            else:
+                lignes = self._lecteur(fichier, file_path)
+        else:
+            return
+        try:
+            produites = 0
+            for ligne in lignes:
+                if filtre is not None and not filtre(ligne):
+                    continue
+                if colonnes is None:
+                    yield dict(ligne)
+                else:
+                    yield {colonne: ligne.get(colonne) for colonne in colonnes}
+                produites += 1
+                if limite is not None and produites >= limite:
+                    return
+        finally:
+            if fichier is not None:
+                fichier.close()
+
+    def _projeter(self, fichier, file_path: str, colonnes: list):
+        """
+        Parcourt un fichier CSV ouvert et produit, pour chaque ligne, un
+        dictionnaire restreint aux colonnes demandées. Les positions des
+        colonnes sont calculées une seule fois à partir de l'en-tête.
+        """
+        lecteur = csv.reader(fichier)
+        en_tetes = next(lecteur, None)
+        if en_tetes is None:
+            return
+        schema = schema_pour(file_path)
+        if schema is not None:
+            en_tetes = schema.reconcilier(en_tetes)
+        positions = [
+            (colonne, en_tetes.index(colonne) if colonne in en_tetes else None)
+            for colonne in colonnes
+        ]
+        for valeurs in lecteur:
+            if not valeurs:
+                continue
+            yield {
+                colonne: valeurs[i] if i is not None and i < len(valeurs) else None
+                for colonne, i in positions
+            }
+
+    def existe(self, file_path: str) -> bool:
+        """Indique si un fichier CSV (ou son journal) existe."""
+        return self._empreinte(file_path) is not None
+
+    def lister_fichiers(self, dossier: str) -> list:
+        """
+        Retourne les chemins des fichiers CSV d'un dossier, triés par nom.
+
+        Args:
+            dossier (str): Le dossier à parcourir.
+
+        Returns:
+            list: Les chemins des fichiers CSV (liste vide si le dossier n'existe pas).
+        """
+        if not os.path.isdir(dossier):
+            return []
+        return sorted(
+            os.path.join(dossier, nom)
+            for nom in os.listdir(dossier)
+            if nom.endswith(".csv")
+        )
+
+    def renommer(self, file_path: str, nouveau_chemin: str):
+        """
+        Renomme un fichier CSV. Son index éventuel est supprimé, il sera
+        reconstruit à la demande.
+
+        Args:
+            file_path (str): Le chemin actuel du fichier.
+            nouveau_chemin (str): Le nouveau chemin du fichier.
+        """
+        with self._verrou_ecriture(file_path):
+            os.replace(file_path, nouveau_chemin)
+            if os.path.exists(self._chemin_journal(file_path)):
+                os.replace(
+                    self._chemin_journal(file_path),
+                    self._chemin_journal(nouveau_chemin),
+                )
+            if os.path.exists(file_path + ".idx"):
+                os.remove(file_path + ".idx")
+            self._index.pop(file_path, None)
+            self.invalider_cache(file_path)
+
+    def _reinitialiser_index(self, file_path: str):
+        """
+        Supprime l'index persistant d'un fichier qui vient d'être réécrit : les
+        positions des lignes ont changé, l'index sera reconstruit à la demande.
+        """
+        if os.path.exists(file_path + ".idx"):
+            os.remove(file_path + ".idx")
+        if file_path in self._index:
+            self._index[file_path] = IndexCSV(file_path, self._index[file_path].colonne)
+
+    def enregistrer_index(self, file_path: str, colonne: str):
+        """
+        Déclare un index persistant sur une colonne d'un fichier CSV.
+        L'index est complété à chaque ajout par ajouter_csv et reconstruit
+        automatiquement s'il est périmé.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+            colonne (str): La colonne à indexer (ex. "Nom Client").
+        """
+        index = self._index.get(file_path)
+        if index is None or index.colonne != colonne:
+            self._index[file_path] = IndexCSV(file_path, colonne)
+
+    def lire_par_cle(self, file_path: str, colonne: str, valeur: str) -> list:
+        """
+        Retourne les lignes d'un fichier CSV dont la colonne vaut la valeur donnée,
+        en ignorant la casse et les espaces autour.
+
+        Si un index est enregistré pour cette colonne, seules les lignes
+        concernées sont lues ; sinon le fichier est parcouru entièrement.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV.
+            colonne (str): La colonne de recherche.
+            valeur (str): La valeur recherchée.
+
+        Returns:
+            list: Les lignes correspondantes, dans l'ordre du fichier.
+        """
+        index = self._index.get(file_path)
+        if (
+            index is not None
+            and index.colonne == colonne
+            and not self._stat(self._chemin_journal(file_path))
+        ):
+            lignes = index.lire(valeur)
+            if lignes is not None:
+                return lignes
+        cle = IndexCSV.normaliser(valeur)
+        return list(
+            self.iter_csv(
+                file_path,
+                filtre=lambda ligne: IndexCSV.normaliser(ligne.get(colonne)) == cle,
+            )
+        )
 
     def write_csv(self, chemin_fichier: str, donnees: list, en_tetes):
         """
         Write data to a CSV file.
+        The file is written to a temporary file which then atomically replaces
+        the original: concurrent readers never see a partially written file.
         Args:
             chemin_fichier (str): The path to the CSV file.
             donnees (list): A list of dictionaries containing the data to write.
@@ -37,12 +595,37 @@ class CSVManager:
             None
         """
 
-        with open(chemin_fichier, "w", newline="", encoding="utf-8") as fichier:
-            ecrivain = csv.DictWriter(fichier, fieldnames=en_tetes)
-            ecrivain.writeheader()
-            ecrivain.writerows(donnees)
+        with self._verrou_ecriture(chemin_fichier):
+            self._remplacer(chemin_fichier, en_tetes, donnees)
+            self._reinitialiser_index(chemin_fichier)
+            # Le fichier réécrit contient l'état complet : le journal est obsolète
+            if os.path.exists(self._chemin_journal(chemin_fichier)):
+                os.remove(self._chemin_journal(chemin_fichier))
+            # Le contenu écrit devient le nouveau contenu du cache
+            lignes = [self._ligne_texte(ligne, en_tetes) for ligne in donnees]
+            self._cache[chemin_fichier] = (
+                self._empreinte(chemin_fichier),
+                list(en_tetes),
+                lignes,
+            )
+
+    def reecrire_csv(self, chemin_fichier: str, transformation, en_tetes):
+        """
+        Réécrit un fichier CSV à partir de son contenu courant. La lecture et
+        la réécriture se font sous le verrou d'écriture du fichier : aucun
+        ajout concurrent ne peut se glisser entre les deux.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV.
+            transformation (callable): Reçoit la liste des lignes actuelles
+            (vide si le fichier n'existe pas) et retourne les lignes à écrire.
+            en_tetes (list): Les colonnes à écrire.
+        """
+        with self._verrou_ecriture(chemin_fichier):
+            lignes = transformation(list(self.iter_csv(chemin_fichier)))
+            self.write_csv(chemin_fichier, lignes, en_tetes)
 
-    def ajouter_csv(self, chemin_fichier: str, donnees: list):
+    def ajouter_csv(self, chemin_fichier: str, donnees: list, fsync: bool = False):
         """
         Ajoute des données à un fichier CSV. Si le fichier n'existe pas ou est vide,
         les en-têtes sont également écrits.
@@ -52,33 +635,238 @@ class CSVManager:
             donnees (list): Les données à ajouter au
             fichier CSV. Peut être une liste de dictionnaires
                             ou un seul dictionnaire.
+            fsync (bool, optional): Si True, les données sont forcées sur le
+            disque (os.fsync) avant le retour.
 
         Raises:
             OSError: Si une erreur se produit lors de
             l'ouverture ou de l'écriture dans le fichier.
+            ValueError: Si les colonnes ne correspondent pas au schéma du fichier.
         """
+        nouvelles = donnees if isinstance(donnees, list) else [donnees]
+        schema = schema_pour(chemin_fichier)
+        if schema is not None:
+            # Colonnes vérifiées et renommées selon le schéma du fichier
+            nouvelles = [schema.valider(ligne) for ligne in nouvelles]
+        with self._verrou_ecriture(chemin_fichier):
+            self._ajouter(chemin_fichier, nouvelles, schema, fsync)
+
+    def _ajouter(self, chemin_fichier: str, nouvelles: list, schema, fsync: bool):
+        """Ajoute des lignes validées à un fichier CSV (verrou d'écriture tenu)."""
+        # Les lignes en cache ne restent valides que si le fichier n'a pas
+        # été modifié par ailleurs avant notre ajout, et s'il n'a pas de journal
+        # (les lignes ajoutées se placeraient avant les mutations rejouées)
+        en_cache = self._lignes_en_cache(chemin_fichier)
+        avant = self._empreinte(chemin_fichier)
+        if os.path.exists(self._chemin_journal(chemin_fichier)):
+            en_cache = None
+            avant = None
         # Si le fichier n'existe pas ou est vide, on écrit également les en-têtes
-        if not os.path.exists(chemin_fichier) or os.stat(chemin_fichier).st_size == 0:
-            if isinstance(donnees, list):
-                en_tetes = donnees[0].keys()
+        nouveau = (
+            not os.path.exists(chemin_fichier) or os.stat(chemin_fichier).st_size == 0
+        )
+        if nouveau:
+            if os.path.dirname(chemin_fichier):
+                os.makedirs(os.path.dirname(chemin_fichier), exist_ok=True)
+            if schema is not None:
+                en_tetes = schema.colonnes
             else:
-                en_tetes = donnees.keys()
-            with open(chemin_fichier, "w", newline="", encoding="utf-8") as fichier:
-                ecrivain = csv.DictWriter(fichier, fieldnames=en_tetes)
-                ecrivain.writeheader()
-                if isinstance(donnees, list):
-                    ecrivain.writerows(donnees)
-                else:
-                    ecrivain.writerow(donnees)
+                en_tetes = list(nouvelles[0].keys())
+        elif schema is not None:
+            # Les valeurs sont écrites dans l'ordre des colonnes du fichier
+            en_tetes = self._en_tetes_fichier(chemin_fichier)
+            absentes = {c for ligne in nouvelles for c in ligne if c not in en_tetes}
+            if absentes:
+                # Colonnes ajoutées au schéma depuis la création du fichier :
+                # le fichier est d'abord migré vers le schéma courant
+                migrer_fichier(chemin_fichier)
+                self.invalider_cache(chemin_fichier)
+                self._reinitialiser_index(chemin_fichier)
+                en_cache = None
+                avant = None
+                en_tetes = self._en_tetes_fichier(chemin_fichier)
         else:
-            en_tetes = (
-                list(donnees[0].keys())
-                if isinstance(donnees, list)
-                else list(donnees.keys())
+            en_tetes = list(nouvelles[0].keys())
+        tampon = io.StringIO(newline="")
+        ecrivain = csv.DictWriter(tampon, fieldnames=en_tetes, restval="")
+        if nouveau:
+            ecrivain.writeheader()
+        ecrivain.writerows(nouvelles)
+        # Tout le lot est écrit en un seul appel système, à la fin du fichier
+        with open(chemin_fichier, "ab", buffering=0) as fichier:
+            fichier.write(tampon.getvalue().encode("utf-8"))
+            if fsync:
+                os.fsync(fichier.fileno())
+        if nouveau:
+            en_cache = (list(en_tetes), [])
+        # Indexation des lignes ajoutées
+        if chemin_fichier in self._index:
+            self._index[chemin_fichier].mettre_a_jour()
+        apres = self._empreinte(chemin_fichier)
+        # Les enregistrements typés en cache sont complétés de la même façon
+        for cle, entree in list(self._enregistrements.items()):
+            if cle[0] != chemin_fichier:
+                continue
+            empreinte, types_en_tetes, enregistrements = entree
+            if avant is None or empreinte != avant or types_en_tetes != list(en_tetes):
+                self._enregistrements.pop(cle, None)
+                continue
+            enregistrements.extend(
+                cle[1].depuis_ligne(self._ligne_texte(ligne, types_en_tetes))
+                for ligne in nouvelles
+            )
+            self._enregistrements[cle] = (apres, types_en_tetes, enregistrements)
+        # Le cache n'est mis à jour que si les colonnes ajoutées correspondent
+        # à l'en-tête du fichier, sinon la relecture le reconstruira
+        if en_cache is None or en_cache[0] != list(en_tetes):
+            self._cache.pop(chemin_fichier, None)
+            return
+        fichier_en_tetes, lignes_en_cache = en_cache
+        # Mise à jour du cache en place avec les lignes ajoutées
+        lignes_en_cache.extend(
+            self._ligne_texte(ligne, fichier_en_tetes) for ligne in nouvelles
+        )
+        self._cache[chemin_fichier] = (apres, fichier_en_tetes, lignes_en_cache)
+
+    def _lire_journal(self, file_path: str) -> list:
+        """
+        Lit les opérations du journal associé à un fichier CSV.
+        Une ligne incomplète (écriture interrompue) est ignorée.
+        """
+        operations = []
+        with open(self._chemin_journal(file_path), "r", encoding="utf-8") as journal:
+            for ligne in journal:
+                try:
+                    operations.append(json.loads(ligne))
+                except json.JSONDecodeError:
+                    continue
+        return operations
+
+    @staticmethod
+    def _rejouer(lignes: list, operations: list) -> list:
+        """
+        Applique les opérations d'un journal sur les lignes d'un fichier CSV.
+
+        Les opérations sont idempotentes : un ajout d'une clé déjà présente
+        remplace la ligne existante, et rejouer un journal déjà intégré au
+        fichier (compaction interrompue) donne le même résultat.
+
+        Args:
+            lignes (list): Les lignes du fichier CSV.
+            operations (list): Les opérations lues dans le journal.
+
+        Returns:
+            list: Les lignes résultant de l'application des opérations.
+        """
+        lignes = list(lignes)
+        positions = None
+        for operation in operations:
+            colonne = operation["colonne"]
+            if positions is None:
+                # Index clé -> positions des lignes, construit une seule fois
+                positions = {}
+                for i, ligne in enumerate(lignes):
+                    positions.setdefault((ligne.get(colonne) or "").strip(), []).append(
+                        i
+                    )
+            cle = operation["cle"].strip()
+            if operation["op"] == "suppression":
+                for i in positions.pop(cle, []):
+                    lignes[i] = None
+                continue
+            nouvelle = operation["ligne"]
+            nouvelle_cle = nouvelle[colonne].strip()
+            anciennes = positions.pop(cle, None) or positions.pop(nouvelle_cle, None)
+            if anciennes:
+                i = anciennes[0]
+                for j in anciennes[1:]:
+                    lignes[j] = None
+                lignes[i] = nouvelle
+            else:
+                i = len(lignes)
+                lignes.append(nouvelle)
+            positions[nouvelle_cle] = [i]
+        return [ligne for ligne in lignes if ligne is not None]
+
+    def journaliser(
+        self,
+        chemin_fichier: str,
+        operation: str,
+        colonne_cle: str,
+        cle: str,
+        ligne: dict = None,
+    ):
+        """
+        Enregistre une mutation dans le journal d'un fichier CSV au lieu de
+        réécrire tout le fichier. Le journal est rejoué à la lecture et replié
+        dans le fichier par compacter().
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV.
+            operation (str): "ajout", "modification" ou "suppression".
+            colonne_cle (str): La colonne identifiant une ligne (ex. "Nom").
+            cle (str): La valeur de la clé de la ligne visée. Pour une
+            modification, il s'agit de l'ancienne valeur.
+            ligne (dict, optional): La nouvelle ligne (ajout et modification).
+
+        Raises:
+            ValueError: Si l'opération n'est pas reconnue.
+        """
+        if operation not in ("ajout", "modification", "suppression"):
+            raise ValueError(f"Opération de journal inconnue : {operation}")
+        enregistrement = {"op": operation, "colonne": colonne_cle, "cle": cle}
+        if ligne is not None:
+            enregistrement["ligne"] = {
+                cle_ligne: "" if valeur is None else str(valeur)
+                for cle_ligne, valeur in ligne.items()
+            }
+        with self._verrou_ecriture(chemin_fichier):
+            en_cache = self._lignes_en_cache(chemin_fichier)
+            with open(
+                self._chemin_journal(chemin_fichier), "ab", buffering=0
+            ) as journal:
+                journal.write(
+                    (json.dumps(enregistrement, ensure_ascii=False) + "\n").encode(
+                        "utf-8"
+                    )
+                )
+            if en_cache is None:
+                return
+            # Mise à jour du cache en place avec la mutation journalisée
+            en_tetes, lignes = en_cache
+            self._cache[chemin_fichier] = (
+                self._empreinte(chemin_fichier),
+                en_tetes,
+                self._rejouer(lignes, [enregistrement]),
+            )
+
+    def taille_journal(self, chemin_fichier: str) -> int:
+        """
+        Retourne la taille en octets du journal d'un fichier CSV (0 s'il n'y en a pas).
+        """
+        journal = self._stat(self._chemin_journal(chemin_fichier))
+        return 0 if journal is None else journal[1]
+
+    def compacter(self, chemin_fichier: str, en_tetes):
+        """
+        Replie le journal d'un fichier CSV dans le fichier lui-même.
+
+        Le nouveau contenu est écrit dans un fichier temporaire qui remplace
+        l'original en une seule opération, puis le journal est supprimé :
+        une interruption laisse toujours un fichier complet.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV.
+            en_tetes (list): Les en-têtes du fichier CSV.
+        """
+        with self._verrou_ecriture(chemin_fichier):
+            lignes = self.read_csv(chemin_fichier)
+            self._remplacer(chemin_fichier, en_tetes, lignes)
+            self._reinitialiser_index(chemin_fichier)
+            if os.path.exists(self._chemin_journal(chemin_fichier)):
+                os.remove(self._chemin_journal(chemin_fichier))
+            self._cache[chemin_fichier] = (
+                self._empreinte(chemin_fichier),
+                list(en_tetes),
+                [self._ligne_texte(ligne, en_tetes) for ligne in lignes],
             )
-            with open(chemin_fichier, "a", newline="", encoding="utf-8") as fichier:
-                ecrivain = csv.DictWriter(fichier, fieldnames=en_tetes)
-                if isinstance(donnees, list):
-                    ecrivain.writerows(donnees)
-                else:
-                    ecrivain.writerow(donnees)
@@ -1,9 +1,13 @@
 """ Module contenant la classe DevisManager pour gérer les devis de découpe de métal. """
 
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
 
+import numpy as np
+
 from constants import (
-    FICHIER_DEVIS,
     FORME_COEFFICIENT,
     FRAIS_FIXES,
     METAL_PROPERTIES,
@@ -12,16 +16,273 @@ from constants import (
     TVA,
 )
 from csv_manager import CSVManager
+from ecriture_differee import EcritureDifferee
+from enregistrements import Devis
+from moteur_tarif import MoteurTarif, signature_tarifs
+from numerotation import AllocateurNumeros
+from partitions import chemin_partition, dans_periode, lister_partitions
+
+
+def _arrondir(valeurs: np.ndarray, decimales: int) -> np.ndarray:
+    """
+    Arrondit un tableau exactement comme round(valeur, decimales) le ferait
+    pour chaque élément.
+
+    np.round peut différer de round() lorsque la valeur est à la limite entre
+    deux arrondis : ces éléments (rares) sont arrondis un par un avec round().
+    """
+    echelle = valeurs * 10**decimales
+    arrondis = np.round(valeurs, decimales)
+    limites = np.flatnonzero(np.abs(np.abs(echelle - np.trunc(echelle)) - 0.5) < 1e-6)
+    for i in limites:
+        arrondis[i] = round(float(valeurs[i]), decimales)
+    return arrondis
 
 
 class DevisManager:
     """Classe pour gérer les devis de découpe de métal."""
 
-    def __init__(self, csv_manager: CSVManager):
-        """Initialisation de la classe DevisManager."""
+    def __init__(
+        self,
+        csv_manager: CSVManager,
+        ecriture: EcritureDifferee = None,
+        taille_cache: int = 0,
+        numeros: AllocateurNumeros = None,
+    ):
+        """
+        Initialisation de la classe DevisManager.
+
+        Args:
+            csv_manager (CSVManager): Le gestionnaire de stockage.
+            ecriture (EcritureDifferee, optional): File d'écriture différée des
+            devis. Sans file, chaque devis est écrit immédiatement.
+            taille_cache (int, optional): Nombre maximal de devis calculés gardés
+            en cache par calculer_devis (les moins récemment utilisés sont
+            retirés en premier). 0 : pas de cache.
+            numeros (AllocateurNumeros, optional): L'allocateur des numéros de
+            devis. Par défaut, celui du compteur FICHIER_COMPTEUR_DEVIS.
+        """
         self.csv_manager = csv_manager
+        self.ecriture = ecriture
+        self.numeros = numeros or AllocateurNumeros()
+        # Table de tarification précompilée par (métal, forme)
+        self.moteur = self._compiler_moteur()
+        # Cache des calculs : (métal, quantité, forme, remise) -> (tarifs, devis)
+        self.taille_cache = taille_cache
+        self._cache_devis = OrderedDict()
+        self._verrou_cache = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.cache_invalidations = 0
+
+    @staticmethod
+    def _compiler_moteur() -> MoteurTarif:
+        """Compile la table de tarification avec les tarifs en vigueur."""
+        return MoteurTarif(
+            METAL_PROPERTIES,
+            FORME_COEFFICIENT,
+            TVA,
+            TARIF_MACHINE,
+            TARIF_OPERATEUR,
+            FRAIS_FIXES,
+        )
+
+    @staticmethod
+    def _tarifs(metal, forme):
+        """
+        Retourne les constantes de tarification utilisées pour un couple
+        (métal, forme), ou None si l'un des deux est inconnu. Un devis en cache
+        n'est valide que si ces constantes n'ont pas changé depuis son calcul.
+        """
+        props = METAL_PROPERTIES.get(metal)
+        coef_forme = FORME_COEFFICIENT.get(forme)
+        if props is None or coef_forme is None:
+            return None
+        return signature_tarifs(
+            props, coef_forme, TVA, TARIF_MACHINE, TARIF_OPERATEUR, FRAIS_FIXES
+        )
+
+    def cache_stats(self) -> dict:
+        """
+        Retourne les compteurs du cache des calculs de devis.
+
+        Returns:
+            dict: Le nombre de calculs servis depuis le cache ("hits"), calculés
+            ("misses"), le taux de succès ("taux"), les devis retirés pour faire
+            de la place ("evictions") ou parce que les tarifs ont changé
+            ("invalidations"), et le nombre de devis en cache ("taille").
+        """
+        with self._verrou_cache:
+            total = self.cache_hits + self.cache_misses
+            return {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "taux": self.cache_hits / total if total else 0.0,
+                "evictions": self.cache_evictions,
+                "invalidations": self.cache_invalidations,
+                "taille": len(self._cache_devis),
+                "taille_max": self.taille_cache,
+            }
+
+    def invalider_cache(self):
+        """
+        Vide le cache des calculs de devis et recompile la table de
+        tarification (à appeler après un changement des tarifs).
+        """
+        with self._verrou_cache:
+            self._cache_devis.clear()
+            self.moteur = self._compiler_moteur()
+
+    def _fichiers_devis(self, debut: str = None, fin: str = None) -> list:
+        """
+        Retourne les fichiers de devis (partitions mensuelles) couvrant une période.
+        Les devis encore en file d'écriture sont écrits avant toute lecture.
+        """
+        if self.ecriture is not None:
+            self.ecriture.vider()
+        return lister_partitions(self.csv_manager, debut, fin)
+
+    def iter_devis(
+        self,
+        debut: str = None,
+        fin: str = None,
+        filtre=None,
+        colonnes: list = None,
+    ):
+        """
+        Parcourt les devis de toutes les partitions concernées par une période,
+        dans l'ordre chronologique des partitions.
+
+        Args:
+            debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+            fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+            filtre (callable, optional): Prédicat appliqué à chaque ligne complète.
+            colonnes (list, optional): Les colonnes à conserver.
+
+        Yields:
+            dict: Les devis retenus.
+        """
+        if debut or fin:
+            filtre_date = filtre
+
+            def filtre(ligne):
+                return dans_periode(ligne.get("Date"), debut, fin) and (
+                    filtre_date is None or filtre_date(ligne)
+                )
+
+        for chemin in self._fichiers_devis(debut, fin):
+            yield from self.csv_manager.iter_csv(
+                chemin, filtre=filtre, colonnes=colonnes
+            )
+
+    def iter_enregistrements(self, debut: str = None, fin: str = None):
+        """
+        Parcourt les devis d'une période sous forme d'enregistrements Devis.
+
+        Args:
+            debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+            fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+
+        Yields:
+            Devis: Les devis de la période.
+        """
+        filtre = None
+        if debut or fin:
+
+            def filtre(devis):
+                return dans_periode(devis.date, debut, fin)
+
+        for chemin in self._fichiers_devis(debut, fin):
+            yield from self.csv_manager.iter_enregistrements(
+                chemin, Devis, filtre=filtre
+            )
+
+    def iter_devis_client(self, nom_client: str, debut: str = None, fin: str = None):
+        """
+        Parcourt les devis d'un client, dans l'ordre de leur création. Chaque
+        partition de la période est lue via son index par client : seuls les
+        devis du client d'un mois sont en mémoire à la fois.
+
+        Args:
+            nom_client (str): Le nom du client (la casse et les espaces
+            autour sont ignorés).
+            debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+            fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+
+        Yields:
+            dict: Les devis du client.
+        """
+        for chemin in self._fichiers_devis(debut, fin):
+            self.csv_manager.enregistrer_index(chemin, "Nom Client")
+            for devis in self.csv_manager.lire_par_cle(
+                chemin, "Nom Client", nom_client
+            ):
+                if not (debut or fin) or dans_periode(devis.get("Date"), debut, fin):
+                    yield devis
+
+    def lister_devis_client(self, nom_client: str) -> list:
+        """
+        Retourne les devis d'un client, dans l'ordre de leur création.
+        Chaque partition est lue via son index par client.
+
+        Args:
+            nom_client (str): Le nom du client (la casse et les espaces
+            autour sont ignorés).
+
+        Returns:
+            list: Les devis du client, sous forme de dictionnaires.
+        """
+        return list(self.iter_devis_client(nom_client))
 
     def calculer_devis(self, metal, quantite_ml, forme, remise_client):
+        """
+        Calcule le devis pour la découpe d'un métal (voir _calculer_devis).
+
+        Le devis est chiffré avec la table de tarification précompilée
+        (MoteurTarif). Si le cache est activé (taille_cache), les devis déjà
+        calculés avec les mêmes valeurs et les mêmes constantes de tarification
+        sont réutilisés. Dans les deux cas, la table est recompilée si les
+        tarifs ont changé depuis sa compilation (y compris une modification en
+        place de METAL_PROPERTIES).
+        """
+        tarifs = self._tarifs(metal, forme)
+        if tarifs is not None and self.moteur.signature(metal, forme) != tarifs:
+            with self._verrou_cache:
+                if self.moteur.signature(metal, forme) != tarifs:
+                    self.moteur = self._compiler_moteur()
+        if self.taille_cache <= 0:
+            return self._calculer_devis(metal, quantite_ml, forme, remise_client)
+        if (
+            tarifs is None
+            or not isinstance(quantite_ml, (int, float))
+            or not isinstance(remise_client, (int, float))
+        ):
+            # Valeurs invalides : l'erreur est levée par le calcul
+            return self._calculer_devis(metal, quantite_ml, forme, remise_client)
+        cle = (metal, float(quantite_ml), forme, float(remise_client))
+        with self._verrou_cache:
+            entree = self._cache_devis.get(cle)
+            if entree is not None and entree[0] != tarifs:
+                # Les tarifs ont changé depuis le calcul
+                del self._cache_devis[cle]
+                self.cache_invalidations += 1
+                entree = None
+            if entree is not None:
+                self._cache_devis.move_to_end(cle)
+                self.cache_hits += 1
+                return dict(entree[1])
+            self.cache_misses += 1
+        devis = self._calculer_devis(metal, quantite_ml, forme, remise_client)
+        with self._verrou_cache:
+            self._cache_devis[cle] = (tarifs, devis)
+            self._cache_devis.move_to_end(cle)
+            while len(self._cache_devis) > self.taille_cache:
+                self._cache_devis.popitem(last=False)
+                self.cache_evictions += 1
+        return dict(devis)
+
+    def _calculer_devis(self, metal, quantite_ml, forme, remise_client):
         """
         Calcule le devis pour la découpe d'un métal
         donné en fonction de la quantité, de la forme et de la remise client.
@@ -42,49 +303,82 @@ class DevisManager:
         Raises:
             ValueError: Si le métal ou la forme de découpe n'est pas valide.
         """
-        # Marge fixe de 50 %
-        marge = 50 / 100
-        # Conversion de la remise client en décimal (entrée en %)
-        remise_client = remise_client / 100
+        return self.moteur.calculer(metal, quantite_ml, forme, remise_client)
 
-        # Constantes
-
-        # Propriétés du métal sélectionné
-        props = METAL_PROPERTIES.get(metal)
-        if not props:
-            raise ValueError("Métal non trouvé")
-        coef_metal = props["coef"]
-        usure_lame = props["usure"]
-        vitesse = props["vitesse"]
-        cout_materiaux_unit = props["cout_materiaux"]
+    def calculer_devis_batch(self, metaux, quantites_ml, formes, remises_client):
+        """
+        Calcule les devis d'un lot de découpes en une seule passe vectorisée
+        (NumPy). Chaque devis est identique, au bit près, à celui que
+        retournerait calculer_devis pour les mêmes valeurs.
 
-        # Coefficient de la forme de découpe
-        coef_forme = FORME_COEFFICIENT.get(forme)
-        if coef_forme is None:
-            raise ValueError("Forme de découpe non valide")
+        Args:
+            metaux (array-like): Les types de métal.
+            quantites_ml (array-like): Les quantités en millimètres linéaires.
+            formes (array-like): Les formes de découpe.
+            remises_client (array-like): Les remises client en pourcentage.
 
-        # Calcul du temps de découpe (en heures)
-        temps_decoupe = (quantite_ml / vitesse) / 60
+        Returns:
+            dict: Les tableaux NumPy "Coût Matériaux", "Coût Découpe",
+            "Frais Fixes" et "Prix Total", dans l'ordre des découpes.
 
-        # Coût de découpe
-        cout_decoupe = (
-            temps_decoupe * (TARIF_MACHINE + TARIF_OPERATEUR + usure_lame) * coef_forme
+        Raises:
+            ValueError: Si un métal ou une forme de découpe n'est pas valide,
+            ou si les tableaux n'ont pas la même longueur.
+        """
+        quantites_ml = np.asarray(quantites_ml, dtype=np.float64)
+        remises_client = np.asarray(remises_client, dtype=np.float64)
+        noms_metaux, indices_metaux = np.unique(
+            np.asarray(metaux, dtype=str), return_inverse=True
         )
+        noms_formes, indices_formes = np.unique(
+            np.asarray(formes, dtype=str), return_inverse=True
+        )
+        if not (
+            len(quantites_ml)
+            == len(remises_client)
+            == len(indices_metaux)
+            == len(indices_formes)
+        ):
+            raise ValueError("Les tableaux du lot n'ont pas la même longueur")
+        if any(nom not in METAL_PROPERTIES for nom in noms_metaux):
+            raise ValueError("Métal non trouvé")
+        if any(nom not in FORME_COEFFICIENT for nom in noms_formes):
+            raise ValueError("Forme de découpe non valide")
 
-        # Coût des matériaux (conversion mm -> m)
-        cout_materiaux = (quantite_ml / 1000) * cout_materiaux_unit * coef_metal
+        # Propriétés de chaque découpe, lues dans des tables par valeur distincte
+        props = [METAL_PROPERTIES[nom] for nom in noms_metaux]
+        coef_metal = np.array([p["coef"] for p in props], dtype=np.float64)
+        vitesse = np.array([p["vitesse"] for p in props], dtype=np.float64)
+        cout_materiaux_unit = np.array(
+            [p["cout_materiaux"] for p in props], dtype=np.float64
+        )
+        # Même somme, dans le même ordre, que calculer_devis
+        tarif_horaire = np.array(
+            [TARIF_MACHINE + TARIF_OPERATEUR + p["usure"] for p in props],
+            dtype=np.float64,
+        )[indices_metaux]
+        coef_forme = np.array(
+            [FORME_COEFFICIENT[nom] for nom in noms_formes], dtype=np.float64
+        )[indices_formes]
 
+        # Mêmes opérations, dans le même ordre, que calculer_devis
+        marge = 50 / 100
+        remises_client = remises_client / 100
+        temps_decoupe = (quantites_ml / vitesse[indices_metaux]) / 60
+        cout_decoupe = temps_decoupe * tarif_horaire * coef_forme
+        cout_materiaux = (
+            (quantites_ml / 1000)
+            * cout_materiaux_unit[indices_metaux]
+            * coef_metal[indices_metaux]
+        )
         base_cost = cout_materiaux + cout_decoupe + FRAIS_FIXES
-
-        # Application de la marge fixe et de la remise client
-        prix_general = base_cost + (base_cost * marge) - (base_cost * remise_client)
-        prix_total = round(prix_general * (1 + TVA), 3)
+        prix_general = base_cost + (base_cost * marge) - (base_cost * remises_client)
 
         return {
-            "Coût Matériaux": round(cout_materiaux, 3),
-            "Coût Découpe": round(cout_decoupe, 3),
-            "Frais Fixes": FRAIS_FIXES,
-            "Prix Total": prix_total,
+            "Coût Matériaux": _arrondir(cout_materiaux, 3),
+            "Coût Découpe": _arrondir(cout_decoupe, 3),
+            "Frais Fixes": np.full(len(quantites_ml), FRAIS_FIXES),
+            "Prix Total": _arrondir(prix_general * (1 + TVA), 3),
         }
 
     def ajouter_devis(
@@ -95,8 +389,51 @@ class DevisManager:
         forme: str,
         remise_client: str,
     ) -> dict:
+        """
+        Calcule et enregistre un devis, en attendant son écriture effective.
+
+        Returns:
+            dict: La ligne du devis enregistrée.
+
+        Raises:
+            ValueError: Si le métal ou la forme de découpe n'est pas valide,
+            ou si la ligne est refusée par le schéma du fichier.
+            OSError: Si l'écriture du devis échoue.
+        """
+        donnees_devis = self.preparer_devis(
+            nom_client, metal, quantite_ml, forme, remise_client
+        )
+        # L'erreur d'écriture éventuelle (lot de la file d'écriture) est levée ici
+        self.enregistrer_devis(donnees_devis).result()
+        return donnees_devis
+
+    def preparer_devis(
+        self,
+        nom_client: str,
+        metal: str,
+        quantite_ml: str,
+        forme: str,
+        remise_client: str,
+    ) -> dict:
+        """
+        Calcule un devis et lui attribue son numéro, sans l'enregistrer.
+
+        Args:
+            nom_client (str): Le nom du client.
+            metal (str): Le type de métal à découper.
+            quantite_ml (float): La quantité en millimètres linéaires.
+            forme (str): La forme de découpe.
+            remise_client (float): La remise client en pourcentage.
+
+        Returns:
+            dict: La ligne du devis, prête à être enregistrée.
+
+        Raises:
+            ValueError: Si le métal ou la forme de découpe n'est pas valide.
+        """
         devis = self.calculer_devis(metal, quantite_ml, forme, remise_client)
         donnees_devis = {
+            "Numéro": self.numeros.suivant(),
             "Nom Client": nom_client.upper(),
             "Métal": metal,
             "Quantité (mm)": quantite_ml,
@@ -108,5 +445,82 @@ class DevisManager:
             "Frais Fixes": devis["Frais Fixes"],
             "Date": datetime.now().strftime("%Y-%m-%d"),
         }
-        self.csv_manager.ajouter_csv(FICHIER_DEVIS, donnees_devis)
         return donnees_devis
+
+    def enregistrer_devis(self, donnees_devis: dict) -> Future:
+        """
+        Enregistre un devis préparé par preparer_devis, dans la partition de
+        son mois : immédiatement, ou avec le prochain lot de la file d'écriture.
+
+        Returns:
+            Future: Résolu une fois le devis écrit (déjà résolu sans file
+            d'écriture), ou portant l'exception levée par l'écriture.
+        """
+        chemin = chemin_partition(donnees_devis["Date"])
+        if self.ecriture is not None:
+            return self.ecriture.soumettre(chemin, donnees_devis)
+        futur = Future()
+        self.csv_manager.ajouter_csv(chemin, donnees_devis)
+        futur.set_result(None)
+        return futur
+
+    def ajouter_devis_lot(self, demandes: list) -> list:
+        """
+        Calcule et enregistre un lot de devis en une seule écriture. Les
+        montants sont calculés par calculer_devis_batch, identiques à ceux
+        de ajouter_devis.
+
+        Args:
+            demandes (list): Les demandes de devis, sous forme de dictionnaires
+            avec les clés "Nom Client", "Métal", "Quantité (mm)", "Forme" et
+            "Remise (%)" (quantité et remise numériques).
+
+        Returns:
+            list: Les devis enregistrés, dans l'ordre des demandes.
+
+        Raises:
+            ValueError: Si un métal ou une forme de découpe n'est pas valide.
+            Exception: La première erreur d'écriture, une fois toutes les
+            lignes du lot traitées par la file d'écriture (les autres devis
+            du lot sont écrits).
+        """
+        if not demandes:
+            return []
+        montants = self.calculer_devis_batch(
+            [demande["Métal"] for demande in demandes],
+            [demande["Quantité (mm)"] for demande in demandes],
+            [demande["Forme"] for demande in demandes],
+            [demande["Remise (%)"] for demande in demandes],
+        )
+        colonnes = ["Prix Total", "Coût Matériaux", "Coût Découpe", "Frais Fixes"]
+        date = datetime.now().strftime("%Y-%m-%d")
+        numeros = self.numeros.allouer(len(demandes))
+        lot = [
+            {
+                "Numéro": numero,
+                "Nom Client": demande["Nom Client"].upper(),
+                "Métal": demande["Métal"],
+                "Quantité (mm)": demande["Quantité (mm)"],
+                "Forme": demande["Forme"],
+                "Remise (%)": demande["Remise (%)"],
+                **dict(zip(colonnes, valeurs)),
+                "Date": date,
+            }
+            for numero, demande, valeurs in zip(
+                numeros, demandes, zip(*(montants[nom].tolist() for nom in colonnes))
+            )
+        ]
+        # Tous les devis du lot sont datés du jour : une seule partition
+        chemin = chemin_partition(date)
+        if self.ecriture is not None:
+            futurs = [
+                self.ecriture.soumettre(chemin, donnees_devis) for donnees_devis in lot
+            ]
+            # Toutes les lignes sont attendues avant de lever la première erreur
+            erreurs = [futur.exception() for futur in futurs]
+            erreur = next((ex for ex in erreurs if ex is not None), None)
+            if erreur is not None:
+                raise erreur
+        else:
+            self.csv_manager.ajouter_csv(chemin, lot)
+        return lot
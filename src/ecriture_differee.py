@@ -0,0 +1,151 @@
+""" Module contenant la classe EcritureDifferee (écriture groupée des lignes en arrière-plan). """
+
+import atexit
+import threading
+from concurrent.futures import Future
+
+from constants import FSYNC_DEVIS, INTERVALLE_ECRITURE_DEVIS
+from schemas import schema_pour
+
+
+class EcritureDifferee:
+    """
+    File d'écriture différée : les lignes soumises sont regroupées par fichier
+    et écrites par un thread d'arrière-plan, en un seul ajout par fichier
+    (ajouter_csv) à chaque intervalle.
+
+    Les lignes en attente sont écrites à l'arrêt du programme (atexit), ou à
+    la demande avec vider().
+    """
+
+    def __init__(
+        self,
+        stockage,
+        intervalle: float = INTERVALLE_ECRITURE_DEVIS,
+        fsync: bool = FSYNC_DEVIS,
+    ):
+        """
+        Initialise la file et démarre le thread d'écriture.
+
+        Args:
+            stockage (CSVManager): Le gestionnaire de stockage (CSV ou SQLite).
+            intervalle (float, optional): Délai maximal, en secondes, entre la
+            soumission d'une ligne et son écriture.
+            fsync (bool, optional): Si True, chaque lot est forcé sur le disque
+            avant que ses lignes soient confirmées.
+        """
+        self.stockage = stockage
+        self.intervalle = intervalle
+        self.fsync = fsync
+        # Lignes en attente par fichier : liste de (ligne, Future)
+        self._en_attente = {}
+        self._condition = threading.Condition()
+        # Garantit qu'un seul lot est écrit à la fois, dans l'ordre de soumission
+        self._verrou_ecriture = threading.Lock()
+        self._arret = False
+        self.lots_ecrits = 0
+        self.lignes_ecrites = 0
+        self._thread = threading.Thread(
+            target=self._boucle, name="EcritureDifferee", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.arreter)
+
+    def soumettre(self, chemin_fichier: str, ligne: dict) -> Future:
+        """
+        Ajoute une ligne à la file d'écriture.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV.
+            ligne (dict): La ligne à ajouter.
+
+        Returns:
+            Future: Résolu (à None) une fois la ligne écrite, ou portant
+            l'exception levée par l'écriture.
+
+        Raises:
+            RuntimeError: Si la file a été arrêtée.
+        """
+        futur = Future()
+        with self._condition:
+            if self._arret:
+                raise RuntimeError("La file d'écriture est arrêtée")
+            self._en_attente.setdefault(chemin_fichier, []).append((ligne, futur))
+            self._condition.notify()
+        return futur
+
+    def en_attente(self) -> int:
+        """Retourne le nombre de lignes soumises et pas encore écrites."""
+        with self._condition:
+            return sum(len(lignes) for lignes in self._en_attente.values())
+
+    def vider(self):
+        """Écrit immédiatement toutes les lignes en attente."""
+        with self._verrou_ecriture:
+            with self._condition:
+                lots, self._en_attente = self._en_attente, {}
+            for chemin_fichier, lignes in lots.items():
+                self._ecrire(chemin_fichier, lignes)
+
+    def _ecrire(self, chemin_fichier: str, lignes: list):
+        """
+        Écrit un lot de lignes en un seul ajout, puis résout leurs Future.
+
+        Les lignes sont d'abord vérifiées avec le schéma du fichier : celles
+        qui sont refusées portent l'exception et les autres sont écrites. Si
+        l'ajout échoue ensuite, toutes les lignes du lot portent l'exception,
+        sans nouvelle tentative : une partie du lot peut déjà avoir été écrite
+        (échec de os.fsync ou de l'indexation, par exemple), et la réécrire
+        créerait des doublons.
+        """
+        schema = schema_pour(chemin_fichier)
+        if schema is not None:
+            valides = []
+            for ligne, futur in lignes:
+                try:
+                    schema.valider(ligne)
+                except ValueError as ex:
+                    futur.set_exception(ex)
+                else:
+                    valides.append((ligne, futur))
+            lignes = valides
+            if not lignes:
+                return
+        try:
+            self.stockage.ajouter_csv(
+                chemin_fichier, [ligne for ligne, _ in lignes], fsync=self.fsync
+            )
+        except Exception as ex:
+            for _, futur in lignes:
+                futur.set_exception(ex)
+            return
+        self.lots_ecrits += 1
+        self.lignes_ecrites += len(lignes)
+        for _, futur in lignes:
+            futur.set_result(None)
+
+    def _boucle(self):
+        """Boucle du thread d'écriture : attend des lignes, puis écrit par lots."""
+        while True:
+            with self._condition:
+                while not self._en_attente and not self._arret:
+                    self._condition.wait()
+                if self._arret:
+                    return
+                # Laisse aux autres soumissions le temps de rejoindre le lot
+                self._condition.wait_for(lambda: self._arret, self.intervalle)
+            self.vider()
+
+    def arreter(self):
+        """
+        Arrête le thread d'écriture après avoir écrit les lignes en attente.
+        Les soumissions suivantes sont refusées.
+        """
+        with self._condition:
+            if self._arret:
+                return
+            self._arret = True
+            self._condition.notify_all()
+        self._thread.join()
+        self.vider()
+        atexit.unregister(self.arreter)
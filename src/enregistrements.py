@@ -0,0 +1,159 @@
+""" Module contenant les classes Client et Devis, représentations typées des lignes CSV. """
+
+from sys import intern
+
+
+def _nombre(valeur):
+    """Convertit une valeur lue dans un CSV en float, ou None si elle est invalide."""
+    try:
+        return float(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+def _texte(valeur) -> str:
+    """Convertit une valeur lue dans un CSV en chaîne internée."""
+    return intern("" if valeur is None else str(valeur))
+
+
+class Client:
+    """Client lu depuis clients.csv."""
+
+    __slots__ = ("nom", "adresse", "code_postal", "telephone", "entreprise")
+
+    def __init__(
+        self,
+        nom: str,
+        adresse: str,
+        code_postal: str,
+        telephone: str,
+        entreprise: str = "",
+    ):
+        """Constructeur de la classe Client."""
+        self.nom = nom
+        self.adresse = adresse
+        self.code_postal = code_postal
+        self.telephone = telephone
+        self.entreprise = entreprise
+
+    @classmethod
+    def depuis_ligne(cls, ligne: dict) -> "Client":
+        """
+        Crée un client à partir d'une ligne de clients.csv.
+
+        Args:
+            ligne (dict): La ligne lue dans le fichier CSV.
+
+        Returns:
+            Client: Le client correspondant.
+        """
+        return cls(
+            ligne.get("Nom") or "",
+            ligne.get("Adresse") or "",
+            ligne.get("Code Postal") or "",
+            ligne.get("Téléphone") or "",
+            ligne.get("Entreprise") or "",
+        )
+
+    def vers_ligne(self) -> dict:
+        """Retourne le client sous forme de ligne de clients.csv."""
+        return {
+            "Nom": self.nom,
+            "Adresse": self.adresse,
+            "Code Postal": self.code_postal,
+            "Téléphone": self.telephone,
+            "Entreprise": self.entreprise,
+        }
+
+
+class Devis:
+    """
+    Devis lu depuis devis.csv.
+
+    Les montants et quantités sont convertis en float une seule fois, à la
+    lecture (None si la valeur est invalide). Les chaînes très répétées
+    (client, métal, forme, date) sont internées pour être partagées entre
+    les devis.
+    """
+
+    __slots__ = (
+        "nom_client",
+        "metal",
+        "quantite",
+        "forme",
+        "remise",
+        "prix_total",
+        "cout_materiaux",
+        "cout_decoupe",
+        "frais_fixes",
+        "date",
+        "numero",
+    )
+
+    def __init__(
+        self,
+        nom_client: str,
+        metal: str,
+        quantite: float,
+        forme: str,
+        remise: float,
+        prix_total: float,
+        cout_materiaux: float,
+        cout_decoupe: float,
+        frais_fixes: float,
+        date: str,
+        numero: str = "",
+    ):
+        """Constructeur de la classe Devis."""
+        self.nom_client = nom_client
+        self.metal = metal
+        self.quantite = quantite
+        self.forme = forme
+        self.remise = remise
+        self.prix_total = prix_total
+        self.cout_materiaux = cout_materiaux
+        self.cout_decoupe = cout_decoupe
+        self.frais_fixes = frais_fixes
+        self.date = date
+        self.numero = numero
+
+    @classmethod
+    def depuis_ligne(cls, ligne: dict) -> "Devis":
+        """
+        Crée un devis à partir d'une ligne de devis.csv.
+
+        Args:
+            ligne (dict): La ligne lue dans le fichier CSV.
+
+        Returns:
+            Devis: Le devis correspondant.
+        """
+        return cls(
+            _texte(ligne.get("Nom Client")),
+            _texte(ligne.get("Métal")),
+            _nombre(ligne.get("Quantité (mm)")),
+            _texte(ligne.get("Forme")),
+            _nombre(ligne.get("Remise (%)")),
+            _nombre(ligne.get("Prix Total")),
+            _nombre(ligne.get("Coût Matériaux")),
+            _nombre(ligne.get("Coût Découpe")),
+            _nombre(ligne.get("Frais Fixes")),
+            _texte(ligne.get("Date")),
+            ligne.get("Numéro") or "",
+        )
+
+    def vers_ligne(self) -> dict:
+        """Retourne le devis sous forme de ligne de devis.csv."""
+        return {
+            "Numéro": self.numero,
+            "Nom Client": self.nom_client,
+            "Métal": self.metal,
+            "Quantité (mm)": self.quantite,
+            "Forme": self.forme,
+            "Remise (%)": self.remise,
+            "Prix Total": self.prix_total,
+            "Coût Matériaux": self.cout_materiaux,
+            "Coût Découpe": self.cout_decoupe,
+            "Frais Fixes": self.frais_fixes,
+            "Date": self.date,
+        }
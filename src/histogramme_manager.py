@@ -3,50 +3,62 @@
 from datetime import datetime
 from matplotlib import pyplot as plt
 import pandas as pd
+import io
 import os
 
-from constants import FICHIER_DEVIS
+from archives import ArchiveArtefacts
+from constants import DOSSIER_PNG
 from csv_manager import CSVManager
+from devis_manager import DevisManager
 
 
 class HistogrammeManager:
-    def __init__(self, csv_manager: CSVManager):
+    def __init__(self, csv_manager: CSVManager, devis_manager: DevisManager = None):
         self.csv_manager = csv_manager
+        # Le DevisManager de l'application, pour voir les devis encore en file
+        # d'écriture
+        self.devis_manager = devis_manager or DevisManager(csv_manager)
+        # Histogrammes rangés par mois (datas/outputs_png/AAAA/MM/)
+        self.archive = ArchiveArtefacts(DOSSIER_PNG)
 
-    def generer_histogramme_image(self):
-        devis_list = self.csv_manager.read_csv(FICHIER_DEVIS)
+    def generer_histogramme_image(self, debut: str = None, fin: str = None):
+        # Parcours des devis typés (montants déjà convertis en float) des seules
+        # partitions de la période : seuls les comptes par intervalle sont
+        # gardés en mémoire
+        devis_list = self.devis_manager.iter_enregistrements(debut, fin)
         try:
-            montants = []
+            intervalles = ["0-1000", "1000-5000", "5000-10000", ">10000"]
+            comptes = [0, 0, 0, 0]
+            nb_montants = 0
             for devis in devis_list:
-                try:
-                    montant = float(devis["Prix Total"])
-                    montants.append(montant)
-                except (ValueError, KeyError):
-                    # Ignore les montants non valides ou les clés manquantes
+                montant = devis.prix_total
+                if montant is None:
+                    # Ignore les montants non valides ou les colonnes manquantes
                     continue
+                nb_montants += 1
+                if 0 <= montant <= 1000:
+                    comptes[0] += 1
+                elif 1000 < montant <= 5000:
+                    comptes[1] += 1
+                elif 5000 < montant <= 10000:
+                    comptes[2] += 1
+                elif montant > 10000:
+                    comptes[3] += 1
 
-            if not montants:
+            if not nb_montants:
                 print("Aucun montant valide trouvé dans le fichier.")
                 return None
 
-            intervalles = ["0-1000", "1000-5000", "5000-10000", ">10000"]
-            comptes = [
-                sum(1 for montant in montants if 0 <= montant <= 1000),
-                sum(1 for montant in montants if 1000 < montant <= 5000),
-                sum(1 for montant in montants if 5000 < montant <= 10000),
-                sum(1 for montant in montants if montant > 10000),
-            ]
             plt.figure()
             plt.bar(intervalles, comptes)
             plt.title("Histogramme des devis par intervalle de prix")
             plt.xlabel("Intervalle de prix (€)")
             plt.ylabel("Nombre de devis")
-            image_path = (
-                f"datas/outputs_png/histogram{datetime.now().strftime('%Y%m%d%H%M%S')}.png"
-            )
-            plt.savefig(image_path)
+            nom_image = f"histogram{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            image = io.BytesIO()
+            plt.savefig(image, format="png")
             plt.close()
-            return image_path
+            return self.archive.ajouter(nom_image, nom_image + ".png", image.getvalue())
         except Exception as e:
             print(f"Erreur : {e}")
             return None
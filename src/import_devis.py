@@ -0,0 +1,229 @@
+""" Module d'import en masse de demandes de devis (CSV ou JSONL), sans interface graphique. """
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import FICHIER_CLIENTS, FORME_COEFFICIENT, METAL_PROPERTIES, STOCKAGE
+from devis_manager import DevisManager
+from enregistrements import Client, _nombre
+from index_csv import IndexCSV
+from parallele import executer_borne
+from pdf_manager import PDFManager
+from schemas import SCHEMA_DEVIS
+
+# Nombre de PDF générés par tâche envoyée au pool
+TAILLE_LOT_PDF = 20
+# Nombre maximal de rejets détaillés affichés
+REJETS_AFFICHES = 20
+
+# PDFManager de chaque processus du pool (créé par _initialiser_processus)
+_pdf_manager = None
+
+
+def lire_demandes(chemin_fichier: str):
+    """
+    Lit un fichier de demandes de devis, au format CSV (en-têtes sur la
+    première ligne) ou JSONL (un objet JSON par ligne, extension .jsonl).
+    Les noms de colonnes sont réconciliés avec le schéma des devis.
+
+    Args:
+        chemin_fichier (str): Le chemin du fichier de demandes.
+
+    Yields:
+        tuple: (numéro de ligne, demande) ; la demande vaut None si la ligne
+        JSON est invalide.
+    """
+    with open(chemin_fichier, "r", newline="", encoding="utf-8") as fichier:
+        if chemin_fichier.endswith((".jsonl", ".json")):
+            for numero, ligne in enumerate(fichier, start=1):
+                if not ligne.strip():
+                    continue
+                try:
+                    demande = json.loads(ligne)
+                except json.JSONDecodeError:
+                    yield numero, None
+                    continue
+                yield numero, {
+                    SCHEMA_DEVIS.canonique(cle): valeur
+                    for cle, valeur in demande.items()
+                }
+        else:
+            lecteur = csv.DictReader(fichier)
+            if lecteur.fieldnames:
+                lecteur.fieldnames = SCHEMA_DEVIS.reconcilier(lecteur.fieldnames)
+            # La ligne 1 est celle des en-têtes
+            for numero, demande in enumerate(lecteur, start=2):
+                yield numero, demande
+
+
+def valider_demande(demande: dict, clients: set):
+    """
+    Vérifie une demande de devis et la convertit pour ajouter_devis_lot.
+
+    Args:
+        demande (dict): La demande lue dans le fichier.
+        clients (set): Les noms (normalisés) des clients connus.
+
+    Returns:
+        tuple: (demande convertie, None) si elle est valide, sinon
+        (None, motif du rejet).
+    """
+    if not isinstance(demande, dict):
+        return None, "ligne illisible"
+    nom_client = str(demande.get("Nom Client") or "")
+    if IndexCSV.normaliser(nom_client) not in clients:
+        return None, f"client inconnu : {nom_client!r}"
+    metal = demande.get("Métal")
+    if metal not in METAL_PROPERTIES:
+        return None, f"métal non trouvé : {metal!r}"
+    forme = demande.get("Forme")
+    if forme not in FORME_COEFFICIENT:
+        return None, f"forme de découpe non valide : {forme!r}"
+    quantite = _nombre(demande.get("Quantité (mm)"))
+    if quantite is None or quantite <= 0:
+        return None, f"quantité invalide : {demande.get('Quantité (mm)')!r}"
+    remise = _nombre(demande.get("Remise (%)") or 0)
+    if remise is None or not 0 <= remise <= 100:
+        return None, f"remise invalide : {demande.get('Remise (%)')!r}"
+    return {
+        "Nom Client": nom_client.strip(),
+        "Métal": metal,
+        "Quantité (mm)": quantite,
+        "Forme": forme,
+        "Remise (%)": remise,
+    }, None
+
+
+def _initialiser_processus():
+    """
+    Initialise un processus du pool : son propre stockage et son PDFManager,
+    avec les clients chargés une seule fois en mémoire.
+    """
+    global _pdf_manager
+    from sqlite_manager import creer_stockage
+
+    stockage = creer_stockage(os.getenv("STOCKAGE", STOCKAGE))
+    stockage.lire_enregistrements(FICHIER_CLIENTS, Client)
+    _pdf_manager = PDFManager(csv_manager=stockage)
+
+
+def _generer_pdfs(lot: list) -> list:
+    """Génère (ou retrouve en cache) les PDF d'un lot de devis dans un processus du pool."""
+    return [_pdf_manager.obtenir_pdf(devis) for devis in lot]
+
+
+def _lots_pdf(devis_importes: list):
+    """Regroupe les devis importés en tâches de génération de PDF."""
+    for debut in range(0, len(devis_importes), TAILLE_LOT_PDF):
+        yield None, devis_importes[debut : debut + TAILLE_LOT_PDF]
+
+
+def importer_devis(
+    stockage, chemin_fichier: str, processus: int = None, pdf: bool = True
+) -> dict:
+    """
+    Importe un fichier de demandes de devis : les clients sont vérifiés dans
+    clients.csv, les devis valides sont calculés et enregistrés en une seule
+    écriture, puis leurs PDF sont générés dans un pool de processus.
+
+    Args:
+        stockage (CSVManager): Le gestionnaire de stockage (CSV ou SQLite).
+        chemin_fichier (str): Le fichier de demandes (CSV ou JSONL).
+        processus (int, optional): Le nombre de processus générant les PDF.
+        pdf (bool, optional): Si False, aucun PDF n'est généré.
+
+    Returns:
+        dict: Les statistiques de l'import : nombre de demandes lues,
+        importées et rejetées, rejets détaillés, PDF générés et durées.
+    """
+    processus = processus or os.cpu_count() or 1
+    debut = time.perf_counter()
+    clients = {
+        IndexCSV.normaliser(client.nom)
+        for client in stockage.iter_enregistrements(FICHIER_CLIENTS, Client)
+    }
+    demandes, rejets, lues = [], [], 0
+    for numero, demande in lire_demandes(chemin_fichier):
+        lues += 1
+        valide, motif = valider_demande(demande, clients)
+        if valide is None:
+            rejets.append((numero, motif))
+        else:
+            demandes.append(valide)
+    devis_importes = DevisManager(stockage).ajouter_devis_lot(demandes)
+    duree_import = time.perf_counter() - debut
+
+    debut_pdf = time.perf_counter()
+    fichiers_pdf = []
+    if pdf and devis_importes:
+        os.makedirs("datas/outputs_pdf", exist_ok=True)
+        with ProcessPoolExecutor(
+            max_workers=processus, initializer=_initialiser_processus
+        ) as executeur:
+            for _, chemins in executer_borne(
+                executeur,
+                _generer_pdfs,
+                _lots_pdf(devis_importes),
+                2 * processus,
+            ):
+                fichiers_pdf.extend(chemins)
+    duree_pdf = time.perf_counter() - debut_pdf
+
+    return {
+        "lues": lues,
+        "importees": len(devis_importes),
+        "rejetees": len(rejets),
+        "rejets": rejets,
+        "pdf": len(fichiers_pdf),
+        "processus": processus,
+        "duree_import": duree_import,
+        "duree_pdf": duree_pdf,
+    }
+
+
+if __name__ == "__main__":
+    from sqlite_manager import creer_stockage
+
+    parser = argparse.ArgumentParser(
+        description="Importe des demandes de devis depuis un fichier CSV ou JSONL "
+        "(colonnes : Nom Client, Métal, Quantité (mm), Forme, Remise (%))."
+    )
+    parser.add_argument("fichier", help="Le fichier de demandes (.csv ou .jsonl)")
+    parser.add_argument("--processus", type=int, help="Taille du pool de processus")
+    parser.add_argument(
+        "--sans-pdf", action="store_true", help="Ne pas générer les PDF des devis"
+    )
+    arguments = parser.parse_args()
+
+    stats = importer_devis(
+        creer_stockage(os.getenv("STOCKAGE", STOCKAGE)),
+        arguments.fichier,
+        processus=arguments.processus,
+        pdf=not arguments.sans_pdf,
+    )
+    for numero, motif in stats["rejets"][:REJETS_AFFICHES]:
+        print(f"Ligne {numero} rejetée : {motif}", file=sys.stderr)
+    if stats["rejetees"] > REJETS_AFFICHES:
+        print(
+            f"... et {stats['rejetees'] - REJETS_AFFICHES} autres rejets",
+            file=sys.stderr,
+        )
+    print(
+        f"{stats['lues']} demandes lues : {stats['importees']} devis importés, "
+        f"{stats['rejetees']} rejetés"
+    )
+    print(
+        f"Calcul et enregistrement : {stats['duree_import']:.2f} s "
+        f"({stats['importees'] / max(stats['duree_import'], 1e-9):.0f} devis/s)"
+    )
+    if stats["pdf"]:
+        print(
+            f"PDF : {stats['pdf']} générés en {stats['duree_pdf']:.2f} s "
+            f"sur {stats['processus']} processus "
+            f"({stats['pdf'] / max(stats['duree_pdf'], 1e-9):.1f} PDF/s)"
+        )
@@ -0,0 +1,231 @@
+""" Module contenant la classe IndexCSV, index des positions des lignes d'un CSV. """
+
+import csv
+import json
+import os
+import threading
+
+from schemas import schema_pour
+
+
+class IndexCSV:
+    """
+    Index persistant associant la valeur normalisée d'une colonne d'un fichier CSV
+    aux positions (en octets) des lignes correspondantes.
+
+    L'index est stocké à côté du fichier CSV (fichier ".idx") :
+    - la première ligne contient les métadonnées (colonne indexée, en-têtes,
+      position de la première ligne de données, identité du fichier CSV) ;
+    - chaque ligne suivante contient "début<TAB>fin<TAB>clé" pour une ligne du CSV.
+
+    Comme le CSV n'est modifié que par ajout, l'index est complété en n'indexant
+    que la fin du fichier. Il est reconstruit entièrement si le fichier a été
+    réécrit : une réécriture remplace le fichier (os.replace), dont l'identité
+    (périphérique, inode) change.
+    """
+
+    def __init__(self, chemin_csv: str, colonne: str):
+        """
+        Initialise l'index d'une colonne d'un fichier CSV.
+
+        Args:
+            chemin_csv (str): Le chemin du fichier CSV indexé.
+            colonne (str): La colonne dont les valeurs servent de clé.
+        """
+        self.chemin_csv = chemin_csv
+        self.chemin_index = chemin_csv + ".idx"
+        self.colonne = colonne
+        self.en_tetes = None
+        self.positions = {}
+        # Position de fin de la dernière ligne indexée (None : index non chargé)
+        self.fin_indexee = None
+        self.derniere_ligne = None
+        # (périphérique, inode) du fichier CSV indexé
+        self.identite = None
+        # L'index peut être mis à jour depuis plusieurs threads (lectures, ajouts)
+        self._verrou = threading.RLock()
+
+    @staticmethod
+    def _identite(stat: os.stat_result) -> list:
+        """Retourne l'identité d'un fichier : [périphérique, inode]."""
+        return [stat.st_dev, stat.st_ino]
+
+    @staticmethod
+    def normaliser(valeur: str) -> str:
+        """Normalise une valeur de clé (espaces retirés, majuscules)."""
+        return (valeur or "").strip().upper()
+
+    def _lignes_brutes(self, fichier, debut: int):
+        """
+        Parcourt un fichier CSV ouvert en binaire à partir d'une position et
+        produit (début, fin, valeurs) pour chaque ligne. Les champs entre
+        guillemets contenant des retours à la ligne sont pris en charge.
+        """
+        fichier.seek(debut)
+        position = debut
+        while True:
+            brut = fichier.readline()
+            if not brut:
+                return
+            # Un nombre impair de guillemets signifie un champ sur plusieurs lignes
+            while brut.count(b'"') % 2:
+                suite = fichier.readline()
+                if not suite:
+                    break
+                brut += suite
+            fin = position + len(brut)
+            if not brut.endswith(b"\n"):
+                # Ligne en cours d'écriture : elle sera indexée plus tard
+                return
+            texte = brut.decode("utf-8")
+            if texte.strip():
+                valeurs = next(csv.reader([texte]))
+                yield position, fin, valeurs
+            position = fin
+
+    def _initialiser(self):
+        """Réinitialise l'index à partir de l'en-tête du fichier CSV."""
+        self.positions = {}
+        self.derniere_ligne = None
+        with open(self.chemin_csv, "rb") as fichier:
+            entete = fichier.readline()
+            self.identite = self._identite(os.fstat(fichier.fileno()))
+        self.en_tetes = next(csv.reader([entete.decode("utf-8")]), [])
+        schema = schema_pour(self.chemin_csv)
+        if schema is not None:
+            self.en_tetes = schema.reconcilier(self.en_tetes)
+        self.fin_indexee = len(entete)
+        meta = {
+            "colonne": self.colonne,
+            "en_tetes": self.en_tetes,
+            "debut": self.fin_indexee,
+            "fichier": self.identite,
+        }
+        # Remplacement en une seule opération : un autre processus lit soit
+        # l'ancien index, soit le nouveau
+        chemin_temporaire = f"{self.chemin_index}.{os.getpid()}.tmp"
+        with open(chemin_temporaire, "w", encoding="utf-8") as index:
+            index.write(json.dumps(meta, ensure_ascii=False) + "\n")
+        os.replace(chemin_temporaire, self.chemin_index)
+
+    def _charger(self) -> bool:
+        """
+        Charge l'index depuis son fichier. Retourne False si le fichier d'index
+        est absent ou ne correspond pas à la colonne indexée.
+        """
+        if not os.path.exists(self.chemin_index):
+            return False
+        with open(self.chemin_index, "r", encoding="utf-8") as index:
+            try:
+                meta = json.loads(index.readline())
+            except json.JSONDecodeError:
+                return False
+            if meta.get("colonne") != self.colonne:
+                return False
+            self.positions = {}
+            self.en_tetes = meta["en_tetes"]
+            self.fin_indexee = meta["debut"]
+            self.derniere_ligne = None
+            # Absente des index créés avant son ajout : l'index sera reconstruit
+            self.identite = meta.get("fichier")
+            # Deux processus peuvent avoir indexé la même fin de fichier
+            deja_vus = set()
+            for ligne in index:
+                morceaux = ligne.rstrip("\n").split("\t", 2)
+                if len(morceaux) != 3:
+                    # Ligne incomplète (écriture interrompue)
+                    continue
+                debut, fin, cle = int(morceaux[0]), int(morceaux[1]), morceaux[2]
+                if debut in deja_vus:
+                    continue
+                deja_vus.add(debut)
+                self.positions.setdefault(cle, []).append(debut)
+                if fin >= self.fin_indexee:
+                    self.fin_indexee = fin
+                    self.derniere_ligne = (debut, cle)
+        return True
+
+    def _coherent(self, stat: os.stat_result) -> bool:
+        """
+        Vérifie que le fichier CSV n'a pas été réécrit depuis son indexation :
+        il doit s'agir du même fichier (même inode), il ne doit pas avoir
+        rétréci et la dernière ligne indexée doit toujours porter la même clé.
+        """
+        if self.identite != self._identite(stat):
+            return False
+        if stat.st_size < self.fin_indexee:
+            return False
+        if self.derniere_ligne is None:
+            return True
+        debut, cle = self.derniere_ligne
+        with open(self.chemin_csv, "rb") as fichier:
+            for _, _, valeurs in self._lignes_brutes(fichier, debut):
+                return self._cle(valeurs) == cle
+        return False
+
+    def _cle(self, valeurs: list) -> str:
+        """Retourne la clé normalisée d'une ligne du CSV."""
+        position = self.en_tetes.index(self.colonne)
+        return self.normaliser(valeurs[position] if position < len(valeurs) else "")
+
+    def mettre_a_jour(self):
+        """
+        Met l'index à jour : charge l'index persistant si besoin, le reconstruit
+        s'il est périmé, puis indexe les lignes ajoutées à la fin du fichier.
+        """
+        with self._verrou:
+            self._mettre_a_jour()
+
+    def _mettre_a_jour(self):
+        """Met l'index à jour (verrou de l'index tenu)."""
+        if not os.path.exists(self.chemin_csv):
+            self.positions = {}
+            self.fin_indexee = None
+            return
+        stat = os.stat(self.chemin_csv)
+        taille = stat.st_size
+        if self.fin_indexee is None and not self._charger():
+            self._initialiser()
+        if not self._coherent(stat) or self.colonne not in self.en_tetes:
+            self._initialiser()
+        if taille == self.fin_indexee or self.colonne not in self.en_tetes:
+            return
+        nouvelles = []
+        with open(self.chemin_csv, "rb") as fichier:
+            for debut, fin, valeurs in self._lignes_brutes(fichier, self.fin_indexee):
+                cle = self._cle(valeurs)
+                self.positions.setdefault(cle, []).append(debut)
+                self.fin_indexee = fin
+                self.derniere_ligne = (debut, cle)
+                nouvelles.append(f"{debut}\t{fin}\t{cle}\n")
+        if nouvelles:
+            with open(self.chemin_index, "a", encoding="utf-8") as index:
+                index.writelines(nouvelles)
+
+    def lire(self, valeur: str) -> list:
+        """
+        Retourne les lignes du CSV dont la colonne indexée vaut la valeur donnée
+        (après normalisation), dans l'ordre du fichier.
+
+        Args:
+            valeur (str): La valeur recherchée.
+
+        Returns:
+            list: Les lignes correspondantes, sous forme de dictionnaires,
+            ou None si la colonne indexée n'existe pas dans le fichier.
+        """
+        with self._verrou:
+            self._mettre_a_jour()
+            if self.en_tetes is not None and self.colonne not in self.en_tetes:
+                return None
+            offsets = list(self.positions.get(self.normaliser(valeur), []))
+            en_tetes = self.en_tetes
+        if not offsets:
+            return []
+        lignes = []
+        with open(self.chemin_csv, "rb") as fichier:
+            for debut in offsets:
+                for _, _, valeurs in self._lignes_brutes(fichier, debut):
+                    lignes.append(dict(zip(en_tetes, valeurs)))
+                    break
+        return lignes
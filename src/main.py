@@ -5,11 +5,19 @@ import os
 import flet as ft
 
 from client_manager import ClientManager
-from constants import FICHIER_CLIENTS, FORME_COEFFICIENT, METAL_PROPERTIES
-from csv_manager import CSVManager
+from constants import (
+    FICHIER_CLIENTS,
+    FORME_COEFFICIENT,
+    METAL_PROPERTIES,
+    STOCKAGE,
+    TAILLE_CACHE_DEVIS,
+)
 from devis_manager import DevisManager
+from ecriture_differee import EcritureDifferee
 from histogramme_manager import HistogrammeManager
 from pdf_manager import PDFManager
+from pipeline_devis import CHIFFRE, ECHEC, ENREGISTRE, PDF_PRET, PipelineDevis
+from sqlite_manager import creer_stockage
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,12 +36,24 @@ class Main:
 
     def __init__(self):
         """Initialisation de l'application."""
-        # Instanciation de vos managers
-        self.csv_manager = CSVManager()
+        # Instanciation de vos managers (stockage CSV ou SQLite selon la configuration)
+        self.csv_manager = creer_stockage(os.getenv("STOCKAGE", STOCKAGE))
         self.pdf_manager = PDFManager(csv_manager=self.csv_manager)
-        self.devis_manager = DevisManager(csv_manager=self.csv_manager)
+        # Les devis sont écrits par lots en arrière-plan (et à la fermeture)
+        self.ecriture_devis = EcritureDifferee(self.csv_manager)
+        self.devis_manager = DevisManager(
+            csv_manager=self.csv_manager,
+            ecriture=self.ecriture_devis,
+            taille_cache=TAILLE_CACHE_DEVIS,
+        )
+        # Les devis sont chiffrés, enregistrés et mis en PDF hors du thread de l'interface
+        self.pipeline_devis = PipelineDevis(
+            devis_manager=self.devis_manager, pdf_manager=self.pdf_manager
+        )
         self.client_manager = ClientManager(csv_manager=self.csv_manager)
-        self.histogramme_manager = HistogrammeManager(csv_manager=self.csv_manager)
+        self.histogramme_manager = HistogrammeManager(
+            csv_manager=self.csv_manager, devis_manager=self.devis_manager
+        )
 
         # La page Flet
         self.page = None
@@ -60,6 +80,10 @@ class Main:
         self.forme_dropdown = None
         self.devis_remise = None
         self.devis_message = None
+        self.devis_progression = None
+        self.devis_pdf_button = None
+        # Devis dont le PDF peut être demandé (dernier ajouté ou sélectionné)
+        self.devis_selectionne = None
         self.histogram_image = None
         self.devis_form_container = None
 
@@ -174,26 +198,30 @@ class Main:
         self.page.update()
 
     def on_ajouter_devis(self, e=None):
-        """Gère l'ajout d'un devis et la génération du PDF."""
+        """
+        Gère l'ajout d'un devis : la demande est soumise au pipeline, qui
+        chiffre et enregistre le devis en arrière-plan. Le PDF n'est généré
+        que lorsqu'il est demandé (on_voir_pdf).
+        """
         try:
             metal = self.metal_dropdown.value
             quantite_ml = float(self.devis_quantite.value)
             forme = self.forme_dropdown.value
             remise = float(self.devis_remise.value)
 
-            devis_data = self.devis_manager.ajouter_devis(
-                self.devis_nom_client.value, metal, quantite_ml, forme, remise
+            self.pipeline_devis.soumettre(
+                self.devis_nom_client.value,
+                metal,
+                quantite_ml,
+                forme,
+                remise,
+                suivi=self.on_suivi_devis,
+                pdf=False,
             )
-
-            pdf_file = self.pdf_manager.generer_pdf(devis_data)
-            self.devis_message.value = (
-                "Devis ajouté avec succès !\n"
-                f"Prix Total: {devis_data['Prix Total']:.2f} €\n"
-                f"PDF généré: {pdf_file}"
-            )
-
-            self.page.snack_bar = ft.SnackBar(ft.Text("Devis ajouté et PDF généré."))
-            self.page.snack_bar.open = True
+            self.devis_message.value = "Calcul du devis..."
+            self.devis_progression.value = 0
+            self.devis_progression.visible = True
+            self.devis_pdf_button.visible = False
             self.page.update()
 
         except Exception as ex:
@@ -201,6 +229,62 @@ class Main:
             self.page.snack_bar.open = True
             self.page.update()
 
+    def on_voir_pdf(self, e=None):
+        """
+        Demande le PDF du devis sélectionné (dernier devis ajouté ou devis
+        choisi dans la liste) : il est généré s'il n'existe pas encore, puis
+        ouvert.
+        """
+        if self.devis_selectionne is None:
+            return
+        self.pipeline_devis.demander_pdf(
+            self.devis_selectionne, suivi=self.on_suivi_devis
+        )
+        self.devis_progression.value = 0
+        self.devis_progression.visible = True
+        self.page.update()
+
+    def on_suivi_devis(self, tache):
+        """
+        Affiche l'avancement d'une tâche du pipeline (appelée depuis un thread
+        du pipeline à chaque changement d'état).
+        """
+        self.devis_progression.value = tache.progression
+        if tache.etat == tache.etats[-1] or tache.etat == ECHEC:
+            self.devis_progression.visible = False
+        if tache.etat == CHIFFRE:
+            self.devis_message.value = (
+                f"Prix Total: {tache.devis['Prix Total']:.2f} €\n"
+                "Enregistrement du devis..."
+            )
+        elif tache.etat == ENREGISTRE and tache.demande is not None:
+            # Le devis est confirmé dès son enregistrement
+            self.devis_selectionne = tache.devis
+            self.devis_message.value = (
+                f"Devis n° {tache.devis['Numéro']} ajouté avec succès !\n"
+                f"Prix Total: {tache.devis['Prix Total']:.2f} €"
+            )
+            self.devis_pdf_button.visible = True
+            self.page.snack_bar = ft.SnackBar(
+                ft.Text(f"Devis n° {tache.devis['Numéro']} enregistré.")
+            )
+            self.page.snack_bar.open = True
+        elif tache.etat == PDF_PRET:
+            self.page.snack_bar = ft.SnackBar(
+                ft.Text(f"PDF disponible : {tache.fichier_pdf}")
+            )
+            self.page.snack_bar.open = True
+            self.page.launch_url(Path(tache.fichier_pdf).resolve().as_uri())
+        elif tache.etat == ECHEC:
+            # Le message en cours ("Calcul du devis...") est remplacé par l'erreur
+            if tache.etat_echec == ENREGISTRE:
+                self.devis_message.value = f"Échec du PDF : {tache.erreur}"
+            else:
+                self.devis_message.value = f"Échec du devis : {tache.erreur}"
+            self.page.snack_bar = ft.SnackBar(ft.Text(f"Erreur: {tache.erreur}"))
+            self.page.snack_bar.open = True
+        self.page.update()
+
     def on_generer_histogramme(self, e=None):
         """Génère l'histogramme depuis les données du CSV."""
         image_path = self.histogramme_manager.generer_histogramme_image()
@@ -222,6 +306,7 @@ class Main:
         self.forme_dropdown.value = "Droite"
         self.devis_remise.value = ""
         self.devis_message.value = ""
+        self.devis_pdf_button.visible = False
         self.page.update()
 
     # --- MÉTHODES POUR LA GESTION DES CLIENTS (ADMIN) ---
@@ -291,21 +376,16 @@ class Main:
     def load_devis_dropdown(self, client_name: str):
         """
         Charge dans le Dropdown tous les devis enregistrés pour le client indiqué,
-        en filtrant le fichier devis.csv par le champ 'Nom Client'.
+        en lisant les partitions de devis indexées par 'Nom Client'.
         Chaque option est formatée avec la date, le métal et le prix total.
         """
-        devis_list = self.csv_manager.read_csv("datas/inputs_csv/devis.csv")
-        # Filtrer les devis dont le nom client correspond (en ignorant la casse)
-        devis_for_client = [
-            devis
-            for devis in devis_list
-            if devis["Nom Client"].strip().upper() == client_name.strip().upper()
-        ]
+        # Devis du client (en ignorant la casse), lus via l'index par client
+        devis_for_client = self.devis_manager.lister_devis_client(client_name)
         options = []
         for i, devis in enumerate(devis_for_client):
             # Format d'affichage : Date - Métal - Prix Total €
             option_text = (
-                f"{devis['Date']} - {devis['Matériau']} - {devis['Prix Total']} €"
+                f"{devis['Date']} - {devis['Métal']} - {devis['Prix Total']} €"
             )
             options.append(ft.dropdown.Option(key=f"devis_{i}", text=option_text))
         self.devis_dropdown.options = options
@@ -331,16 +411,11 @@ class Main:
         index_str = selected_key.split("_")[1]  # ex: "0"
         index = int(index_str)
 
-        # Récupération de tous les devis du fichier CSV
-        devis_list = self.csv_manager.read_csv("datas/inputs_csv/devis.csv")
-
         # Nom du client actuellement dans le champ "Nom Client"
         client_name = self.devis_nom_client.value.strip().upper()
 
         # Filtrer les devis du client actuellement recherché
-        devis_for_client = [
-            d for d in devis_list if d["Nom Client"].strip().upper() == client_name
-        ]
+        devis_for_client = self.devis_manager.lister_devis_client(client_name)
 
         # Vérifier que l'index est valide
         if index < 0 or index >= len(devis_for_client):
@@ -350,15 +425,13 @@ class Main:
 
         # Extraire le devis correspondant
         selected_devis = devis_for_client[index]
+        self.devis_selectionne = selected_devis
 
-        # Récupérer les infos
-        # (Adaptez les noms de colonnes selon ceux définis dans votre CSV)
-        material = selected_devis.get("Matériau", "N/A")
-        quantite = selected_devis.get(
-            "Quantité (mm)", selected_devis.get("Quantité", "")
-        )
-        prix = selected_devis.get("Prix Total", "0")
-        forme = selected_devis.get("Forme", "")
+        # Récupérer les infos (colonnes canoniques, cf. schemas.py)
+        material = selected_devis["Métal"]
+        quantite = selected_devis["Quantité (mm)"]
+        prix = selected_devis["Prix Total"]
+        forme = selected_devis["Forme"]
 
         # Composer le texte à afficher
         self.devis_info_text.value = (
@@ -631,7 +704,12 @@ class Main:
         # 5) Conteneur qui affichera les informations du devis sélectionné
         self.devis_info_text = ft.Text("")
         self.devis_info_container = ft.Container(
-            content=self.devis_info_text,
+            content=ft.Column(
+                [
+                    self.devis_info_text,
+                    ft.TextButton("Voir le PDF", on_click=self.on_voir_pdf),
+                ]
+            ),
             border=ft.border.all(1, ft.colors.BLACK),
             border_radius=5,
             padding=10,
@@ -658,6 +736,10 @@ class Main:
         )
         self.devis_remise = ft.TextField(label="Remise client (%)", width=300)
         self.devis_message = ft.Text("")
+        self.devis_progression = ft.ProgressBar(width=300, value=0, visible=False)
+        self.devis_pdf_button = ft.ElevatedButton(
+            "Voir le PDF", on_click=self.on_voir_pdf, visible=False
+        )
 
         # 7) Colonne regroupant les champs du formulaire (sans le bouton histogramme)
         devis_characteristics = ft.Column(
@@ -668,7 +750,9 @@ class Main:
                 self.devis_remise,
                 ft.ElevatedButton("Ajouter Devis", on_click=self.on_ajouter_devis),
                 ft.ElevatedButton("Reset", on_click=self.on_reset_devis),
+                self.devis_progression,
                 self.devis_message,
+                self.devis_pdf_button,
             ],
             spacing=10,
             alignment="start",
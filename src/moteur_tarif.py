@@ -0,0 +1,312 @@
+""" Module contenant la classe MoteurTarif, table de tarification précompilée par (métal, forme). """
+
+from constants import (
+    FORME_COEFFICIENT,
+    FRAIS_FIXES,
+    METAL_PROPERTIES,
+    TARIF_MACHINE,
+    TARIF_OPERATEUR,
+    TVA,
+)
+
+# Marge fixe appliquée à chaque devis
+MARGE = 50 / 100
+
+# Écart relatif maximal toléré entre la forme affine et le calcul détaillé
+# (l'écart mesuré est inférieur à 1e-15)
+TOLERANCE_ARRONDI = 1e-12
+
+
+def signature_tarifs(
+    props: dict,
+    coef_forme: float,
+    tva: float = TVA,
+    tarif_machine: float = TARIF_MACHINE,
+    tarif_operateur: float = TARIF_OPERATEUR,
+    frais_fixes: float = FRAIS_FIXES,
+) -> tuple:
+    """
+    Retourne les constantes de tarification d'un couple (métal, forme).
+    Un calcul n'est valide que si ces constantes n'ont pas changé depuis.
+
+    Args:
+        props (dict): Les propriétés du métal.
+        coef_forme (float): Le coefficient de la forme de découpe.
+        tva (float, optional): Le taux de TVA.
+        tarif_machine (float, optional): Le tarif horaire de la machine.
+        tarif_operateur (float, optional): Le tarif horaire de l'opérateur.
+        frais_fixes (float, optional): Les frais fixes d'un devis.
+
+    Returns:
+        tuple: Les constantes utilisées pour chiffrer le couple.
+    """
+    return (
+        tva,
+        tarif_machine,
+        tarif_operateur,
+        frais_fixes,
+        tuple(props.values()),
+        coef_forme,
+    )
+
+
+class MoteurTarif:
+    """
+    Moteur de tarification précompilé, utilisé par DevisManager.calculer_devis.
+
+    Pour un couple (métal, forme), le prix est affine en la quantité : les
+    constantes de chaque couple sont combinées une seule fois, à la création du
+    moteur, en une pente et une ordonnée à l'origine. Un devis se calcule alors
+    avec une recherche dans la table et une multiplication-addition.
+
+    La forme affine n'effectue pas les opérations dans le même ordre que le
+    calcul détaillé (calculer_devis_batch) : l'écart relatif est de l'ordre de
+    1e-15, ce qui ne change l'arrondi à 3 décimales que si la valeur est à la
+    limite entre deux arrondis. Ces valeurs (rares), ainsi que les quantités
+    négatives et les remises hors de [0, 100], sont recalculées avec le calcul
+    détaillé : les résultats sont donc identiques au bit près.
+    """
+
+    def __init__(
+        self,
+        metal_properties: dict = METAL_PROPERTIES,
+        forme_coefficient: dict = FORME_COEFFICIENT,
+        tva: float = TVA,
+        tarif_machine: float = TARIF_MACHINE,
+        tarif_operateur: float = TARIF_OPERATEUR,
+        frais_fixes: float = FRAIS_FIXES,
+    ):
+        """
+        Précompile la table de tarification.
+
+        Args:
+            metal_properties (dict, optional): Les propriétés de chaque métal.
+            forme_coefficient (dict, optional): Le coefficient de chaque forme.
+            tva (float, optional): Le taux de TVA.
+            tarif_machine (float, optional): Le tarif horaire de la machine.
+            tarif_operateur (float, optional): Le tarif horaire de l'opérateur.
+            frais_fixes (float, optional): Les frais fixes d'un devis.
+        """
+        self.metaux = set(metal_properties)
+        self.frais_fixes = frais_fixes
+        self.facteur_tva = 1 + tva
+        # (métal, forme) -> (signature des tarifs, pente TTC, ordonnée TTC,
+        #                    pente des matériaux, pente de la découpe,
+        #                    constantes du calcul détaillé)
+        self.table = {}
+        for metal, props in metal_properties.items():
+            # Coût des matériaux par mm : (q / 1000) * coût unitaire * coef
+            pente_materiaux = props["cout_materiaux"] * props["coef"] / 1000
+            # Même somme, dans le même ordre, que calculer_devis_batch
+            tarif_horaire = tarif_machine + tarif_operateur + props["usure"]
+            # Coût de découpe par mm, hors forme : (q / vitesse / 60) * tarif
+            pente_decoupe_base = tarif_horaire / (props["vitesse"] * 60)
+            for forme, coef_forme in forme_coefficient.items():
+                pente_decoupe = pente_decoupe_base * coef_forme
+                self.table[(metal, forme)] = (
+                    signature_tarifs(
+                        props,
+                        coef_forme,
+                        tva,
+                        tarif_machine,
+                        tarif_operateur,
+                        frais_fixes,
+                    ),
+                    (pente_materiaux + pente_decoupe) * self.facteur_tva,
+                    frais_fixes * self.facteur_tva,
+                    pente_materiaux,
+                    pente_decoupe,
+                    (
+                        props["vitesse"],
+                        tarif_horaire,
+                        coef_forme,
+                        props["cout_materiaux"],
+                        props["coef"],
+                    ),
+                )
+
+    def _introuvable(self, metal: str, forme: str):
+        """Lève l'erreur d'un couple (métal, forme) absent de la table."""
+        if metal not in self.metaux:
+            raise ValueError("Métal non trouvé")
+        raise ValueError("Forme de découpe non valide")
+
+    def signature(self, metal: str, forme: str):
+        """
+        Retourne les constantes avec lesquelles un couple (métal, forme) a été
+        compilé, ou None s'il est absent de la table.
+        """
+        entree = self.table.get((metal, forme))
+        return None if entree is None else entree[0]
+
+    def _calculer_detail(
+        self, constantes: tuple, quantite_ml: float, remise_client: float
+    ) -> dict:
+        """
+        Calcule un devis avec les mêmes opérations, dans le même ordre, que
+        calculer_devis_batch.
+        """
+        vitesse, tarif_horaire, coef_forme, cout_materiaux_unit, coef_metal = constantes
+        remise_client = remise_client / 100
+        temps_decoupe = (quantite_ml / vitesse) / 60
+        cout_decoupe = temps_decoupe * tarif_horaire * coef_forme
+        cout_materiaux = (quantite_ml / 1000) * cout_materiaux_unit * coef_metal
+        base_cost = cout_materiaux + cout_decoupe + self.frais_fixes
+        prix_general = base_cost + (base_cost * MARGE) - (base_cost * remise_client)
+        return {
+            "Coût Matériaux": round(cout_materiaux, 3),
+            "Coût Découpe": round(cout_decoupe, 3),
+            "Frais Fixes": self.frais_fixes,
+            "Prix Total": round(prix_general * self.facteur_tva, 3),
+        }
+
+    def prix_total(
+        self, metal: str, quantite_ml: float, forme: str, remise_client: float
+    ) -> float:
+        """
+        Retourne le prix total TTC d'une découpe (arrondi à 3 décimales).
+
+        Args:
+            metal (str): Le type de métal à découper.
+            quantite_ml (float): La quantité en millimètres linéaires.
+            forme (str): La forme de découpe.
+            remise_client (float): La remise client en pourcentage.
+
+        Raises:
+            ValueError: Si le métal ou la forme de découpe n'est pas valide.
+        """
+        _, pente, ordonnee, _, _, constantes = self.table.get(
+            (metal, forme)
+        ) or self._introuvable(metal, forme)
+        if quantite_ml >= 0 and 0 <= remise_client <= 100:
+            prix = (pente * quantite_ml + ordonnee) * (1 + MARGE - remise_client / 100)
+            prix_total = round(prix, 3)
+            if abs(abs(prix - prix_total) - 0.0005) > TOLERANCE_ARRONDI * prix:
+                return prix_total
+        return self._calculer_detail(constantes, quantite_ml, remise_client)[
+            "Prix Total"
+        ]
+
+    def calculer(
+        self, metal: str, quantite_ml: float, forme: str, remise_client: float
+    ) -> dict:
+        """
+        Calcule le devis d'une découpe.
+
+        Args:
+            metal (str): Le type de métal à découper.
+            quantite_ml (float): La quantité en millimètres linéaires.
+            forme (str): La forme de découpe.
+            remise_client (float): La remise client en pourcentage.
+
+        Returns:
+            dict: "Coût Matériaux", "Coût Découpe", "Frais Fixes" et "Prix Total".
+
+        Raises:
+            ValueError: Si le métal ou la forme de découpe n'est pas valide.
+        """
+        _, pente, ordonnee, pente_materiaux, pente_decoupe, constantes = self.table.get(
+            (metal, forme)
+        ) or self._introuvable(metal, forme)
+        if quantite_ml >= 0 and 0 <= remise_client <= 100:
+            prix = (pente * quantite_ml + ordonnee) * (1 + MARGE - remise_client / 100)
+            cout_materiaux = pente_materiaux * quantite_ml
+            cout_decoupe = pente_decoupe * quantite_ml
+            prix_total = round(prix, 3)
+            arrondi_materiaux = round(cout_materiaux, 3)
+            arrondi_decoupe = round(cout_decoupe, 3)
+            # Aucune valeur à la limite entre deux arrondis : même résultat
+            # que le calcul détaillé
+            if (
+                abs(abs(prix - prix_total) - 0.0005) > TOLERANCE_ARRONDI * prix
+                and abs(abs(cout_materiaux - arrondi_materiaux) - 0.0005)
+                > TOLERANCE_ARRONDI * cout_materiaux
+                and abs(abs(cout_decoupe - arrondi_decoupe) - 0.0005)
+                > TOLERANCE_ARRONDI * cout_decoupe
+            ):
+                return {
+                    "Coût Matériaux": arrondi_materiaux,
+                    "Coût Découpe": arrondi_decoupe,
+                    "Frais Fixes": self.frais_fixes,
+                    "Prix Total": prix_total,
+                }
+        return self._calculer_detail(constantes, quantite_ml, remise_client)
+
+
+if __name__ == "__main__":
+    # Microbenchmark : calcul d'origine de calculer_devis contre la table précompilée
+    import random
+    import timeit
+
+    from devis_manager import DevisManager
+
+    def calculer_devis_origine(metal, quantite_ml, forme, remise_client):
+        """Calcul de DevisManager.calculer_devis avant la table précompilée."""
+        marge = 50 / 100
+        remise_client = remise_client / 100
+        props = METAL_PROPERTIES.get(metal)
+        if not props:
+            raise ValueError("Métal non trouvé")
+        coef_forme = FORME_COEFFICIENT.get(forme)
+        if coef_forme is None:
+            raise ValueError("Forme de découpe non valide")
+        temps_decoupe = (quantite_ml / props["vitesse"]) / 60
+        cout_decoupe = (
+            temps_decoupe
+            * (TARIF_MACHINE + TARIF_OPERATEUR + props["usure"])
+            * coef_forme
+        )
+        cout_materiaux = (quantite_ml / 1000) * props["cout_materiaux"] * props["coef"]
+        base_cost = cout_materiaux + cout_decoupe + FRAIS_FIXES
+        prix_general = base_cost + (base_cost * marge) - (base_cost * remise_client)
+        return {
+            "Coût Matériaux": round(cout_materiaux, 3),
+            "Coût Découpe": round(cout_decoupe, 3),
+            "Frais Fixes": FRAIS_FIXES,
+            "Prix Total": round(prix_general * (1 + TVA), 3),
+        }
+
+    moteur = MoteurTarif()
+    devis_manager = DevisManager(csv_manager=None)
+    generateur = random.Random(0)
+    cas = [
+        (
+            generateur.choice(list(METAL_PROPERTIES)),
+            generateur.choice(
+                [float(generateur.randint(1, 100000)), generateur.uniform(0, 1e6)]
+            ),
+            generateur.choice(list(FORME_COEFFICIENT)),
+            generateur.choice(
+                [float(generateur.randint(0, 30)), generateur.uniform(0, 100)]
+            ),
+        )
+        for _ in range(20000)
+    ]
+
+    def mesurer(fonction) -> float:
+        """Retourne la durée moyenne d'un appel, en microsecondes."""
+        duree = min(
+            timeit.repeat(lambda: [fonction(*c) for c in cas], number=5, repeat=5)
+        )
+        return duree / (5 * len(cas)) * 1e6
+
+    print(f"Calcul d'origine : {mesurer(calculer_devis_origine):.3f} µs/devis")
+    print(f"MoteurTarif.calculer : {mesurer(moteur.calculer):.3f} µs/devis")
+    print(f"MoteurTarif.prix_total : {mesurer(moteur.prix_total):.3f} µs/devis")
+    print(
+        "DevisManager.calculer_devis : "
+        f"{mesurer(devis_manager.calculer_devis):.3f} µs/devis"
+    )
+
+    differents = sum(
+        moteur.calculer(*c) != calculer_devis_origine(*c)
+        or moteur.prix_total(*c) != calculer_devis_origine(*c)["Prix Total"]
+        for c in cas
+    )
+    print(f"Devis différents du calcul d'origine : {differents} / {len(cas)}")
+    lot = devis_manager.calculer_devis_batch(*zip(*cas))
+    differents = sum(
+        any(moteur.calculer(*c)[colonne] != float(lot[colonne][i]) for colonne in lot)
+        for i, c in enumerate(cas)
+    )
+    print(f"Devis différents de calculer_devis_batch : {differents} / {len(cas)}")
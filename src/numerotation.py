@@ -0,0 +1,105 @@
+""" Module contenant la classe AllocateurNumeros, numérotation des devis. """
+
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows : la numérotation n'est protégée qu'entre threads
+    fcntl = None
+
+from constants import FICHIER_COMPTEUR_DEVIS, TAILLE_BLOC_NUMEROS
+
+
+class AllocateurNumeros:
+    """
+    Allocateur de numéros de devis uniques et croissants.
+
+    Le dernier numéro réservé est enregistré dans un fichier compteur, modifié
+    sous verrou (fcntl) : plusieurs processus peuvent allouer des numéros sans
+    jamais obtenir deux fois le même. Pour ne pas verrouiller le fichier à
+    chaque devis, chaque allocateur réserve des blocs de numéros consécutifs
+    et les distribue ensuite en mémoire.
+
+    Les numéros sont croissants dans un processus ; entre processus, ils sont
+    uniques mais peuvent être entrelacés, et les numéros réservés mais non
+    utilisés à l'arrêt d'un processus sont perdus (trous dans la numérotation).
+    """
+
+    def __init__(
+        self,
+        chemin_compteur: str = FICHIER_COMPTEUR_DEVIS,
+        taille_bloc: int = TAILLE_BLOC_NUMEROS,
+    ):
+        """
+        Initialise l'allocateur. Le fichier compteur n'est lu qu'à la
+        première réservation.
+
+        Args:
+            chemin_compteur (str, optional): Le fichier contenant le dernier
+            numéro réservé.
+            taille_bloc (int, optional): Le nombre de numéros réservés à la fois.
+        """
+        self.chemin_compteur = chemin_compteur
+        self.taille_bloc = taille_bloc
+        # Numéros réservés et pas encore distribués : [suivant, fin[
+        self._suivant = 0
+        self._fin = 0
+        self._verrou = threading.Lock()
+
+    def _reserver_bloc(self, taille: int) -> int:
+        """
+        Réserve un bloc de numéros dans le fichier compteur et retourne le
+        premier numéro du bloc.
+        """
+        dossier = os.path.dirname(self.chemin_compteur)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        with open(self.chemin_compteur + ".lock", "a") as verrou:
+            if fcntl is not None:
+                fcntl.flock(verrou, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.chemin_compteur, "r", encoding="utf-8") as compteur:
+                        dernier = int(compteur.read().strip() or 0)
+                except FileNotFoundError:
+                    dernier = 0
+                # Le nouveau compteur est forcé sur le disque avant de remplacer
+                # l'ancien : un numéro distribué n'est jamais réservé à nouveau
+                chemin_temporaire = f"{self.chemin_compteur}.{os.getpid()}.tmp"
+                with open(chemin_temporaire, "w", encoding="utf-8") as compteur:
+                    compteur.write(f"{dernier + taille}\n")
+                    compteur.flush()
+                    os.fsync(compteur.fileno())
+                os.replace(chemin_temporaire, self.chemin_compteur)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(verrou, fcntl.LOCK_UN)
+        return dernier + 1
+
+    def allouer(self, nombre: int = 1) -> list:
+        """
+        Alloue des numéros de devis.
+
+        Args:
+            nombre (int, optional): Le nombre de numéros à allouer.
+
+        Returns:
+            list: Les numéros alloués, croissants.
+        """
+        numeros = []
+        with self._verrou:
+            while len(numeros) < nombre:
+                if self._suivant >= self._fin:
+                    # Un grand lot est réservé d'un seul bloc
+                    taille = max(self.taille_bloc, nombre - len(numeros))
+                    self._suivant = self._reserver_bloc(taille)
+                    self._fin = self._suivant + taille
+                pris = min(nombre - len(numeros), self._fin - self._suivant)
+                numeros.extend(range(self._suivant, self._suivant + pris))
+                self._suivant += pris
+        return numeros
+
+    def suivant(self) -> int:
+        """Alloue et retourne un numéro de devis."""
+        return self.allouer(1)[0]
@@ -0,0 +1,32 @@
+""" Module contenant les utilitaires d'exécution parallèle (pool de processus). """
+
+from collections import deque
+
+
+def executer_borne(executeur, fonction, taches, en_cours_max: int):
+    """
+    Exécute fonction(argument) pour chaque tâche dans un pool, sans jamais
+    avoir plus de en_cours_max tâches soumises et non terminées : les tâches
+    sont lues au fur et à mesure, la mémoire utilisée reste bornée même pour
+    un très grand nombre de tâches.
+
+    Args:
+        executeur (concurrent.futures.Executor): Le pool d'exécution.
+        fonction (callable): La fonction exécutée (picklable pour un pool de
+        processus).
+        taches (iterable): Des couples (contexte, argument). Seul l'argument
+        est transmis au pool ; le contexte reste dans le processus appelant.
+        en_cours_max (int): Le nombre maximal de tâches en cours.
+
+    Yields:
+        tuple: (contexte, résultat) pour chaque tâche, dans l'ordre des tâches.
+    """
+    en_cours = deque()
+    for contexte, argument in taches:
+        en_cours.append((contexte, executeur.submit(fonction, argument)))
+        if len(en_cours) >= en_cours_max:
+            contexte, futur = en_cours.popleft()
+            yield contexte, futur.result()
+    while en_cours:
+        contexte, futur = en_cours.popleft()
+        yield contexte, futur.result()
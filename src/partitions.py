@@ -0,0 +1,232 @@
+""" Module de partitionnement mensuel des devis (un fichier CSV par mois). """
+
+import csv
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from constants import DOSSIER_DEVIS, FICHIER_DEVIS
+from schemas import SCHEMA_DEVIS
+
+# Mois attribué aux devis dont la date est absente ou invalide
+MOIS_INCONNU = "0000-00"
+# Nombre de lignes gardées en mémoire par mois avant écriture, lors du découpage
+TAILLE_TAMPON = 1000
+# Marqueur écrit au début du découpage : devis.csv n'est alors plus lu
+MARQUEUR_PARTITIONNEMENT = FICHIER_DEVIS + ".partitionnement"
+
+_FORMAT_PARTITION = re.compile(r"^devis_(\d{4}-\d{2})\.csv$")
+
+
+def mois_de(date: str) -> str:
+    """
+    Retourne le mois ("AAAA-MM") d'une date au format "AAAA-MM-JJ" ou "AAAA-MM".
+
+    Args:
+        date (str): La date du devis.
+
+    Returns:
+        str: Le mois, ou MOIS_INCONNU si la date n'est pas reconnue.
+    """
+    date = (date or "").strip()
+    if re.match(r"^\d{4}-\d{2}(-\d{2})?$", date):
+        return date[:7]
+    return MOIS_INCONNU
+
+
+def chemin_partition(date: str) -> str:
+    """
+    Retourne le chemin de la partition contenant les devis d'une date.
+
+    Args:
+        date (str): La date du devis ("AAAA-MM-JJ").
+
+    Returns:
+        str: Le chemin du fichier CSV du mois correspondant.
+    """
+    return os.path.join(DOSSIER_DEVIS, f"devis_{mois_de(date)}.csv")
+
+
+def lister_partitions(csv_manager, debut: str = None, fin: str = None) -> list:
+    """
+    Retourne les fichiers de devis à lire pour une période, dans l'ordre
+    chronologique. Les partitions hors de la période ne sont pas ouvertes.
+
+    L'ancien fichier devis.csv, tant que son découpage n'a pas commencé, est
+    toujours inclus en premier : ses devis couvrent une période inconnue.
+
+    Args:
+        csv_manager (CSVManager): Le gestionnaire de stockage.
+        debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+        fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+
+    Returns:
+        list: Les chemins des fichiers à lire.
+    """
+    mois_debut = mois_de(debut) if debut else None
+    mois_fin = mois_de(fin) if fin else None
+    fichiers = []
+    if csv_manager.existe(FICHIER_DEVIS) and _lire_marqueur() is None:
+        fichiers.append(FICHIER_DEVIS)
+    for chemin in csv_manager.lister_fichiers(DOSSIER_DEVIS):
+        correspondance = _FORMAT_PARTITION.match(os.path.basename(chemin))
+        if correspondance is None:
+            continue
+        mois = correspondance.group(1)
+        if mois_debut is not None and mois < mois_debut:
+            continue
+        if mois_fin is not None and mois > mois_fin:
+            continue
+        fichiers.append(chemin)
+    return fichiers
+
+
+def dans_periode(date: str, debut: str = None, fin: str = None) -> bool:
+    """
+    Indique si une date ("AAAA-MM-JJ") est comprise dans une période.
+    Une borne "AAAA-MM" couvre le mois entier.
+    """
+    date = (date or "").strip()
+    if debut and date < debut:
+        return False
+    if fin and date[: len(fin)] > fin:
+        return False
+    return True
+
+
+def _lire_marqueur():
+    """Retourne l'état du découpage de devis.csv, ou None s'il n'a pas commencé."""
+    try:
+        with open(MARQUEUR_PARTITIONNEMENT, "r", encoding="utf-8") as fichier:
+            return json.load(fichier)
+    except FileNotFoundError:
+        return None
+
+
+def _ecrire_marqueur(termine: bool):
+    """Écrit l'état du découpage de devis.csv (fichier temporaire puis os.replace)."""
+    etat = {"debut": datetime.now().isoformat(timespec="seconds"), "termine": termine}
+    precedent = _lire_marqueur()
+    if precedent is not None:
+        etat["debut"] = precedent.get("debut", etat["debut"])
+    temporaire = MARQUEUR_PARTITIONNEMENT + ".tmp"
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        json.dump(etat, fichier)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, MARQUEUR_PARTITIONNEMENT)
+
+
+def _mettre_de_cote(chemin: str, lignes: list):
+    """Ajoute des lignes au fichier temporaire d'un mois."""
+    nouveau = not os.path.exists(chemin)
+    with open(chemin, "a", newline="", encoding="utf-8") as fichier:
+        ecrivain = csv.DictWriter(fichier, fieldnames=list(lignes[0]))
+        if nouveau:
+            ecrivain.writeheader()
+        ecrivain.writerows(lignes)
+
+
+def _fusionner(csv_manager, chemin: str, anciennes: list) -> int:
+    """
+    Fusionne les devis d'un mois issus de devis.csv avec ceux déjà présents
+    dans sa partition, triés par date, puis remplace la partition en une seule
+    opération. Les devis déjà fusionnés par une exécution interrompue ne sont
+    pas ajoutés une seconde fois.
+
+    Le tri déplace les lignes existantes : la réécriture (reecrire_csv)
+    supprime l'index des positions de la partition (.idx), qui est reconstruit
+    à la lecture suivante par client.
+
+    Returns:
+        int: Le nombre de devis ajoutés à la partition.
+    """
+    anciennes = [SCHEMA_DEVIS.valider(ligne) for ligne in anciennes]
+    ajoutees = []
+
+    def valeurs(ligne: dict) -> tuple:
+        return tuple(ligne.get(colonne) or "" for colonne in SCHEMA_DEVIS.colonnes)
+
+    def fusion(existantes: list) -> list:
+        presentes = Counter(valeurs(ligne) for ligne in existantes)
+        ajoutees.clear()
+        for ligne in anciennes:
+            cle = valeurs(ligne)
+            if presentes[cle]:
+                presentes[cle] -= 1
+            else:
+                ajoutees.append(ligne)
+        # Tri stable : à date égale, les anciens devis précèdent les nouveaux
+        return sorted(ajoutees + existantes, key=lambda ligne: ligne.get("Date") or "")
+
+    csv_manager.reecrire_csv(chemin, fusion, SCHEMA_DEVIS.colonnes)
+    return len(ajoutees)
+
+
+def partitionner(csv_manager) -> dict:
+    """
+    Découpe l'ancien fichier devis.csv en partitions mensuelles.
+
+    Les devis sont d'abord répartis par mois dans des fichiers temporaires.
+    Un marqueur est alors écrit : à partir de là, devis.csv n'est plus lu
+    par lister_partitions. Chaque partition est ensuite fusionnée avec les
+    devis de son mois et remplacée en une seule opération. Le fichier
+    d'origine est enfin renommé en devis.csv.partitionne (conservé comme
+    sauvegarde) et le marqueur indique que le découpage est terminé.
+
+    Une exécution interrompue peut être relancée sans dupliquer de devis ;
+    une fois le découpage terminé, une nouvelle exécution ne fait rien.
+
+    Args:
+        csv_manager (CSVManager): Le gestionnaire de stockage.
+
+    Returns:
+        dict: Le nombre de devis ajoutés à chaque partition.
+    """
+    marqueur = _lire_marqueur()
+    if marqueur is not None and marqueur.get("termine"):
+        return {}
+    if not csv_manager.existe(FICHIER_DEVIS):
+        if marqueur is not None:
+            _ecrire_marqueur(termine=True)
+        return {}
+    os.makedirs(DOSSIER_DEVIS, exist_ok=True)
+    comptes = {}
+    with tempfile.TemporaryDirectory(prefix="partitionnement-") as dossier:
+        tampons = {}
+        for ligne in csv_manager.iter_csv(FICHIER_DEVIS):
+            mois = mois_de(ligne.get("Date"))
+            tampon = tampons.setdefault(mois, [])
+            tampon.append(ligne)
+            if len(tampon) >= TAILLE_TAMPON:
+                _mettre_de_cote(os.path.join(dossier, f"{mois}.csv"), tampon)
+                tampon.clear()
+        for mois, tampon in tampons.items():
+            if tampon:
+                _mettre_de_cote(os.path.join(dossier, f"{mois}.csv"), tampon)
+        _ecrire_marqueur(termine=False)
+        for mois in sorted(tampons):
+            with open(
+                os.path.join(dossier, f"{mois}.csv"), "r", newline="", encoding="utf-8"
+            ) as fichier:
+                anciennes = list(csv.DictReader(fichier))
+            chemin = chemin_partition(mois)
+            comptes[chemin] = _fusionner(csv_manager, chemin, anciennes)
+    csv_manager.renommer(FICHIER_DEVIS, FICHIER_DEVIS + ".partitionne")
+    _ecrire_marqueur(termine=True)
+    return comptes
+
+
+if __name__ == "__main__":
+    from constants import STOCKAGE
+    from sqlite_manager import creer_stockage
+
+    stockage = creer_stockage(os.getenv("STOCKAGE", STOCKAGE))
+    resultat = partitionner(stockage)
+    if not resultat:
+        print(f"{FICHIER_DEVIS} : rien à découper")
+    for partition, nombre in sorted(resultat.items()):
+        print(f"{partition} : {nombre} devis")
@@ -1,28 +1,881 @@
 """ Module to manage the generation of PDF documents for quotes (devis). """
 
+import copy
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import zlib
 from datetime import datetime
 
 # import platform
 from fpdf import FPDF
+from fpdf.ttfonts import TTFontFile
 
-from constants import FICHIER_CLIENTS
+from archives import ArchiveArtefacts
+from cache_pdf import CachePDF
+from constants import DOSSIER_PDF, FICHIER_CLIENTS, POLICES_PDF
 from csv_manager import CSVManager
+from devis_manager import DevisManager
+from enregistrements import Client, _nombre
+from partitions import mois_de
+
+logger = logging.getLogger(__name__)
+
+# Version de la mise en page, incluse dans l'empreinte des PDF : à incrémenter
+# lorsque la mise en page change, pour que les PDF en cache soient régénérés
+VERSION_MISE_EN_PAGE = 1
+# Nom de la famille des polices TrueType de POLICES_PDF dans les documents
+FAMILLE_TTF = "DejaVu"
+# Nombre de sous-ensembles de polices (programme de police compressé) gardés
+# en mémoire par processus : les devis utilisent presque toujours les mêmes
+# caractères, leurs sous-ensembles sont réutilisés d'un PDF à l'autre
+SOUS_POLICES_EN_CACHE = 256
+# Coordonnées de l'entreprise, en tête des devis et des relevés
+COORDONNEES_ENTREPRISE = [
+    "CutSharp",
+    "Rue Copernic",
+    "42100 SAINT-ETIENNE",
+    "Tel : 04.78.78.00.00",
+    "contact@cutsharp.fr - www.cutsharp",
+]
+# Colonnes du tableau du relevé des devis d'un client :
+# (titre, colonne du devis, largeur en mm, alignement)
+COLONNES_RELEVE = [
+    ("Date", "Date", 25, "C"),
+    ("Numéro", "Numéro", 22, "C"),
+    ("Métal", "Métal", 30, "L"),
+    ("Forme", "Forme", 30, "L"),
+    ("Quantité (mm)", "Quantité (mm)", 30, "R"),
+    ("Remise (%)", "Remise (%)", 23, "R"),
+    ("Prix Total", "Prix Total", 30, "R"),
+]
+# Hauteur (en mm) d'une ligne du relevé
+HAUTEUR_LIGNE_RELEVE = 6
+# Correspondance CID -> Unicode des polices TrueType (identité, comme FPDF)
+VERS_UNICODE = (
+    "/CIDInit /ProcSet findresource begin\n"
+    "12 dict begin\n"
+    "begincmap\n"
+    "/CIDSystemInfo\n"
+    "<</Registry (Adobe)\n"
+    "/Ordering (UCS)\n"
+    "/Supplement 0\n"
+    ">> def\n"
+    "/CMapName /Adobe-Identity-UCS def\n"
+    "/CMapType 2 def\n"
+    "1 begincodespacerange\n"
+    "<0000> <FFFF>\n"
+    "endcodespacerange\n"
+    "1 beginbfrange\n"
+    "<0000> <FFFF> <0000>\n"
+    "endbfrange\n"
+    "endcmap\n"
+    "CMapName currentdict /CMap defineresource pop\n"
+    "end\n"
+    "end"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _police() -> str:
+    """
+    Return the font family of the PDFs: the TrueType fonts of POLICES_PDF
+    (Unicode, embedded as subsets) if the regular font file is present,
+    otherwise the built-in Arial font (latin-1 only), with a warning.
+    """
+    if os.path.exists(POLICES_PDF[""]):
+        return FAMILLE_TTF
+    logger.warning(
+        "Police TrueType %s absente : les PDF utilisent la police Arial "
+        "intégrée (caractères latin-1 uniquement, sans €)",
+        POLICES_PDF[""],
+    )
+    return "Arial"
+
+
+@functools.lru_cache(maxsize=None)
+def _polices_ttf() -> FPDF:
+    """
+    Return a document holding the parsed TrueType fonts: their metrics are
+    read once per process (and kept next to the font files by FPDF), then
+    copied into every new document by _copier_polices. A style whose file
+    is missing (the oblique font is not shipped) is drawn with the regular
+    font.
+    """
+    pdf = FPDF()
+    for style, chemin in POLICES_PDF.items():
+        if not os.path.exists(chemin):
+            logger.info(
+                "Police TrueType %s absente : le style %r utilise %s",
+                chemin,
+                style,
+                POLICES_PDF[""],
+            )
+            chemin = POLICES_PDF[""]
+        pdf.add_font(FAMILLE_TTF, style, chemin, uni=True)
+    return pdf
+
+
+class _Caracteres(list):
+    """
+    Characters used with a TrueType font (its embedded subset), each kept
+    once: FPDF appends every character printed, so the list would otherwise
+    grow with the length of the document.
+    """
+
+    def __init__(self, caracteres=()):
+        super().__init__()
+        self._vus = set()
+        for caractere in caracteres:
+            self.append(caractere)
+
+    def append(self, caractere):
+        if caractere not in self._vus:
+            self._vus.add(caractere)
+            super().append(caractere)
+
+    def __contains__(self, caractere) -> bool:
+        return caractere in self._vus
+
+
+def _copier_polices(pdf: FPDF, source: FPDF):
+    """
+    Copy the fonts of a document into another. The glyph widths are shared;
+    the set of glyphs used (embedded subset) and the object numbers written
+    by FPDF belong to each document.
+    """
+    pdf.fonts = {}
+    for cle, police in source.fonts.items():
+        police = dict(police)
+        if "subset" in police:
+            police["subset"] = _Caracteres(police["subset"])
+        pdf.fonts[cle] = police
+    pdf.font_files = {cle: dict(fichier) for cle, fichier in source.font_files.items()}
+
+
+@functools.lru_cache(maxsize=SOUS_POLICES_EN_CACHE)
+def _sous_police(fichier_ttf: str, caracteres: tuple) -> tuple:
+    """
+    Build the embedded subset of a TrueType font for a set of characters.
+    Returns:
+        tuple: The compressed font program, its uncompressed size, the
+               compressed CID to glyph map and the highest character code.
+    """
+    ttf = TTFontFile()
+    programme = ttf.makeSubset(fichier_ttf, list(caracteres))
+    cid_vers_glyphe = bytearray(256 * 256 * 2)
+    for code, glyphe in ttf.codeToGlyph.items():
+        cid_vers_glyphe[code * 2] = glyphe >> 8
+        cid_vers_glyphe[code * 2 + 1] = glyphe & 0xFF
+    return (
+        zlib.compress(programme),
+        len(programme),
+        zlib.compress(bytes(cid_vers_glyphe)),
+        ttf.maxUni,
+    )
+
+
+class DocumentPDF(FPDF):
+    """
+    FPDF document whose TrueType fonts are embedded from the per-process
+    cache of font subsets (_sous_police) instead of being subset and
+    compressed again for every document. The PDF objects written are the
+    same as FPDF's.
+    """
+
+    def _putfonts(self):
+        """Write the font objects of the document."""
+        if self.diffs or any(police["type"] != "TTF" for police in self.fonts.values()):
+            return super()._putfonts()
+        for _, cle, police in sorted(
+            (police["i"], cle, police) for cle, police in self.fonts.items()
+        ):
+            self.fonts[cle]["n"] = self.n + 1
+            # Le premier caractère du sous-ensemble (code 0) n'est pas intégré ;
+            # le sous-ensemble ne dépend pas de l'ordre des caractères, triés
+            # pour que les documents utilisant les mêmes partagent le cache
+            programme, taille, cid_vers_glyphe, max_uni = _sous_police(
+                police["ttffile"], tuple(sorted(police["subset"][1:]))
+            )
+            nom = "MPDFAA+" + police["name"]
+            # Police composite (Type0)
+            self._newobj()
+            self._out("<</Type /Font")
+            self._out("/Subtype /Type0")
+            self._out("/BaseFont /" + nom)
+            self._out("/Encoding /Identity-H")
+            self._out("/DescendantFonts [" + str(self.n + 1) + " 0 R]")
+            self._out("/ToUnicode " + str(self.n + 2) + " 0 R")
+            self._out(">>")
+            self._out("endobj")
+            # Police CID TrueType
+            self._newobj()
+            self._out("<</Type /Font")
+            self._out("/Subtype /CIDFontType2")
+            self._out("/BaseFont /" + nom)
+            self._out("/CIDSystemInfo " + str(self.n + 2) + " 0 R")
+            self._out("/FontDescriptor " + str(self.n + 3) + " 0 R")
+            if police["desc"].get("MissingWidth"):
+                self._out("/DW %d" % police["desc"]["MissingWidth"])
+            self._putTTfontwidths(police, max_uni)
+            self._out("/CIDToGIDMap " + str(self.n + 4) + " 0 R")
+            self._out(">>")
+            self._out("endobj")
+            # Correspondance vers Unicode
+            self._newobj()
+            self._out("<</Length " + str(len(VERS_UNICODE)) + ">>")
+            self._putstream(VERS_UNICODE)
+            self._out("endobj")
+            # Système de caractères
+            self._newobj()
+            self._out("<</Registry (Adobe)")
+            self._out("/Ordering (UCS)")
+            self._out("/Supplement 0")
+            self._out(">>")
+            self._out("endobj")
+            # Descripteur de police
+            self._newobj()
+            self._out("<</Type /FontDescriptor")
+            self._out("/FontName /" + nom)
+            for cle_desc in (
+                "Ascent",
+                "Descent",
+                "CapHeight",
+                "Flags",
+                "FontBBox",
+                "ItalicAngle",
+                "StemV",
+                "MissingWidth",
+            ):
+                valeur = police["desc"][cle_desc]
+                if cle_desc == "Flags":
+                    # Police non symbolique
+                    valeur = (valeur | 4) & ~32
+                self._out(" /%s %s" % (cle_desc, valeur))
+            self._out("/FontFile2 " + str(self.n + 2) + " 0 R")
+            self._out(">>")
+            self._out("endobj")
+            # Table CID -> glyphe
+            self._newobj()
+            self._out("<</Length " + str(len(cid_vers_glyphe)))
+            self._out("/Filter /FlateDecode")
+            self._out(">>")
+            self._putstream(cid_vers_glyphe)
+            self._out("endobj")
+            # Programme de la police (sous-ensemble)
+            self._newobj()
+            self._out("<</Length " + str(len(programme)))
+            self._out("/Filter /FlateDecode")
+            self._out("/Length1 " + str(taille))
+            self._out(">>")
+            self._putstream(programme)
+            self._out("endobj")
+
+
+def _nouveau_document() -> FPDF:
+    """Return a new document on its first page, with its fonts registered."""
+    pdf = DocumentPDF()
+    pdf.set_compression(True)
+    if _police() == FAMILLE_TTF:
+        _copier_polices(pdf, _polices_ttf())
+    pdf.add_page()
+    return pdf
+
+
+def _dessiner_statique(pdf: FPDF, avec_client: bool) -> dict:
+    """
+    Draw the static layout of a quote PDF (company header, table header and
+    footer) on the current page, leaving room for the variable parts.
+    Args:
+        pdf (FPDF): The document, on a new page.
+        avec_client (bool): Whether room is left for the client block.
+    Returns:
+        dict: The ordinates of the variable parts ("date", "client",
+              "numero" and "lignes").
+    """
+    positions = {}
+
+    # Titre de l'entreprise (centré)
+    pdf.set_font(_police(), "B", size=16)
+    pdf.cell(0, 10, txt="CutSharp", ln=True, align="C")
+    pdf.ln(5)
+
+    # Titre "DEVIS" (centré)
+    pdf.set_font(_police(), "B", size=16)
+    pdf.cell(0, 10, txt="DEVIS", ln=True, align="C")
+    pdf.ln(10)
+
+    # Coordonnées de l'entreprise (affichées à gauche), suivies de la date
+    pdf.set_font(_police(), size=12)
+    for ligne in COORDONNEES_ENTREPRISE:
+        pdf.cell(0, 5, txt=ligne, ln=True, align="L")
+    positions["date"] = pdf.get_y()
+    pdf.ln(5)
+    pdf.ln(10)
+
+    # Bloc des coordonnées du client (affiché à droite) : 4 lignes
+    positions["client"] = pdf.get_y()
+    if avec_client:
+        pdf.ln(4 * 6)
+        pdf.ln(10)
+
+    # Numéro de devis (centré)
+    positions["numero"] = pdf.get_y()
+    pdf.ln(10)
+    pdf.ln(10)
+
+    # En-tête du tableau récapitulatif du devis
+    pdf.set_font(_police(), size=12)
+    pdf.set_fill_color(200, 220, 255)
+    pdf.cell(50, 10, txt="Champ", border=1, align="C", fill=True)
+    pdf.cell(140, 10, txt="Valeur", border=1, align="C", fill=True)
+    pdf.ln()
+    positions["lignes"] = pdf.get_y()
+
+    pdf.set_y(-31)
+    pdf.set_font(_police(), "I", size=10)
+    pdf.cell(0, 10, txt="Créé par CutSharp", ln=True, align="C")
+    return positions
+
+
+def _dessiner_devis(
+    pdf: FPDF, positions: dict, devis: dict, client, numero_devis
+) -> None:
+    """
+    Fill in the variable parts of a quote PDF: date, client block, quote
+    number and the rows of the summary table.
+    Args:
+        pdf (FPDF): The document holding the static layout.
+        positions (dict): The ordinates returned by _dessiner_statique.
+        devis (dict): The quote.
+        client (Client): The client record, or None if it is unknown.
+        numero_devis: The quote number printed in the title.
+    """
+    # Date of the quote (date of rendering for quotes without one)
+    try:
+        date_devis = datetime.strptime(devis["Date"], "%Y-%m-%d")
+    except (KeyError, TypeError, ValueError):
+        date_devis = datetime.now()
+    pdf.set_font(_police(), size=12)
+    pdf.set_xy(pdf.l_margin, positions["date"])
+    pdf.cell(0, 5, txt=f"Date : {date_devis.strftime('%d-%m-%Y')}", align="L")
+
+    if client is not None:
+        pdf.set_xy(130, positions["client"])
+        pdf.set_font(_police(), "", 12)
+        pdf.cell(60, 6, txt=client.nom, align="R", ln=1)
+        pdf.set_x(130)
+        pdf.cell(60, 6, txt=client.adresse, align="R", ln=1)
+        pdf.set_x(130)
+        pdf.cell(60, 6, txt=client.code_postal, align="R", ln=1)
+        pdf.set_x(130)
+        pdf.cell(60, 6, txt="Tel: " + client.telephone, align="R", ln=1)
+
+    pdf.set_xy(pdf.l_margin, positions["numero"])
+    pdf.set_font(_police(), "B", size=12)
+    pdf.cell(0, 10, txt=f"Devis n° {numero_devis}", ln=True, align="C")
+
+    # Lignes du tableau récapitulatif
+    pdf.set_xy(pdf.l_margin, positions["lignes"])
+    pdf.set_font(_police(), size=12)
+    for key, value in devis.items():
+        # la marge n'est plus modifiable, le numéro figure dans le titre
+        if key in ["Marge (%)", "Numéro"]:
+            continue
+        if key == "Prix Total" and float(value) == 0:
+            continue
+        pdf.cell(50, 10, txt=key, border=1)
+        pdf.cell(140, 10, txt=str(value), border=1)
+        pdf.ln()
+
+
+class ModelePDF:
+    """
+    Static layout of a quote PDF, drawn once: each quote starts from a copy
+    of the template page and only draws its variable parts.
+    """
+
+    def __init__(self, avec_client: bool):
+        """
+        Draw the template page.
+        Args:
+            avec_client (bool): Whether room is left for the client block.
+        """
+        self.pdf = _nouveau_document()
+        self.positions = _dessiner_statique(self.pdf, avec_client)
+
+    def copier(self) -> FPDF:
+        """
+        Return a new document holding a copy of the template page. Only the
+        containers modified while drawing or writing a document are copied;
+        the font metrics (glyph widths) are shared.
+        """
+        pdf = copy.copy(self.pdf)
+        for nom, valeur in vars(self.pdf).items():
+            if isinstance(valeur, (dict, list)):
+                setattr(pdf, nom, copy.copy(valeur))
+        _copier_polices(pdf, self.pdf)
+        pdf.current_font = pdf.fonts[pdf.font_family + pdf.font_style]
+        return pdf
+
+
+@functools.lru_cache(maxsize=None)
+def _modele(avec_client: bool) -> ModelePDF:
+    """Return the template page of the process (drawn on first use)."""
+    return ModelePDF(avec_client)
+
+
+class ReleveClientPDF(DocumentPDF):
+    """
+    Statement document written to its file page by page: each page is output
+    as soon as it is complete instead of being kept until the end, so memory
+    use does not grow with the number of quotes (only the page object
+    numbers, the object offsets and the set of glyphs used are kept). The
+    fonts, resources and page tree are written after the last page.
+    """
+
+    def __init__(self, fichier, titre: str):
+        """
+        Start the document.
+        Args:
+            fichier: The binary file the PDF is written to.
+            titre (str): The title of the document, repeated in the footer.
+        """
+        super().__init__()
+        self.set_compression(True)
+        if _police() == FAMILLE_TTF:
+            _copier_polices(self, _polices_ttf())
+        self.set_title(titre)
+        self.titre = titre
+        # Colonnes du tableau en cours, dont l'en-tête est répété en haut de
+        # chaque page (None : pas de tableau en cours)
+        self.colonnes = None
+        self._fichier = fichier
+        self._position = 0
+        self._objets_pages = []
+        self._putheader()
+        self._vider()
+
+    def _vider(self):
+        """Write the pending objects to the file."""
+        donnees = self.buffer.encode("latin-1")
+        self._fichier.write(donnees)
+        self._position += len(donnees)
+        self.buffer = ""
+
+    def _newobj(self):
+        """Begin a new object (offsets are counted from the start of the file)."""
+        self.n += 1
+        self.offsets[self.n] = self._position + len(self.buffer)
+        self._out(str(self.n) + " 0 obj")
+
+    def en_tete_colonnes(self):
+        """Draw the header row of the current table."""
+        self.set_font(_police(), "B", size=9)
+        self.set_fill_color(200, 220, 255)
+        for titre, _, largeur, _ in self.colonnes:
+            self.cell(
+                largeur, HAUTEUR_LIGNE_RELEVE, txt=titre, border=1, align="C", fill=True
+            )
+        self.ln()
+        self.set_font(_police(), size=9)
+
+    def header(self):
+        """Repeat the header row of the current table on each new page."""
+        if self.colonnes:
+            self.en_tete_colonnes()
+
+    def footer(self):
+        """Print the title and the page number."""
+        self.set_y(-15)
+        self.set_font(_police(), "I", size=8)
+        self.cell(0, 10, txt=f"{self.titre} - page {self.page_no()}", align="C")
+
+    def _endpage(self):
+        """Write the completed page (page object and content) to the file."""
+        super()._endpage()
+        contenu = zlib.compress(self.pages.pop(self.page).encode("latin-1"))
+        self._newobj()
+        self._objets_pages.append(self.n)
+        self._out("<</Type /Page")
+        self._out("/Parent 1 0 R")
+        self._out("/Resources 2 0 R")
+        self._out("/Contents " + str(self.n + 1) + " 0 R>>")
+        self._out("endobj")
+        self._newobj()
+        self._out("<</Filter /FlateDecode /Length " + str(len(contenu)) + ">>")
+        self._putstream(contenu)
+        self._out("endobj")
+        self._vider()
+
+    def _enddoc(self):
+        """Write the fonts, resources, page tree, catalog and cross-reference table."""
+        self._putfonts()
+        self._putimages()
+        self.offsets[2] = self._position + len(self.buffer)
+        self._out("2 0 obj")
+        self._out("<<")
+        self._putresourcedict()
+        self._out(">>")
+        self._out("endobj")
+        self.offsets[1] = self._position + len(self.buffer)
+        self._out("1 0 obj")
+        self._out("<</Type /Pages")
+        self._out("/Kids [" + " ".join(f"{n} 0 R" for n in self._objets_pages) + "]")
+        self._out("/Count " + str(len(self._objets_pages)))
+        self._out("/MediaBox [0 0 %.2f %.2f]" % (self.fw_pt, self.fh_pt))
+        self._out(">>")
+        self._out("endobj")
+        self._newobj()
+        self._out("<<")
+        self._putinfo()
+        self._out(">>")
+        self._out("endobj")
+        self._newobj()
+        self._out("<<")
+        self._putcatalog()
+        self._out(">>")
+        self._out("endobj")
+        debut_xref = self._position + len(self.buffer)
+        self._out("xref")
+        self._out("0 " + str(self.n + 1))
+        self._out("0000000000 65535 f ")
+        for i in range(1, self.n + 1):
+            self._out("%010d 00000 n " % self.offsets[i])
+        self._out("trailer")
+        self._out("<<")
+        self._puttrailer()
+        self._out(">>")
+        self._out("startxref")
+        self._out(debut_xref)
+        self._out("%%EOF")
+        self.state = 3
+        self._vider()
+
+
+def _texte_nombre(valeur, decimales: int = 2) -> str:
+    """
+    Format a number for a statement (thousands separated by spaces). With
+    decimales=None, whole numbers are printed without decimals.
+    """
+    nombre = _nombre(valeur)
+    if nombre is None:
+        return "" if valeur is None else str(valeur)
+    if decimales is None:
+        decimales = 0 if nombre.is_integer() else 2
+    return f"{nombre:,.{decimales}f}".replace(",", " ")
+
+
+def _texte_releve(colonne: str, valeur) -> str:
+    """Format a quote value for its column of the statement table."""
+    if colonne == "Date":
+        try:
+            return datetime.strptime(valeur, "%Y-%m-%d").strftime("%d-%m-%Y")
+        except (TypeError, ValueError):
+            return valeur or ""
+    if colonne == "Prix Total":
+        return _texte_nombre(valeur)
+    if colonne in ("Quantité (mm)", "Remise (%)"):
+        return _texte_nombre(valeur, decimales=None)
+    return "" if valeur is None else str(valeur)
+
+
+def _ligne_total(pdf: ReleveClientPDF, libelle: str, nombre: int, total: float):
+    """Draw a subtotal row of the statement table (count and amount)."""
+    largeur_total = pdf.colonnes[-1][2]
+    pdf.set_font(_police(), "B", size=9)
+    pdf.set_fill_color(235, 235, 235)
+    pdf.cell(
+        pdf.w - pdf.l_margin - pdf.r_margin - largeur_total,
+        HAUTEUR_LIGNE_RELEVE,
+        txt=f"{libelle} ({nombre} devis)",
+        border=1,
+        fill=True,
+    )
+    pdf.cell(
+        largeur_total,
+        HAUTEUR_LIGNE_RELEVE,
+        txt=_texte_nombre(total),
+        border=1,
+        align="R",
+        fill=True,
+    )
+    pdf.ln()
+    pdf.set_font(_police(), size=9)
+
+
+def _dessiner_recapitulatif(
+    pdf: ReleveClientPDF, titre: str, libelle: str, totaux: dict
+):
+    """
+    Draw a summary table of the statement: count and amount of the quotes
+    for each key (metal or month).
+    """
+    pdf.colonnes = None
+    # Le titre n'est pas laissé seul en bas de page
+    if pdf.get_y() + 4 * HAUTEUR_LIGNE_RELEVE > pdf.page_break_trigger:
+        pdf.add_page()
+    pdf.ln(HAUTEUR_LIGNE_RELEVE)
+    pdf.set_font(_police(), "B", size=12)
+    pdf.cell(0, 8, txt=titre, ln=True)
+    pdf.colonnes = [
+        (libelle, None, 80, "L"),
+        ("Nombre de devis", None, 50, "R"),
+        ("Prix Total", None, 60, "R"),
+    ]
+    pdf.en_tete_colonnes()
+    for cle, (nombre, total) in sorted(totaux.items()):
+        pdf.cell(80, HAUTEUR_LIGNE_RELEVE, txt=cle, border=1)
+        pdf.cell(50, HAUTEUR_LIGNE_RELEVE, txt=str(nombre), border=1, align="R")
+        pdf.cell(
+            60, HAUTEUR_LIGNE_RELEVE, txt=_texte_nombre(total), border=1, align="R"
+        )
+        pdf.ln()
+
+
+def _dessiner_releve(
+    pdf: ReleveClientPDF, nom_client: str, client, devis, debut=None, fin=None
+) -> dict:
+    """
+    Draw the statement of a client's quotes: header, one row per quote with
+    a subtotal row at each change of month, then the subtotals per metal and
+    per month and the grand total. The quotes are read one at a time and only
+    the totals are kept.
+    Args:
+        pdf (ReleveClientPDF): The document, before its first page.
+        nom_client (str): The client name.
+        client (Client): The client record, or None if it is unknown.
+        devis (iterable): The quotes of the client, in chronological order.
+        debut (str, optional): First date of the statement, printed.
+        fin (str, optional): Last date of the statement, printed.
+    Returns:
+        dict: The number of quotes ("devis") and their total ("total").
+    """
+    pdf.add_page()
+    pdf.set_font(_police(), "B", size=16)
+    pdf.cell(0, 10, txt="CutSharp", ln=True, align="C")
+    pdf.ln(5)
+    pdf.cell(0, 10, txt="RELEVÉ DES DEVIS", ln=True, align="C")
+    pdf.ln(5)
+
+    # Coordonnées de l'entreprise (à gauche) et du client (à droite)
+    haut = pdf.get_y()
+    pdf.set_font(_police(), size=12)
+    for ligne in COORDONNEES_ENTREPRISE:
+        pdf.cell(0, 5, txt=ligne, ln=True, align="L")
+    bas = pdf.get_y()
+    coordonnees_client = [nom_client]
+    if client is not None:
+        coordonnees_client = [
+            client.nom,
+            client.adresse,
+            client.code_postal,
+            "Tel: " + client.telephone,
+        ]
+    pdf.set_y(haut)
+    for ligne in coordonnees_client:
+        pdf.set_x(130)
+        pdf.cell(70, 6, txt=ligne, align="R", ln=1)
+    pdf.set_y(max(bas, pdf.get_y()) + 5)
+
+    if debut or fin:
+        periode = f"Période : du {debut or '...'} au {fin or '...'}"
+    else:
+        periode = "Période : tous les devis"
+    pdf.cell(0, 6, txt=periode, ln=True)
+    pdf.cell(0, 6, txt=f"Édité le {datetime.now().strftime('%d-%m-%Y')}", ln=True)
+    pdf.ln(5)
+
+    # Tableau des devis, avec un sous-total à chaque changement de mois
+    pdf.colonnes = COLONNES_RELEVE
+    pdf.en_tete_colonnes()
+    par_metal, par_mois = {}, {}
+    mois_courant, du_mois = None, [0, 0.0]
+    for ligne in devis:
+        mois = mois_de(ligne.get("Date"))
+        if mois != mois_courant:
+            if mois_courant is not None:
+                _ligne_total(pdf, f"Sous-total {mois_courant}", *du_mois)
+            mois_courant, du_mois = mois, [0, 0.0]
+        prix = _nombre(ligne.get("Prix Total")) or 0.0
+        for cumul in (
+            du_mois,
+            par_metal.setdefault(ligne.get("Métal") or "", [0, 0.0]),
+            par_mois.setdefault(mois, [0, 0.0]),
+        ):
+            cumul[0] += 1
+            cumul[1] += prix
+        for _, colonne, largeur, alignement in COLONNES_RELEVE:
+            pdf.cell(
+                largeur,
+                HAUTEUR_LIGNE_RELEVE,
+                txt=_texte_releve(colonne, ligne.get(colonne)),
+                border=1,
+                align=alignement,
+            )
+        pdf.ln()
+    if mois_courant is None:
+        pdf.cell(0, HAUTEUR_LIGNE_RELEVE, txt="Aucun devis", border=1, ln=True)
+    else:
+        _ligne_total(pdf, f"Sous-total {mois_courant}", *du_mois)
+
+    # Sous-totaux par métal et par mois, et total général
+    nombre = sum(cumul[0] for cumul in par_mois.values())
+    total = sum(cumul[1] for cumul in par_mois.values())
+    if nombre:
+        _dessiner_recapitulatif(pdf, "Sous-totaux par métal", "Métal", par_metal)
+        _dessiner_recapitulatif(pdf, "Sous-totaux par mois", "Mois", par_mois)
+        _ligne_total(pdf, "Total général", nombre, total)
+    pdf.colonnes = None
+    return {"devis": nombre, "total": total}
 
 
 class PDFManager:
     """Class to manage the generation of PDF documents for quotes (devis)."""
 
-    def __init__(self, csv_manager: CSVManager):
-        """ " Initialize the PDFManager with a CSVManager instance."""
+    def __init__(
+        self,
+        csv_manager: CSVManager,
+        modele: bool = True,
+        clients: dict = None,
+        cache: CachePDF = None,
+        archive: ArchiveArtefacts = None,
+    ):
+        """ " Initialize the PDFManager with a CSVManager instance.
+        Args:
+            csv_manager (CSVManager): The storage manager (CSV or SQLite).
+            modele (bool, optional): If False, the static layout is drawn again
+                          for every PDF instead of being copied from the
+                          template (kept for the benchmark).
+            clients (dict, optional): The client records already loaded, by
+                          normalized name (see indexer_clients); clients.csv
+                          is then never read.
+            cache (CachePDF, optional): The content-addressed PDF cache.
+            archive (ArchiveArtefacts, optional): The archive of the PDFs
+                          saved by generer_pdf (by month and client).
+        """
         self.csv_manager = csv_manager
+        self.modele = modele
+        self.clients = clients
+        self.cache = cache if cache is not None else CachePDF()
+        self.archive = archive if archive is not None else ArchiveArtefacts(DOSSIER_PDF)
+
+    @staticmethod
+    def indexer_clients(clients) -> dict:
+        """
+        Index client records by normalized name, for PDFManager(clients=...).
+        Args:
+            clients (iterable): The client records (Client).
+        Returns:
+            dict: {normalized name: Client}.
+        """
+        return {client.nom.strip().upper(): client for client in clients}
+
+    def _page(self, avec_client: bool) -> tuple:
+        """
+        Return a new page holding the static layout of a quote PDF, and the
+        positions of its variable parts.
+        """
+        if self.modele:
+            modele = _modele(avec_client)
+            return modele.copier(), modele.positions
+        pdf = _nouveau_document()
+        return pdf, _dessiner_statique(pdf, avec_client)
+
+    def _client(self, nom_client: str):
+        """Return the client record of a quote, or None if it is unknown."""
+        nom_client = nom_client.strip().upper()
+        if self.clients is not None:
+            return self.clients.get(nom_client)
+        # Clients convertis une seule fois, puis relus depuis le cache
+        return next(
+            (
+                client
+                for client in self.csv_manager.lire_enregistrements(
+                    FICHIER_CLIENTS, Client
+                )
+                if client.nom.strip().upper() == nom_client
+            ),
+            None,
+        )
+
+    def empreinte(self, devis: dict) -> str:
+        """
+        Compute the fingerprint of everything printed in the PDF of a quote:
+        the quote row, the client record, the layout version and the font
+        family. It is the
+        address of the PDF in the cache.
+        Args:
+            devis (dict): The quote.
+        Returns:
+            str: The SHA-256 fingerprint, in hexadecimal.
+        """
+        client = self._client(devis["Nom Client"])
+        contenu = {
+            "mise_en_page": [VERSION_MISE_EN_PAGE, _police()],
+            "devis": {cle: str(valeur) for cle, valeur in devis.items()},
+            "client": client.vers_ligne() if client is not None else None,
+        }
+        return hashlib.sha256(
+            json.dumps(contenu, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    def chemin_pdf(self, devis: dict, empreinte: str = None) -> str:
+        """
+        Return the readable path of the PDF of a quote (e.g. as download
+        name): named after its number, or after its fingerprint for quotes
+        recorded without a number.
+        """
+        numero = devis.get("Numéro") or (empreinte or self.empreinte(devis))[:16]
+        return os.path.join(DOSSIER_PDF, f"devis_{devis['Nom Client']}_{numero}.pdf")
+
+    def obtenir_pdf(self, devis: dict, forcer: bool = False) -> str:
+        """
+        Return the PDF of a quote from the content-addressed cache, rendering
+        it only when no PDF with the same content (quote, client and layout
+        version) is stored. The quote number is associated with the
+        fingerprint in the cache index.
+        Args:
+            devis (dict): The quote.
+            forcer (bool, optional): If True, the PDF is rendered again even
+                          if it is up to date (e.g. after a layout change).
+        Returns:
+            str: The file path of the PDF document.
+        """
+        empreinte = self.empreinte(devis)
+        fichier_pdf = None if forcer else self.cache.lire(empreinte)
+        if fichier_pdf is None:
+            fichier_pdf = self.cache.ajouter(empreinte, self.rendre_pdf(devis))
+        if devis.get("Numéro"):
+            self.cache.associer(devis["Numéro"], empreinte)
+        return fichier_pdf
+
+    def _rendre(self, devis: dict) -> tuple:
+        """
+        Render the PDF document of a quote in memory.
+        Returns:
+            tuple: The document (FPDF) and the quote number printed in it.
+        """
+        client_found = self._client(devis["Nom Client"])
+        # Numéro de devis : celui attribué à l'enregistrement du devis,
+        # ou, pour les anciens devis sans numéro, l'horodatage de génération
+        numero_devis = devis.get("Numéro") or datetime.now().strftime("%Y%m%d%H%M%S")
+        pdf, positions = self._page(client_found is not None)
+        _dessiner_devis(pdf, positions, devis, client_found, numero_devis)
+        return pdf, numero_devis
 
-    def generer_pdf(self, devis: dict) -> str:
+    def generer_pdf(self, devis: dict, fichier_pdf: str = None) -> str:
         """
         Generate a PDF document for a given quote (devis).
         Args:
             devis (dict): A dictionary containing the details of the quote.
                           Expected keys include 'Nom Client', 'Adresse', 'Code Postal', 'Téléphone',
                           and other relevant fields for the quote.
+            fichier_pdf (str, optional): The output path. Defaults to a name
+                          built from the client's name and the quote number.
         Returns:
             str: The file path of the generated PDF document.
         The generated PDF includes:
@@ -31,83 +884,218 @@ class PDFManager:
             - Quote number
             - A summary table of the quote details
             - Footer with creation information
-        The PDF is saved in the 'datas/outputs_pdf/'
-        directory with a filename based on the client's name and the current timestamp.
+        By default, the PDF is saved in the archive of 'datas/outputs_pdf/'
+        (sub-folder of the quote's month and client) with a filename based on
+        the client's name and the quote number ('Numéro', or the first 16
+        characters of its fingerprint for quotes recorded without one, as in
+        chemin_pdf), and can be read back by that identifier
+        (self.archive.lire).
         """
-        pdf = FPDF()
-        pdf.add_page()
+        pdf, _ = self._rendre(devis)
+        if fichier_pdf is None:
+            # Sans numéro, l'empreinte du contenu identifie le devis : deux
+            # devis générés dans la même seconde ne partagent pas d'identifiant
+            identifiant = devis.get("Numéro") or self.empreinte(devis)[:16]
+            return self.archive.ajouter(
+                identifiant,
+                f"devis_{devis['Nom Client']}_{identifiant}.pdf",
+                pdf.output(dest="S").encode("latin-1"),
+                date=devis.get("Date"),
+                client=devis["Nom Client"],
+            )
+        pdf.output(fichier_pdf)
+        return fichier_pdf
 
-        # Titre de l'entreprise (centré)
-        pdf.set_font("Arial", "B", size=16)
-        pdf.cell(0, 10, txt="CutSharp", ln=True, align="C")
-        pdf.ln(5)
+    def rendre_pdf(self, devis: dict, fichier_pdf: str = None) -> bytes:
+        """
+        Render the PDF document of a quote in memory, e.g. to serve it for
+        download without going through the disk.
+        Args:
+            devis (dict): The quote.
+            fichier_pdf (str, optional): If given, the PDF is also written to
+                          this path.
+        Returns:
+            bytes: The content of the PDF document.
+        """
+        pdf, _ = self._rendre(devis)
+        # FPDF builds the document as a latin-1 string
+        contenu = pdf.output(dest="S").encode("latin-1")
+        if fichier_pdf is not None:
+            with open(fichier_pdf, "wb") as fichier:
+                fichier.write(contenu)
+        return contenu
 
-        # Titre "DEVIS" (centré)
-        pdf.set_font("Arial", "B", size=16)
-        pdf.cell(0, 10, txt="DEVIS", ln=True, align="C")
-        pdf.ln(10)
+    def flux_pdf(self, devis: dict) -> io.BytesIO:
+        """
+        Render the PDF document of a quote as a file-like buffer, positioned
+        at its start (see rendre_pdf).
+        """
+        return io.BytesIO(self.rendre_pdf(devis))
+
+    def generer_releve(
+        self,
+        nom_client: str,
+        fichier_pdf: str = None,
+        debut: str = None,
+        fin: str = None,
+        devis=None,
+    ) -> str:
+        """
+        Generate the statement of all the quotes of a client: one row per
+        quote, subtotals per month and per metal, and the grand total.
+        The quotes are streamed (read through the per-client index of each
+        monthly partition) and each page is written as soon as it is
+        complete: memory use does not depend on the number of quotes.
+        Args:
+            nom_client (str): The client name.
+            fichier_pdf (str, optional): The output path. By default, the
+                          statement is saved in the archive of
+                          'datas/outputs_pdf/' (month of the day, client
+                          sub-folder).
+            debut (str, optional): First date included ("AAAA-MM-JJ" or "AAAA-MM").
+            fin (str, optional): Last date included ("AAAA-MM-JJ" or "AAAA-MM").
+            devis (iterable, optional): The quotes to list, in chronological
+                          order, instead of those read from the storage.
+        Returns:
+            str: The file path of the statement.
+        """
+        if devis is None:
+            devis = DevisManager(self.csv_manager).iter_devis_client(
+                nom_client, debut, fin
+            )
+        nom = f"releve_{nom_client}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+        chemin = fichier_pdf or self.archive.temporaire(nom)
+        try:
+            with open(chemin, "wb") as fichier:
+                pdf = ReleveClientPDF(fichier, f"Relevé des devis {nom_client}")
+                _dessiner_releve(
+                    pdf, nom_client, self._client(nom_client), devis, debut, fin
+                )
+                pdf.close()
+        except BaseException:
+            # Pas de PDF incomplet dans l'archive
+            if fichier_pdf is None and os.path.exists(chemin):
+                os.remove(chemin)
+            raise
+        if fichier_pdf is not None:
+            return fichier_pdf
+        return self.archive.ajouter_fichier(nom[:-4], nom, chemin, client=nom_client)
 
-        # Coordonnées de l'entreprise (affichées à gauche)
-        pdf.set_font("Arial", size=12)
-        pdf.cell(0, 5, txt="CutSharp", ln=True, align="L")
-        pdf.cell(0, 5, txt="Rue Copernic", ln=True, align="L")
-        pdf.cell(0, 5, txt="42100 SAINT-ETIENNE", ln=True, align="L")
-        pdf.cell(0, 5, txt="Tel : 04.78.78.00.00", ln=True, align="L")
-        pdf.cell(0, 5, txt="contact@cutsharp.fr - www.cutsharp", ln=True, align="L")
-        date_devis = datetime.now().strftime("%d-%m-%Y")
-        pdf.cell(0, 5, txt=f"Date : {date_devis}", ln=True, align="L")
-        pdf.ln(10)
 
-        # Bloc des coordonnées du client (affiché à droite)
-        clients = self.csv_manager.read_csv(FICHIER_CLIENTS)
-        client_found = None
-        for client in clients:
-            if client["Nom"].strip().upper() == devis["Nom Client"].strip().upper():
-                client_found = client
-                break
-        if client_found is not None:
-            y_client = pdf.get_y()
-            pdf.set_xy(130, y_client)
-            pdf.set_font("Arial", "", 12)
-            pdf.cell(60, 6, txt=client_found["Nom"], align="R", ln=1)
-            pdf.set_x(130)
-            pdf.cell(60, 6, txt=client_found["Adresse"], align="R", ln=1)
-            pdf.set_x(130)
-            pdf.cell(60, 6, txt=client_found["Code Postal"], align="R", ln=1)
-            pdf.set_x(130)
-            pdf.cell(60, 6, txt="Tel: " + client_found["Téléphone"], align="R", ln=1)
-            pdf.ln(10)
-
-        # Numéro de devis (centré)
-        numero_devis = "".join(
-            filter(
-                str.isdigit,
-                f"devis_{devis['Nom Client']}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf",
+if __name__ == "__main__":
+    # Benchmark : PDF dessinés entièrement, puis à partir du modèle de page
+    import tempfile
+    import time
+
+    devis_test = {
+        "Numéro": 1,
+        "Nom Client": "TEST",
+        "Métal": "Acier",
+        "Quantité (mm)": 1000.0,
+        "Forme": "Droite",
+        "Remise (%)": 5.0,
+        "Prix Total": 159.813,
+        "Coût Matériaux": 20.0,
+        "Coût Découpe": 4.611,
+        "Frais Fixes": 7,
+        "Date": "2025-02-09",
+    }
+    NOMBRE = 200
+
+    def mesurer(pdf_manager: PDFManager, fonction) -> float:
+        """Retourne la durée moyenne d'un PDF, en millisecondes (meilleur de 3)."""
+        fonction(pdf_manager)  # modèle de page et clients chargés
+        durees = []
+        for _ in range(3):
+            debut = time.perf_counter()
+            for _ in range(NOMBRE):
+                fonction(pdf_manager)
+            durees.append(time.perf_counter() - debut)
+        return min(durees) / NOMBRE * 1000
+
+    stockage = CSVManager()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "devis.pdf")
+        for titre, fonction in [
+            ("Rendu en mémoire", lambda m: m._rendre(devis_test)[0].output(dest="S")),
+            ("Rendu et écriture", lambda m: m.generer_pdf(devis_test, chemin)),
+        ]:
+            avant = mesurer(PDFManager(stockage, modele=False), fonction)
+            apres = mesurer(PDFManager(stockage, modele=True), fonction)
+            print(f"{titre} :")
+            print(f"  sans modèle : {avant:.3f} ms/PDF ({1000 / avant:.0f} PDF/s)")
+            print(
+                f"  avec modèle : {apres:.3f} ms/PDF ({1000 / apres:.0f} PDF/s, "
+                f"x{avant / apres:.2f})"
             )
-        )
-        pdf.set_font("Arial", "B", size=12)
-        pdf.cell(0, 10, txt=f"Devis n° {numero_devis}", ln=True, align="C")
-        pdf.ln(10)
 
-        # Tableau récapitulatif du devis
-        pdf.set_font("Arial", size=12)
-        pdf.set_fill_color(200, 220, 255)
-        pdf.cell(50, 10, txt="Champ", border=1, align="C", fill=True)
-        pdf.cell(140, 10, txt="Valeur", border=1, align="C", fill=True)
-        pdf.ln()
-        for key, value in devis.items():
-            if key in ["Marge (%)"]:  # la marge n'est plus modifiable
-                continue
-            if key == "Prix Total" and float(value) == 0:
-                continue
-            pdf.cell(50, 10, txt=key, border=1)
-            pdf.cell(140, 10, txt=str(value), border=1)
-            pdf.ln()
-
-        pdf.set_y(-31)
-        pdf.set_font("Arial", "I", size=10)
-        pdf.cell(0, 10, txt="Créé par CutSharp", ln=True, align="C")
-
-        fichier_pdf = f"datas/outputs_pdf/devis_{devis['Nom Client']}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-        pdf.output(fichier_pdf)
-        return fichier_pdf
+    # Polices : Arial intégrée (non embarquée) contre police TrueType embarquée
+    # en sous-ensemble, avec les caches de polices froids puis chauds
+    def utiliser_polices(fichiers: dict):
+        """
+        Remplace les polices des PDF et vide les caches qui en dépendent
+        (_police, _polices_ttf, _sous_police et les modèles de page).
+        """
+        global POLICES_PDF
+        POLICES_PDF = fichiers
+        for cache in (_police, _polices_ttf, _sous_police, _modele):
+            cache.cache_clear()
+
+    polices_configurees = POLICES_PDF
+    polices = {"Arial (intégrée)": {"": ""}}
+    # Vérifié sans appeler _police(), dont le résultat serait mis en cache
+    if os.path.exists(polices_configurees[""]):
+        polices[f"{FAMILLE_TTF} (TrueType, sous-ensemble)"] = polices_configurees
+    else:
+        print(f"Polices TrueType absentes ({', '.join(POLICES_PDF.values())})")
+    for titre, fichiers in polices.items():
+        utiliser_polices(fichiers)
+        pdf_manager = PDFManager(stockage)
+        debut = time.perf_counter()
+        taille = len(pdf_manager.rendre_pdf(devis_test))
+        froid = (time.perf_counter() - debut) * 1000
+        chaud = mesurer(pdf_manager, lambda m: m.rendre_pdf(devis_test))
+
+        def sans_cache(m):
+            _sous_police.cache_clear()
+            m.rendre_pdf(devis_test)
+
+        sans_sous_police = mesurer(pdf_manager, sans_cache)
+        print(f"{titre} (famille {_police()}) : {taille} octets/PDF")
+        print(f"  premier PDF du processus : {froid:.3f} ms")
+        print(f"  caches chauds            : {chaud:.3f} ms/PDF")
+        print(f"  sans cache des sous-ensembles : {sans_sous_police:.3f} ms/PDF")
+    utiliser_polices(polices_configurees)
+
+    # Relevé d'un client : durée et pic de mémoire selon le nombre de devis
+    # (le pic ne doit pas croître avec le nombre de devis)
+    import tracemalloc
+
+    def devis_releve(nombre):
+        """Génère des devis de test répartis sur deux ans."""
+        for i in range(nombre):
+            mois = i * 24 // nombre
+            yield dict(
+                devis_test,
+                **{
+                    "Numéro": i + 1,
+                    "Métal": ["Acier", "Aluminium", "Cuivre"][i % 3],
+                    "Date": f"{2023 + mois // 12}-{mois % 12 + 1:02d}-15",
+                },
+            )
+
+    pdf_manager = PDFManager(stockage)
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "releve.pdf")
+        for nombre in (1000, 10000, 50000):
+            tracemalloc.start()
+            debut = time.perf_counter()
+            pdf_manager.generer_releve("TEST", chemin, devis=devis_releve(nombre))
+            duree = time.perf_counter() - debut
+            pic = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(
+                f"Relevé de {nombre} devis : {duree:.2f} s, "
+                f"{os.path.getsize(chemin) // 1024} ko, "
+                f"pic de mémoire {pic // 1024} ko"
+            )
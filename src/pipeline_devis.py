@@ -0,0 +1,197 @@
+""" Module contenant la classe PipelineDevis (traitement des devis en arrière-plan). """
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import TRAVAILLEURS_PIPELINE_DEVIS
+
+logger = logging.getLogger(__name__)
+
+# États successifs d'une tâche de devis
+SOUMIS = "soumis"
+CHIFFRE = "chiffré"
+ENREGISTRE = "enregistré"
+PDF_PRET = "PDF prêt"
+ECHEC = "échec"
+
+# Ordre des états d'une tâche réussie (la progression en découle) : création
+# d'un devis avec ou sans son PDF, et génération du PDF d'un devis enregistré
+ETATS = [SOUMIS, CHIFFRE, ENREGISTRE, PDF_PRET]
+ETATS_SANS_PDF = [SOUMIS, CHIFFRE, ENREGISTRE]
+ETATS_PDF = [ENREGISTRE, PDF_PRET]
+
+
+class TacheDevis:
+    """
+    Une demande de devis, ou de PDF d'un devis, suivie par le pipeline.
+
+    Attributes:
+        etat (str): L'état courant (SOUMIS, CHIFFRE, ENREGISTRE, PDF_PRET ou ECHEC).
+        etats (list): Les états successifs de la tâche.
+        devis (dict): La ligne du devis, une fois chiffré.
+        fichier_pdf (str): Le chemin du PDF, une fois généré.
+        erreur (Exception): L'exception ayant interrompu la tâche (état ECHEC).
+        etat_echec (str): Le dernier état atteint avant l'échec.
+    """
+
+    def __init__(self, demande: tuple = None, devis: dict = None, etats=ETATS):
+        self.demande = demande
+        self.etats = etats
+        self.etat = etats[0]
+        self.devis = devis
+        self.fichier_pdf = None
+        self.erreur = None
+        self.etat_echec = None
+        self._terminee = threading.Event()
+
+    @property
+    def progression(self) -> float:
+        """Retourne l'avancement de la tâche, entre 0 et 1."""
+        etat = self.etat_echec if self.etat == ECHEC else self.etat
+        return self.etats.index(etat) / (len(self.etats) - 1)
+
+    def terminee(self) -> bool:
+        """Retourne True si la tâche est terminée (dernier état ou échec)."""
+        return self._terminee.is_set()
+
+    def attendre(self, delai: float = None) -> bool:
+        """
+        Attend la fin de la tâche.
+
+        Args:
+            delai (float, optional): Le délai maximal d'attente, en secondes.
+
+        Returns:
+            bool: True si la tâche est terminée.
+        """
+        return self._terminee.wait(delai)
+
+
+class PipelineDevis:
+    """
+    Pipeline de traitement des devis, hors du thread de l'interface : chaque
+    devis soumis est chiffré, enregistré puis, si demandé, mis en PDF par un
+    pool de threads. Le PDF d'un devis enregistré peut aussi être demandé
+    plus tard (demander_pdf) : il n'est généré qu'à la première demande.
+
+    À chaque changement d'état, la fonction de suivi de la tâche est appelée
+    (depuis le thread du pool) : l'interface peut confirmer le devis dès qu'il
+    est enregistré, sans attendre la génération du PDF. Une erreur de la
+    fonction de suivi est journalisée et ne change pas l'état de la tâche.
+    """
+
+    def __init__(
+        self,
+        devis_manager,
+        pdf_manager,
+        travailleurs: int = TRAVAILLEURS_PIPELINE_DEVIS,
+    ):
+        """
+        Initialise le pipeline et son pool de threads.
+
+        Args:
+            devis_manager (DevisManager): Le gestionnaire des devis.
+            pdf_manager (PDFManager): Le générateur de PDF.
+            travailleurs (int, optional): Le nombre de devis traités en parallèle.
+        """
+        self.devis_manager = devis_manager
+        self.pdf_manager = pdf_manager
+        self._executeur = ThreadPoolExecutor(
+            max_workers=travailleurs, thread_name_prefix="PipelineDevis"
+        )
+
+    def soumettre(
+        self,
+        nom_client: str,
+        metal: str,
+        quantite_ml: float,
+        forme: str,
+        remise_client: float,
+        suivi=None,
+        pdf: bool = True,
+    ) -> TacheDevis:
+        """
+        Soumet une demande de devis au pipeline.
+
+        Args:
+            nom_client (str): Le nom du client.
+            metal (str): Le type de métal à découper.
+            quantite_ml (float): La quantité en millimètres linéaires.
+            forme (str): La forme de découpe.
+            remise_client (float): La remise client en pourcentage.
+            suivi (callable, optional): Appelée avec la tâche à chaque
+            changement d'état.
+            pdf (bool, optional): Si False, la tâche se termine à l'état
+            ENREGISTRE, sans générer le PDF.
+
+        Returns:
+            TacheDevis: La tâche, à l'état SOUMIS.
+
+        Raises:
+            RuntimeError: Si le pipeline a été arrêté.
+        """
+        tache = TacheDevis(
+            demande=(nom_client, metal, quantite_ml, forme, remise_client),
+            etats=ETATS if pdf else ETATS_SANS_PDF,
+        )
+        self._executeur.submit(self._traiter, tache, suivi)
+        return tache
+
+    def demander_pdf(self, devis: dict, suivi=None) -> TacheDevis:
+        """
+        Demande le PDF d'un devis enregistré : il est généré s'il n'existe pas
+        encore ou si le devis ou son client a changé (PDFManager.obtenir_pdf).
+
+        Args:
+            devis (dict): Le devis enregistré.
+            suivi (callable, optional): Appelée avec la tâche à chaque
+            changement d'état.
+
+        Returns:
+            TacheDevis: La tâche, à l'état ENREGISTRE.
+
+        Raises:
+            RuntimeError: Si le pipeline a été arrêté.
+        """
+        tache = TacheDevis(devis=devis, etats=ETATS_PDF)
+        self._executeur.submit(self._traiter, tache, suivi)
+        return tache
+
+    @staticmethod
+    def _changer_etat(tache: TacheDevis, etat: str, suivi):
+        """
+        Passe la tâche à un nouvel état et en informe la fonction de suivi.
+        Une erreur de la fonction de suivi n'interrompt pas la tâche : le devis
+        enregistré ou le PDF généré ne doit pas être marqué en échec.
+        """
+        tache.etat = etat
+        if suivi is None:
+            return
+        try:
+            suivi(tache)
+        except Exception:
+            logger.exception("Erreur de la fonction de suivi (état %s)", etat)
+
+    def _traiter(self, tache: TacheDevis, suivi):
+        """Traite une tâche de bout en bout, dans un thread du pool."""
+        try:
+            if tache.etat == SOUMIS:
+                tache.devis = self.devis_manager.preparer_devis(*tache.demande)
+                self._changer_etat(tache, CHIFFRE, suivi)
+                # Attend l'écriture effective du devis (lot de la file d'écriture)
+                self.devis_manager.enregistrer_devis(tache.devis).result()
+                self._changer_etat(tache, ENREGISTRE, suivi)
+            if PDF_PRET in tache.etats:
+                tache.fichier_pdf = self.pdf_manager.obtenir_pdf(tache.devis)
+                self._changer_etat(tache, PDF_PRET, suivi)
+        except Exception as ex:
+            tache.erreur = ex
+            tache.etat_echec = tache.etat
+            self._changer_etat(tache, ECHEC, suivi)
+        finally:
+            tache._terminee.set()
+
+    def arreter(self):
+        """Attend la fin des tâches soumises et arrête le pool."""
+        self._executeur.shutdown(wait=True)
@@ -0,0 +1,295 @@
+""" Module de recalcul des devis existants avec un nouveau jeu de tarifs. """
+
+import argparse
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+import devis_manager
+from constants import FORME_COEFFICIENT, METAL_PROPERTIES, STOCKAGE
+from devis_manager import DevisManager
+from enregistrements import _nombre
+from index_csv import IndexCSV
+from parallele import executer_borne
+from schemas import SCHEMA_DEVIS
+
+# Nombre de devis envoyés à la fois à un processus du pool
+TAILLE_LOT = 20000
+# Dossier des fichiers de devis recalculés et des rapports
+DOSSIER_SORTIE = "datas/outputs_csv"
+# Colonnes recalculées, et colonne conservant l'ancien prix total
+COLONNES_RECALCULEES = ["Coût Matériaux", "Coût Découpe", "Frais Fixes", "Prix Total"]
+COLONNE_ANCIEN_PRIX = "Prix Total Précédent"
+
+
+def _appliquer_tarifs(tarifs: dict):
+    """
+    Initialise un processus du pool avec le jeu de tarifs à appliquer : les
+    constantes utilisées par DevisManager sont remplacées dans ce processus
+    uniquement.
+    """
+    for nom in ("TARIF_MACHINE", "TARIF_OPERATEUR", "FRAIS_FIXES"):
+        if tarifs.get(nom) is not None:
+            setattr(devis_manager, nom, tarifs[nom])
+    for metal, cout in tarifs.get("cout_materiaux", {}).items():
+        METAL_PROPERTIES[metal]["cout_materiaux"] = cout
+
+
+def _agreger(cles: np.ndarray, anciens: np.ndarray, nouveaux: np.ndarray) -> dict:
+    """Retourne {clé: [ancien total, nouveau total, nombre de devis]}."""
+    noms, inverse = np.unique(cles, return_inverse=True)
+    ancien = np.bincount(inverse, weights=anciens, minlength=len(noms))
+    nouveau = np.bincount(inverse, weights=nouveaux, minlength=len(noms))
+    nombre = np.bincount(inverse, minlength=len(noms))
+    return {
+        str(nom): [float(a), float(n), int(c)]
+        for nom, a, n, c in zip(noms, ancien, nouveau, nombre)
+    }
+
+
+def _recalculer_lot(colonnes: dict) -> dict:
+    """
+    Recalcule un lot de devis (exécuté dans un processus du pool).
+
+    Args:
+        colonnes (dict): Les colonnes du lot (une liste de valeurs par
+        colonne du schéma des devis).
+
+    Returns:
+        dict: "texte" (les lignes CSV du lot, recalculées), "ignores" (le
+        nombre de devis invalides, non recalculés) et les agrégats
+        "par_metal" et "par_client".
+    """
+    quantites = np.array(
+        [_nombre(q) for q in colonnes["Quantité (mm)"]], dtype=np.float64
+    )
+    remises = np.array([_nombre(r) for r in colonnes["Remise (%)"]], dtype=np.float64)
+    anciens = np.array([_nombre(p) for p in colonnes["Prix Total"]], dtype=np.float64)
+    metaux = np.array([m or "" for m in colonnes["Métal"]], dtype=str)
+    formes = np.array([f or "" for f in colonnes["Forme"]], dtype=str)
+    # Les devis incomplets ou invalides ne sont pas recalculés
+    valides = (
+        ~np.isnan(quantites)
+        & ~np.isnan(remises)
+        & ~np.isnan(anciens)
+        & np.isin(metaux, list(METAL_PROPERTIES))
+        & np.isin(formes, list(FORME_COEFFICIENT))
+    )
+    resultat = devis_manager.DevisManager(csv_manager=None).calculer_devis_batch(
+        metaux[valides], quantites[valides], formes[valides], remises[valides]
+    )
+    clients = np.array(
+        [IndexCSV.normaliser(c) for c in colonnes["Nom Client"]], dtype=str
+    )
+    nouveaux = resultat["Prix Total"]
+
+    # Colonnes du fichier de sortie : valeurs recalculées pour les devis
+    # valides, vides pour les autres, et ancien prix total en dernière colonne
+    sorties = dict(colonnes)
+    sorties[COLONNE_ANCIEN_PRIX] = colonnes["Prix Total"]
+    for nom in COLONNES_RECALCULEES:
+        recalculees = np.full(len(valides), "", dtype=object)
+        recalculees[valides] = resultat[nom].tolist()
+        sorties[nom] = recalculees.tolist()
+    tampon = io.StringIO(newline="")
+    csv.writer(tampon).writerows(
+        zip(*(sorties[nom] for nom in SCHEMA_DEVIS.colonnes + [COLONNE_ANCIEN_PRIX]))
+    )
+    return {
+        "texte": tampon.getvalue(),
+        "ignores": int(len(valides) - valides.sum()),
+        "par_metal": _agreger(metaux[valides], anciens[valides], nouveaux),
+        "par_client": _agreger(clients[valides], anciens[valides], nouveaux),
+    }
+
+
+def _lots(lignes, taille: int):
+    """
+    Regroupe les devis par lots de colonnes (une liste de valeurs par colonne
+    du schéma), sous la forme des tâches de executer_borne.
+    """
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield None, _colonnes(lot)
+            lot = []
+    if lot:
+        yield None, _colonnes(lot)
+
+
+def _colonnes(lot: list) -> dict:
+    """Retourne les colonnes (schéma des devis) d'un lot de devis."""
+    return {nom: [ligne.get(nom) for ligne in lot] for nom in SCHEMA_DEVIS.colonnes}
+
+
+def _fusionner(total: dict, partiel: dict):
+    """Ajoute les agrégats d'un lot aux agrégats globaux."""
+    for cle, (ancien, nouveau, nombre) in partiel.items():
+        cumul = total.setdefault(cle, [0.0, 0.0, 0])
+        cumul[0] += ancien
+        cumul[1] += nouveau
+        cumul[2] += nombre
+
+
+def _ecart(agregats: dict) -> dict:
+    """Met en forme des agrégats pour le rapport, par écart décroissant."""
+    return {
+        cle: {
+            "devis": nombre,
+            "ancien": round(ancien, 3),
+            "nouveau": round(nouveau, 3),
+            "ecart": round(nouveau - ancien, 3),
+        }
+        for cle, (ancien, nouveau, nombre) in sorted(
+            agregats.items(), key=lambda item: -abs(item[1][1] - item[1][0])
+        )
+    }
+
+
+def recalculer_devis(
+    stockage,
+    chemin_sortie: str,
+    tarifs: dict = None,
+    debut: str = None,
+    fin: str = None,
+    processus: int = None,
+) -> dict:
+    """
+    Recalcule tous les devis (ou ceux d'une période) avec un jeu de tarifs,
+    écrit les devis recalculés dans un nouveau fichier CSV et retourne le
+    rapport des écarts.
+
+    Les devis sont lus en flux et recalculés par lots dans un pool de
+    processus ; seuls quelques lots sont en mémoire à la fois.
+
+    Args:
+        stockage (CSVManager): Le gestionnaire de stockage (CSV ou SQLite).
+        chemin_sortie (str): Le fichier CSV des devis recalculés.
+        tarifs (dict, optional): Les tarifs remplaçant ceux de constants.py :
+        "TARIF_MACHINE", "TARIF_OPERATEUR", "FRAIS_FIXES" et "cout_materiaux"
+        ({métal: coût}). Par défaut, les valeurs de constants.py.
+        debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+        fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+        processus (int, optional): Le nombre de processus du pool.
+
+    Returns:
+        dict: Le rapport : nombre de devis recalculés et ignorés, chiffre
+        d'affaires ancien, nouveau et écart, et le détail par métal et par client.
+    """
+    processus = processus or os.cpu_count() or 1
+    tarifs = tarifs or {}
+    inconnus = set(tarifs.get("cout_materiaux", {})) - set(METAL_PROPERTIES)
+    if inconnus:
+        raise ValueError(f"Métaux inconnus : {', '.join(sorted(inconnus))}")
+    par_metal, par_client = {}, {}
+    ignores = 0
+    if os.path.dirname(chemin_sortie):
+        os.makedirs(os.path.dirname(chemin_sortie), exist_ok=True)
+    lignes = DevisManager(stockage).iter_devis(debut=debut, fin=fin)
+    with open(
+        chemin_sortie, "w", newline="", encoding="utf-8"
+    ) as fichier, ProcessPoolExecutor(
+        max_workers=processus,
+        initializer=_appliquer_tarifs,
+        initargs=(tarifs,),
+    ) as executeur:
+        csv.writer(fichier).writerow(SCHEMA_DEVIS.colonnes + [COLONNE_ANCIEN_PRIX])
+        # Les lignes CSV sont produites par le pool : seul le texte est écrit ici
+        for _, resultat in executer_borne(
+            executeur, _recalculer_lot, _lots(lignes, TAILLE_LOT), 2 * processus
+        ):
+            fichier.write(resultat["texte"])
+            ignores += resultat["ignores"]
+            _fusionner(par_metal, resultat["par_metal"])
+            _fusionner(par_client, resultat["par_client"])
+    ancien = sum(a for a, _, _ in par_metal.values())
+    nouveau = sum(n for _, n, _ in par_metal.values())
+    return {
+        "devis_recalcules": sum(c for _, _, c in par_metal.values()),
+        "devis_ignores": ignores,
+        "chiffre_affaires_ancien": round(ancien, 3),
+        "chiffre_affaires_nouveau": round(nouveau, 3),
+        "ecart_total": round(nouveau - ancien, 3),
+        "par_metal": _ecart(par_metal),
+        "par_client": _ecart(par_client),
+    }
+
+
+def _cout_materiaux(valeur: str) -> tuple:
+    """Convertit un argument "Métal=coût" en (métal, coût)."""
+    metal, _, cout = valeur.partition("=")
+    try:
+        return metal, float(cout)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Format attendu : Métal=coût (reçu : {valeur})"
+        )
+
+
+if __name__ == "__main__":
+    from sqlite_manager import creer_stockage
+
+    parser = argparse.ArgumentParser(
+        description="Recalcule les devis existants avec un nouveau jeu de tarifs "
+        "(par défaut, les valeurs actuelles de constants.py)."
+    )
+    parser.add_argument("--tarif-machine", type=float)
+    parser.add_argument("--tarif-operateur", type=float)
+    parser.add_argument("--frais-fixes", type=float)
+    parser.add_argument(
+        "--cout-materiaux",
+        type=_cout_materiaux,
+        action="append",
+        default=[],
+        metavar="METAL=COUT",
+    )
+    parser.add_argument("--debut", help="Première date incluse (AAAA-MM[-JJ])")
+    parser.add_argument("--fin", help="Dernière date incluse (AAAA-MM[-JJ])")
+    parser.add_argument("--processus", type=int, help="Taille du pool de processus")
+    parser.add_argument(
+        "--sortie",
+        default=os.path.join(
+            DOSSIER_SORTIE,
+            f"devis_recalcul_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv",
+        ),
+    )
+    arguments = parser.parse_args()
+
+    debut_calcul = datetime.now()
+    rapport = recalculer_devis(
+        creer_stockage(os.getenv("STOCKAGE", STOCKAGE)),
+        arguments.sortie,
+        tarifs={
+            "TARIF_MACHINE": arguments.tarif_machine,
+            "TARIF_OPERATEUR": arguments.tarif_operateur,
+            "FRAIS_FIXES": arguments.frais_fixes,
+            "cout_materiaux": dict(arguments.cout_materiaux),
+        },
+        debut=arguments.debut,
+        fin=arguments.fin,
+        processus=arguments.processus,
+    )
+    duree = (datetime.now() - debut_calcul).total_seconds()
+    chemin_rapport = os.path.splitext(arguments.sortie)[0] + ".rapport.json"
+    with open(chemin_rapport, "w", encoding="utf-8") as fichier_rapport:
+        json.dump(rapport, fichier_rapport, ensure_ascii=False, indent=2)
+
+    print(
+        f"{rapport['devis_recalcules']} devis recalculés "
+        f"({rapport['devis_ignores']} ignorés) en {duree:.1f} s"
+    )
+    print(
+        f"Chiffre d'affaires : {rapport['chiffre_affaires_ancien']:.2f} € -> "
+        f"{rapport['chiffre_affaires_nouveau']:.2f} € "
+        f"(écart {rapport['ecart_total']:+.2f} €)"
+    )
+    for metal, detail in rapport["par_metal"].items():
+        print(f"  {metal} : {detail['ecart']:+.2f} € ({detail['devis']} devis)")
+    print(f"Devis recalculés : {arguments.sortie}")
+    print(f"Rapport complet (dont l'écart par client) : {chemin_rapport}")
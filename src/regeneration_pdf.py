@@ -0,0 +1,271 @@
+""" Module de régénération en masse des PDF des devis, dans un pool de processus. """
+
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import DOSSIER_PDF, FICHIER_CLIENTS, STOCKAGE
+from enregistrements import Client
+from index_csv import IndexCSV
+from parallele import executer_borne
+from partitions import dans_periode, lister_partitions
+from pdf_manager import PDFManager
+
+# Nombre de PDF générés par tâche envoyée au pool
+TAILLE_LOT = 50
+# Avancement de la dernière régénération, pour la reprendre si elle est interrompue
+FICHIER_PROGRESSION = os.path.join(DOSSIER_PDF, "regeneration.progression")
+
+# PDFManager de chaque processus du pool (créé par _initialiser_processus)
+_pdf_manager = None
+_forcer = True
+
+
+def _initialiser_processus(clients: dict, forcer: bool):
+    """
+    Initialise un processus du pool : son PDFManager utilise les clients déjà
+    chargés par le processus principal, clients.csv n'est pas relu.
+    """
+    global _pdf_manager, _forcer
+    _pdf_manager = PDFManager(csv_manager=None, clients=clients)
+    _forcer = forcer
+
+
+def _regenerer_lot(lot: list) -> dict:
+    """
+    Génère les PDF d'un lot de devis (exécuté dans un processus du pool).
+
+    Returns:
+        dict: "processus" (pid), "pdf" (nombre de PDF) et "duree" (secondes).
+    """
+    debut = time.perf_counter()
+    for devis in lot:
+        _pdf_manager.obtenir_pdf(devis, forcer=_forcer)
+    return {
+        "processus": os.getpid(),
+        "pdf": len(lot),
+        "duree": time.perf_counter() - debut,
+    }
+
+
+def _lots(devis, taille: int):
+    """
+    Regroupe les devis par lots, sous la forme des tâches de executer_borne.
+    Le contexte d'un lot est la position de son dernier devis dans chaque
+    partition : {partition: {"ligne": indice, "numero": numéro}}.
+    """
+    while True:
+        lot = list(itertools.islice(devis, taille))
+        if not lot:
+            return
+        positions = {
+            chemin: {"ligne": indice, "numero": ligne.get("Numéro")}
+            for chemin, indice, ligne in lot
+        }
+        yield positions, [ligne for _, _, ligne in lot]
+
+
+def _reprise(stockage, chemin: str, position: dict) -> int:
+    """
+    Retourne l'indice de la première ligne d'une partition qui n'a pas encore
+    été traitée. Le dernier devis traité est recherché par son numéro : des
+    devis ajoutés ou une partition réécrite depuis ne décalent pas la reprise.
+    Si ce devis n'existe plus, la partition est reprise depuis le début.
+    """
+    if not position:
+        return 0
+    trouvee = None
+    for indice, ligne in enumerate(stockage.iter_csv(chemin, colonnes=["Numéro"])):
+        if ligne["Numéro"] == position["numero"]:
+            trouvee = indice
+            # Le plus proche de la position enregistrée, si le numéro est répété
+            if indice >= position["ligne"]:
+                break
+    return 0 if trouvee is None else trouvee + 1
+
+
+def _devis_a_regenerer(
+    stockage, positions: dict, debut: str = None, fin: str = None, filtre=None
+):
+    """
+    Parcourt les devis d'une période, partition par partition, en sautant
+    ceux déjà traités par une régénération interrompue.
+
+    Yields:
+        tuple: (partition, indice de la ligne dans la partition, devis).
+    """
+    for chemin in lister_partitions(stockage, debut, fin):
+        depart = _reprise(stockage, chemin, positions.get(chemin))
+        lignes = itertools.islice(enumerate(stockage.iter_csv(chemin)), depart, None)
+        for indice, ligne in lignes:
+            if (debut or fin) and not dans_periode(ligne.get("Date"), debut, fin):
+                continue
+            if filtre is None or filtre(ligne):
+                yield chemin, indice, ligne
+
+
+def _lire_progression(chemin: str, selection: dict) -> tuple:
+    """
+    Retourne (nombre de devis déjà traités, position du dernier devis traité
+    dans chaque partition) d'une régénération interrompue de la même
+    sélection ((0, {}) s'il n'y en a pas).
+    """
+    try:
+        with open(chemin, "r", encoding="utf-8") as fichier:
+            progression = json.load(fichier)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0, {}
+    if progression.get("selection") != selection or "positions" not in progression:
+        return 0, {}
+    return int(progression.get("termines", 0)), progression["positions"]
+
+
+def _ecrire_progression(chemin: str, selection: dict, termines: int, positions: dict):
+    """Enregistre l'avancement (remplacement atomique du fichier)."""
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        json.dump(
+            {"selection": selection, "termines": termines, "positions": positions},
+            fichier,
+        )
+    os.replace(temporaire, chemin)
+
+
+def regenerer_pdf(
+    stockage,
+    client: str = None,
+    debut: str = None,
+    fin: str = None,
+    processus: int = None,
+    forcer: bool = True,
+    reprendre: bool = True,
+    chemin_progression: str = FICHIER_PROGRESSION,
+) -> dict:
+    """
+    Régénère les PDF des devis d'un client, d'une période, ou de tous les
+    devis.
+
+    Les clients sont lus une seule fois et transmis aux processus du pool ;
+    les devis sont lus en flux et envoyés par lots, avec un nombre borné de
+    lots en attente. L'avancement (dernier devis traité de chaque partition)
+    est enregistré après chaque lot : une régénération interrompue reprend là
+    où elle s'était arrêtée, même si des devis ont été ajoutés entre-temps.
+
+    Args:
+        stockage (CSVManager): Le gestionnaire de stockage (CSV ou SQLite).
+        client (str, optional): Le nom du client (tous les clients par défaut).
+        debut (str, optional): Première date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+        fin (str, optional): Dernière date incluse ("AAAA-MM-JJ" ou "AAAA-MM").
+        processus (int, optional): Le nombre de processus du pool.
+        forcer (bool, optional): Si False, seuls les PDF absents ou périmés
+        (devis ou client modifié) sont générés.
+        reprendre (bool, optional): Si False, l'avancement d'une régénération
+        interrompue est ignoré.
+        chemin_progression (str, optional): Le fichier d'avancement.
+
+    Returns:
+        dict: Les statistiques : nombre de PDF traités, nombre de devis repris
+        d'une régénération interrompue, durée et débit de chaque processus.
+    """
+    processus = processus or os.cpu_count() or 1
+    selection = {"client": client, "debut": debut, "fin": fin, "forcer": forcer}
+    deja, positions = (
+        _lire_progression(chemin_progression, selection) if reprendre else (0, {})
+    )
+
+    clients = PDFManager.indexer_clients(
+        stockage.iter_enregistrements(FICHIER_CLIENTS, Client)
+    )
+    filtre = None
+    if client:
+        nom_client = IndexCSV.normaliser(client)
+
+        def filtre(ligne):
+            return IndexCSV.normaliser(ligne.get("Nom Client")) == nom_client
+
+    devis = _devis_a_regenerer(stockage, positions, debut, fin, filtre)
+
+    debut_regeneration = time.perf_counter()
+    termines = deja
+    par_processus = {}
+    if os.path.dirname(chemin_progression):
+        os.makedirs(os.path.dirname(chemin_progression), exist_ok=True)
+    with ProcessPoolExecutor(
+        max_workers=processus,
+        initializer=_initialiser_processus,
+        initargs=(clients, forcer),
+    ) as executeur:
+        # Les lots sont rendus dans l'ordre : leurs positions ne reculent jamais
+        for positions_lot, resultat in executer_borne(
+            executeur, _regenerer_lot, _lots(devis, TAILLE_LOT), 2 * processus
+        ):
+            termines += resultat["pdf"]
+            positions.update(positions_lot)
+            _ecrire_progression(chemin_progression, selection, termines, positions)
+            cumul = par_processus.setdefault(
+                resultat["processus"], {"pdf": 0, "duree": 0.0}
+            )
+            cumul["pdf"] += resultat["pdf"]
+            cumul["duree"] += resultat["duree"]
+    # La régénération est complète : il n'y a plus rien à reprendre
+    if os.path.exists(chemin_progression):
+        os.remove(chemin_progression)
+
+    for cumul in par_processus.values():
+        cumul["debit"] = cumul["pdf"] / max(cumul["duree"], 1e-9)
+    return {
+        "pdf": termines - deja,
+        "repris": deja,
+        "processus": processus,
+        "duree": time.perf_counter() - debut_regeneration,
+        "par_processus": par_processus,
+    }
+
+
+if __name__ == "__main__":
+    from sqlite_manager import creer_stockage
+
+    parser = argparse.ArgumentParser(
+        description="Régénère les PDF des devis (tous, ceux d'un client ou "
+        "ceux d'une période). Une régénération interrompue est reprise."
+    )
+    parser.add_argument("--client", help="Nom du client")
+    parser.add_argument("--debut", help="Première date incluse (AAAA-MM[-JJ])")
+    parser.add_argument("--fin", help="Dernière date incluse (AAAA-MM[-JJ])")
+    parser.add_argument("--processus", type=int, help="Taille du pool de processus")
+    parser.add_argument(
+        "--perimes",
+        action="store_true",
+        help="Ne générer que les PDF absents ou périmés",
+    )
+    parser.add_argument(
+        "--recommencer",
+        action="store_true",
+        help="Ignorer l'avancement d'une régénération interrompue",
+    )
+    arguments = parser.parse_args()
+
+    stats = regenerer_pdf(
+        creer_stockage(os.getenv("STOCKAGE", STOCKAGE)),
+        client=arguments.client,
+        debut=arguments.debut,
+        fin=arguments.fin,
+        processus=arguments.processus,
+        forcer=not arguments.perimes,
+        reprendre=not arguments.recommencer,
+    )
+    if stats["repris"]:
+        print(f"Reprise après {stats['repris']} devis déjà traités")
+    print(
+        f"{stats['pdf']} PDF traités en {stats['duree']:.2f} s "
+        f"sur {stats['processus']} processus "
+        f"({stats['pdf'] / max(stats['duree'], 1e-9):.1f} PDF/s)"
+    )
+    for pid, cumul in sorted(stats["par_processus"].items()):
+        print(
+            f"  processus {pid} : {cumul['pdf']} PDF en {cumul['duree']:.2f} s "
+            f"({cumul['debit']:.1f} PDF/s)"
+        )
@@ -0,0 +1,155 @@
+""" Module contenant le registre des schémas des fichiers CSV (clients et devis). """
+
+import csv
+import os
+import re
+
+from constants import FICHIER_CLIENTS, FICHIER_DEVIS
+
+
+class Schema:
+    """
+    Schéma d'un fichier CSV : colonnes canoniques, dans leur ordre, et alias
+    acceptés pour chacune (anciens noms de colonnes).
+    """
+
+    def __init__(self, colonnes: list, alias: dict = None):
+        """
+        Initialise un schéma.
+
+        Args:
+            colonnes (list): Les noms canoniques des colonnes, dans l'ordre.
+            alias (dict, optional): Les anciens noms de colonnes et le nom
+            canonique correspondant.
+        """
+        self.colonnes = list(colonnes)
+        self.alias = dict(alias or {})
+
+    def canonique(self, colonne: str) -> str:
+        """Retourne le nom canonique d'une colonne (inchangé s'il n'est pas un alias)."""
+        return self.alias.get(colonne, colonne)
+
+    def reconcilier(self, en_tetes: list) -> list:
+        """
+        Retourne les en-têtes d'un fichier avec leurs noms canoniques,
+        dans l'ordre du fichier.
+        """
+        return [self.canonique(colonne) for colonne in en_tetes]
+
+    def valider(self, ligne: dict) -> dict:
+        """
+        Retourne une ligne dont les clés sont les noms canoniques des colonnes.
+
+        Args:
+            ligne (dict): La ligne à valider.
+
+        Returns:
+            dict: La ligne avec les noms de colonnes canoniques.
+
+        Raises:
+            ValueError: Si la ligne contient une colonne inconnue du schéma.
+        """
+        canonique = {self.canonique(cle): valeur for cle, valeur in ligne.items()}
+        inconnues = [cle for cle in canonique if cle not in self.colonnes]
+        if inconnues:
+            raise ValueError(f"Colonnes inconnues : {', '.join(inconnues)}")
+        return canonique
+
+
+SCHEMA_CLIENTS = Schema(["Nom", "Adresse", "Code Postal", "Téléphone", "Entreprise"])
+
+SCHEMA_DEVIS = Schema(
+    [
+        "Numéro",
+        "Nom Client",
+        "Métal",
+        "Quantité (mm)",
+        "Forme",
+        "Remise (%)",
+        "Prix Total",
+        "Coût Matériaux",
+        "Coût Découpe",
+        "Frais Fixes",
+        "Date",
+    ],
+    alias={
+        "Matériau": "Métal",
+        "Frais Frixes": "Frais Fixes",
+        "Quantité": "Quantité (mm)",
+    },
+)
+
+# Schéma associé au nom des fichiers (clients.csv, devis.csv, ...)
+SCHEMAS = {
+    os.path.basename(FICHIER_CLIENTS): SCHEMA_CLIENTS,
+    os.path.basename(FICHIER_DEVIS): SCHEMA_DEVIS,
+}
+
+
+def schema_pour(chemin_fichier: str):
+    """
+    Retourne le schéma d'un fichier CSV d'après son nom, ou None si le fichier
+    n'a pas de schéma déclaré. Les partitions mensuelles (devis_AAAA-MM.csv)
+    ont le schéma du fichier dont elles sont issues.
+    """
+    nom = re.sub(r"_\d{4}-\d{2}\.csv$", ".csv", os.path.basename(chemin_fichier))
+    return SCHEMAS.get(nom)
+
+
+def migrer_fichier(chemin_fichier: str) -> bool:
+    """
+    Réécrit un fichier CSV selon son schéma canonique (noms et ordre des
+    colonnes), en une seule passe et sans le charger en mémoire. Le fichier
+    est remplacé en une seule opération à la fin de la réécriture.
+
+    Args:
+        chemin_fichier (str): Le chemin du fichier CSV.
+
+    Returns:
+        bool: True si le fichier a été réécrit, False s'il était déjà conforme
+        (ou absent, ou sans schéma).
+
+    Raises:
+        ValueError: Si le fichier contient une colonne inconnue du schéma.
+    """
+    schema = schema_pour(chemin_fichier)
+    if schema is None or not os.path.exists(chemin_fichier):
+        return False
+    chemin_temporaire = chemin_fichier + ".tmp"
+    with open(chemin_fichier, "r", newline="", encoding="utf-8") as source:
+        lecteur = csv.reader(source)
+        en_tetes = next(lecteur, None)
+        if en_tetes is None or en_tetes == schema.colonnes:
+            return False
+        en_tetes = schema.reconcilier(en_tetes)
+        schema.valider(dict.fromkeys(en_tetes))
+        # Position de chaque colonne canonique dans le fichier d'origine
+        positions = [
+            en_tetes.index(colonne) if colonne in en_tetes else None
+            for colonne in schema.colonnes
+        ]
+        with open(chemin_temporaire, "w", newline="", encoding="utf-8") as cible:
+            ecrivain = csv.writer(cible)
+            ecrivain.writerow(schema.colonnes)
+            for valeurs in lecteur:
+                if not valeurs:
+                    continue
+                ecrivain.writerow(
+                    [
+                        valeurs[i] if i is not None and i < len(valeurs) else ""
+                        for i in positions
+                    ]
+                )
+    os.replace(chemin_temporaire, chemin_fichier)
+    # Les positions des lignes ont changé : l'index sera reconstruit
+    if os.path.exists(chemin_fichier + ".idx"):
+        os.remove(chemin_fichier + ".idx")
+    return True
+
+
+if __name__ == "__main__":
+    for fichier in (FICHIER_CLIENTS, FICHIER_DEVIS):
+        if migrer_fichier(fichier):
+            print(f"{fichier} : migré vers le schéma canonique")
+        else:
+            print(f"{fichier} : déjà conforme")
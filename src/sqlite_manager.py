@@ -0,0 +1,535 @@
+""" Module SQLiteManager : stockage SQLite avec la même interface que CSVManager. """
+
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from constants import FICHIER_SQLITE
+from csv_manager import CSVManager
+from schemas import schema_pour
+
+# Taille des lots lus et insérés lors des parcours et de la migration
+TAILLE_LOT = 1000
+
+
+class SQLiteManager:
+    """
+    Stockage des données dans une base SQLite locale.
+
+    Chaque fichier CSV de l'application (identifié par son chemin, comme pour
+    CSVManager) correspond à une table dont les colonnes sont celles du CSV.
+    Les valeurs sont stockées en texte, afin que les lignes retournées soient
+    identiques à celles lues par CSVManager.
+    """
+
+    def __init__(self, chemin_base: str = FICHIER_SQLITE):
+        """
+        Ouvre (ou crée) la base SQLite.
+
+        Args:
+            chemin_base (str): Le chemin du fichier de base de données.
+        """
+        self.chemin_base = chemin_base
+        self._verrou = threading.RLock()
+        self._connexion = sqlite3.connect(chemin_base, check_same_thread=False)
+        # Mode WAL : les lectures ne sont pas bloquées par une écriture en cours
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        self._connexion.execute(
+            "CREATE TABLE IF NOT EXISTS _fichiers ("
+            "chemin TEXT PRIMARY KEY, nom_table TEXT NOT NULL, en_tetes TEXT NOT NULL)"
+        )
+        self._connexion.commit()
+
+    def fermer(self):
+        """Ferme la connexion à la base."""
+        with self._verrou:
+            self._connexion.close()
+
+    @contextmanager
+    def verrou_ecriture(self, file_path: str):
+        """
+        Verrou des écritures de la base, à tenir autour d'une lecture suivie
+        d'une écriture qui en dépend : la transaction prend le verrou
+        d'écriture de SQLite dès la lecture.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine (accepté pour
+            compatibilité avec CSVManager : le verrou couvre toute la base).
+        """
+        with self._verrou, self._connexion:
+            if not self._connexion.in_transaction:
+                self._connexion.execute("BEGIN IMMEDIATE")
+            yield
+
+    @staticmethod
+    def _identifiant(nom: str) -> str:
+        """Retourne un identifiant SQL entre guillemets (nom de table ou de colonne)."""
+        return '"' + nom.replace('"', '""') + '"'
+
+    @staticmethod
+    def _nom_table(file_path: str) -> str:
+        """Retourne le nom de table associé au chemin d'un fichier CSV."""
+        chemin = os.path.splitext(os.path.normpath(file_path))[0]
+        return re.sub(r"\W", "_", chemin).strip("_")
+
+    def _table(self, file_path: str):
+        """
+        Retourne (nom de table, en-têtes) pour un fichier, ou None si aucune table
+        n'a encore été créée pour ce fichier.
+        """
+        ligne = self._connexion.execute(
+            "SELECT nom_table, en_tetes FROM _fichiers WHERE chemin = ?",
+            (os.path.normpath(file_path),),
+        ).fetchone()
+        if ligne is None:
+            return None
+        return ligne[0], json.loads(ligne[1])
+
+    def _creer_index(self, nom_table: str, en_tetes: list):
+        """
+        Crée les index utiles aux recherches de l'application : nom du client,
+        et couple (nom du client, date) pour les devis.
+        """
+        table = self._identifiant(nom_table)
+        if "Nom" in en_tetes:
+            self._connexion.execute(
+                f"CREATE INDEX IF NOT EXISTS {self._identifiant(nom_table + '_nom')} "
+                f'ON {table} (UPPER(TRIM("Nom")))'
+            )
+        if "Nom Client" in en_tetes:
+            colonnes = 'UPPER(TRIM("Nom Client"))'
+            if "Date" in en_tetes:
+                colonnes += ', "Date"'
+            self._connexion.execute(
+                "CREATE INDEX IF NOT EXISTS "
+                f"{self._identifiant(nom_table + '_nom_client_date')} "
+                f"ON {table} ({colonnes})"
+            )
+
+    def _assurer_table(self, file_path: str, en_tetes) -> tuple:
+        """
+        Crée la table d'un fichier si besoin, et ajoute les colonnes manquantes.
+        Retourne (nom de table, en-têtes).
+        """
+        table = self._table(file_path)
+        if table is None:
+            nom_table = self._nom_table(file_path)
+            en_tetes = list(en_tetes)
+            colonnes = ", ".join(f"{self._identifiant(c)} TEXT" for c in en_tetes)
+            self._connexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._identifiant(nom_table)} ({colonnes})"
+            )
+            self._connexion.execute(
+                "INSERT INTO _fichiers (chemin, nom_table, en_tetes) VALUES (?, ?, ?)",
+                (
+                    os.path.normpath(file_path),
+                    nom_table,
+                    json.dumps(en_tetes, ensure_ascii=False),
+                ),
+            )
+            self._creer_index(nom_table, en_tetes)
+            return nom_table, en_tetes
+        nom_table, existants = table
+        manquants = [c for c in en_tetes if c not in existants]
+        for colonne in manquants:
+            self._connexion.execute(
+                f"ALTER TABLE {self._identifiant(nom_table)} "
+                f"ADD COLUMN {self._identifiant(colonne)} TEXT"
+            )
+        if manquants:
+            existants = existants + manquants
+            self._connexion.execute(
+                "UPDATE _fichiers SET en_tetes = ? WHERE chemin = ?",
+                (
+                    json.dumps(existants, ensure_ascii=False),
+                    os.path.normpath(file_path),
+                ),
+            )
+            self._creer_index(nom_table, existants)
+        return nom_table, existants
+
+    def _inserer(self, nom_table: str, en_tetes: list, lignes):
+        """Insère des lignes (dictionnaires) dans une table."""
+        colonnes = ", ".join(self._identifiant(c) for c in en_tetes)
+        marqueurs = ", ".join("?" for _ in en_tetes)
+        self._connexion.executemany(
+            f"INSERT INTO {self._identifiant(nom_table)} ({colonnes}) "
+            f"VALUES ({marqueurs})",
+            (
+                tuple(CSVManager._ligne_texte(ligne, en_tetes).values())
+                for ligne in lignes
+            ),
+        )
+
+    def read_csv(self, file_path: str):
+        """
+        Lit toutes les lignes associées à un fichier.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+
+        Returns:
+            list: Les lignes, sous forme de dictionnaires, dans l'ordre d'insertion.
+            Retourne une liste vide si aucune donnée n'existe pour ce fichier.
+        """
+        return list(self.iter_csv(file_path))
+
+    def iter_csv(
+        self,
+        file_path: str,
+        filtre=None,
+        colonnes: list = None,
+        limite: int = None,
+    ):
+        """
+        Parcourt les lignes associées à un fichier, par lots.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+            filtre (callable, optional): Prédicat appliqué à chaque ligne complète.
+            colonnes (list, optional): Les colonnes à conserver.
+            limite (int, optional): Le nombre maximal de lignes à produire.
+
+        Yields:
+            dict: Les lignes retenues, restreintes aux colonnes demandées.
+        """
+        if limite is not None and limite <= 0:
+            return
+        with self._verrou:
+            table = self._table(file_path)
+        if table is None:
+            return
+        nom_table, en_tetes = table
+        # Sans filtre, la projection et la limite sont faites par SQLite
+        if filtre is not None or colonnes is None:
+            lues = en_tetes
+        else:
+            lues = [c for c in colonnes if c in en_tetes]
+        requete = (
+            f"SELECT {', '.join(self._identifiant(c) for c in lues)} "
+            f"FROM {self._identifiant(nom_table)} ORDER BY rowid"
+        )
+        if filtre is None and limite is not None:
+            requete += f" LIMIT {int(limite)}"
+        with self._verrou:
+            curseur = self._connexion.execute(requete)
+        produites = 0
+        try:
+            while True:
+                with self._verrou:
+                    lot = curseur.fetchmany(TAILLE_LOT)
+                if not lot:
+                    return
+                for valeurs in lot:
+                    ligne = {c: "" if v is None else v for c, v in zip(lues, valeurs)}
+                    if filtre is not None and not filtre(ligne):
+                        continue
+                    if colonnes is not None:
+                        ligne = {c: ligne.get(c) for c in colonnes}
+                    yield ligne
+                    produites += 1
+                    if limite is not None and produites >= limite:
+                        return
+        finally:
+            curseur.close()
+
+    def lire_enregistrements(self, file_path: str, type_enregistrement) -> list:
+        """
+        Retourne les lignes associées à un fichier sous forme d'enregistrements
+        typés (Client, Devis).
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+            type_enregistrement (type): La classe des enregistrements.
+
+        Returns:
+            list: Les enregistrements.
+        """
+        return list(self.iter_enregistrements(file_path, type_enregistrement))
+
+    def iter_enregistrements(self, file_path: str, type_enregistrement, filtre=None):
+        """
+        Parcourt les lignes associées à un fichier sous forme d'enregistrements
+        typés.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+            type_enregistrement (type): La classe des enregistrements.
+            filtre (callable, optional): Prédicat appliqué à chaque enregistrement.
+
+        Yields:
+            Les enregistrements retenus.
+        """
+        for ligne in self.iter_csv(file_path):
+            enregistrement = type_enregistrement.depuis_ligne(ligne)
+            if filtre is None or filtre(enregistrement):
+                yield enregistrement
+
+    def write_csv(self, chemin_fichier: str, donnees: list, en_tetes):
+        """
+        Remplace toutes les lignes associées à un fichier.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV d'origine.
+            donnees (list): Les lignes à écrire.
+            en_tetes (list): Les colonnes à écrire.
+        """
+        with self._verrou, self._connexion:
+            nom_table, colonnes = self._assurer_table(chemin_fichier, en_tetes)
+            self._connexion.execute(f"DELETE FROM {self._identifiant(nom_table)}")
+            self._inserer(nom_table, colonnes, donnees)
+
+    def reecrire_csv(self, chemin_fichier: str, transformation, en_tetes):
+        """
+        Remplace les lignes d'un fichier à partir de son contenu courant, dans
+        une seule transaction : aucun ajout concurrent ne peut se glisser entre
+        la lecture et la réécriture.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV d'origine.
+            transformation (callable): Reçoit la liste des lignes actuelles
+            et retourne les lignes à écrire.
+            en_tetes (list): Les colonnes à écrire.
+        """
+        with self._verrou, self._connexion:
+            # Verrou d'écriture de la base pris dès la lecture
+            self._connexion.execute("BEGIN IMMEDIATE")
+            lignes = transformation(list(self.iter_csv(chemin_fichier)))
+            nom_table, colonnes = self._assurer_table(chemin_fichier, en_tetes)
+            self._connexion.execute(f"DELETE FROM {self._identifiant(nom_table)}")
+            self._inserer(nom_table, colonnes, lignes)
+
+    def ajouter_csv(self, chemin_fichier: str, donnees: list, fsync: bool = False):
+        """
+        Ajoute une ou plusieurs lignes aux données d'un fichier.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV d'origine.
+            donnees (list): Une liste de dictionnaires ou un seul dictionnaire.
+            fsync (bool, optional): Accepté pour compatibilité avec CSVManager :
+            chaque transaction validée est déjà écrite sur le disque par SQLite.
+
+        Raises:
+            ValueError: Si les colonnes ne correspondent pas au schéma du fichier.
+        """
+        lignes = donnees if isinstance(donnees, list) else [donnees]
+        if not lignes:
+            return
+        schema = schema_pour(chemin_fichier)
+        if schema is not None:
+            lignes = [schema.valider(ligne) for ligne in lignes]
+        en_tetes = schema.colonnes if schema is not None else lignes[0].keys()
+        with self._verrou, self._connexion:
+            nom_table, colonnes = self._assurer_table(chemin_fichier, en_tetes)
+            self._inserer(nom_table, colonnes, lignes)
+
+    def journaliser(
+        self,
+        chemin_fichier: str,
+        operation: str,
+        colonne_cle: str,
+        cle: str,
+        ligne: dict = None,
+    ):
+        """
+        Applique directement une mutation (ajout, modification ou suppression)
+        identifiée par une clé : SQLite ne réécrit que les lignes concernées.
+        Les opérations suivent la même sémantique que CSVManager.journaliser.
+
+        Raises:
+            ValueError: Si l'opération n'est pas reconnue.
+        """
+        if operation not in ("ajout", "modification", "suppression"):
+            raise ValueError(f"Opération de journal inconnue : {operation}")
+        en_tetes = [colonne_cle] if ligne is None else list(ligne.keys())
+        with self._verrou, self._connexion:
+            nom_table, colonnes = self._assurer_table(chemin_fichier, en_tetes)
+            table = self._identifiant(nom_table)
+            condition = f"TRIM({self._identifiant(colonne_cle)}) = ?"
+            if operation == "suppression":
+                self._connexion.execute(
+                    f"DELETE FROM {table} WHERE {condition}", (cle.strip(),)
+                )
+                return
+            existante = None
+            for recherche in (cle, ligne[colonne_cle]):
+                existante = self._connexion.execute(
+                    f"SELECT rowid FROM {table} WHERE {condition} ORDER BY rowid",
+                    (str(recherche).strip(),),
+                ).fetchone()
+                if existante is not None:
+                    break
+            if existante is None:
+                self._inserer(nom_table, colonnes, [ligne])
+                return
+            valeurs = CSVManager._ligne_texte(ligne, list(ligne.keys()))
+            affectations = ", ".join(f"{self._identifiant(c)} = ?" for c in valeurs)
+            self._connexion.execute(
+                f"UPDATE {table} SET {affectations} WHERE rowid = ?",
+                (*valeurs.values(), existante[0]),
+            )
+
+    def taille_journal(self, chemin_fichier: str) -> int:
+        """Les mutations sont appliquées directement : il n'y a pas de journal."""
+        return 0
+
+    def compacter(self, chemin_fichier: str, en_tetes):
+        """Les mutations sont appliquées directement : rien à compacter."""
+
+    def existe(self, file_path: str) -> bool:
+        """Indique si des données existent pour un fichier."""
+        with self._verrou:
+            return self._table(file_path) is not None
+
+    def lister_fichiers(self, dossier: str) -> list:
+        """
+        Retourne les chemins des fichiers CSV d'origine situés dans un dossier,
+        triés par nom.
+        """
+        dossier = os.path.normpath(dossier)
+        with self._verrou:
+            chemins = self._connexion.execute("SELECT chemin FROM _fichiers").fetchall()
+        return sorted(
+            chemin for (chemin,) in chemins if os.path.dirname(chemin) == dossier
+        )
+
+    def renommer(self, file_path: str, nouveau_chemin: str):
+        """Associe les données d'un fichier à un nouveau chemin."""
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                "UPDATE _fichiers SET chemin = ? WHERE chemin = ?",
+                (os.path.normpath(nouveau_chemin), os.path.normpath(file_path)),
+            )
+
+    def enregistrer_index(self, file_path: str, colonne: str):
+        """
+        Crée un index SQLite sur la valeur normalisée d'une colonne.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+            colonne (str): La colonne à indexer.
+        """
+        with self._verrou, self._connexion:
+            table = self._table(file_path)
+            if table is None or colonne not in table[1]:
+                return
+            nom_table = table[0]
+            self._connexion.execute(
+                "CREATE INDEX IF NOT EXISTS "
+                f"{self._identifiant(nom_table + '_' + self._nom_table(colonne))} "
+                f"ON {self._identifiant(nom_table)} "
+                f"(UPPER(TRIM({self._identifiant(colonne)})))"
+            )
+
+    def lire_par_cle(self, file_path: str, colonne: str, valeur: str) -> list:
+        """
+        Retourne les lignes dont la colonne vaut la valeur donnée, en ignorant
+        la casse et les espaces autour.
+
+        Args:
+            file_path (str): Le chemin du fichier CSV d'origine.
+            colonne (str): La colonne de recherche.
+            valeur (str): La valeur recherchée.
+
+        Returns:
+            list: Les lignes correspondantes, dans l'ordre d'insertion.
+        """
+        with self._verrou:
+            table = self._table(file_path)
+            if table is None or colonne not in table[1]:
+                return []
+            nom_table, en_tetes = table
+            lignes = self._connexion.execute(
+                f"SELECT {', '.join(self._identifiant(c) for c in en_tetes)} "
+                f"FROM {self._identifiant(nom_table)} "
+                f"WHERE UPPER(TRIM({self._identifiant(colonne)})) = ? ORDER BY rowid",
+                ((valeur or "").strip().upper(),),
+            ).fetchall()
+        return [
+            {c: "" if v is None else v for c, v in zip(en_tetes, valeurs)}
+            for valeurs in lignes
+        ]
+
+    def cache_stats(self) -> dict:
+        """SQLite gère son propre cache de pages : aucun compteur applicatif."""
+        return {"hits": 0, "misses": 0, "fichiers": 0}
+
+    def invalider_cache(self, file_path: str = None):
+        """SQLite gère son propre cache de pages : rien à invalider."""
+
+    def importer_csv(self, chemin_fichier: str, csv_manager: CSVManager = None) -> int:
+        """
+        Importe le contenu d'un fichier CSV dans la base, en remplaçant les
+        données déjà importées pour ce fichier. Le fichier est lu par lots.
+
+        Args:
+            chemin_fichier (str): Le chemin du fichier CSV à importer.
+            csv_manager (CSVManager, optional): Le gestionnaire utilisé pour lire
+            le fichier (le journal des mutations éventuel est rejoué).
+
+        Returns:
+            int: Le nombre de lignes importées.
+        """
+        csv_manager = csv_manager or CSVManager()
+        lignes = csv_manager.iter_csv(chemin_fichier)
+        premiere = next(lignes, None)
+        if premiere is None:
+            return 0
+        nombre = 0
+        with self._verrou, self._connexion:
+            nom_table, colonnes = self._assurer_table(chemin_fichier, premiere.keys())
+            self._connexion.execute(f"DELETE FROM {self._identifiant(nom_table)}")
+            lot = [premiere]
+            for ligne in lignes:
+                lot.append(ligne)
+                if len(lot) >= TAILLE_LOT:
+                    self._inserer(nom_table, colonnes, lot)
+                    nombre += len(lot)
+                    lot = []
+            self._inserer(nom_table, colonnes, lot)
+            nombre += len(lot)
+        return nombre
+
+
+def creer_stockage(type_stockage: str):
+    """
+    Retourne le gestionnaire de stockage correspondant à la configuration.
+
+    Args:
+        type_stockage (str): "csv" ou "sqlite".
+
+    Returns:
+        CSVManager ou SQLiteManager: Le gestionnaire de stockage.
+
+    Raises:
+        ValueError: Si le type de stockage n'est pas reconnu.
+    """
+    if type_stockage == "csv":
+        return CSVManager()
+    if type_stockage == "sqlite":
+        return SQLiteManager(FICHIER_SQLITE)
+    raise ValueError(f"Type de stockage inconnu : {type_stockage}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Importe les fichiers CSV de l'application dans la base SQLite."
+    )
+    parser.add_argument(
+        "fichiers",
+        nargs="*",
+        default=sorted(glob.glob("datas/inputs_csv/**/*.csv", recursive=True)),
+        help="Fichiers CSV à importer (par défaut : datas/inputs_csv/**/*.csv)",
+    )
+    parser.add_argument("--base", default=FICHIER_SQLITE, help="Base SQLite cible")
+    arguments = parser.parse_args()
+
+    stockage = SQLiteManager(arguments.base)
+    for fichier in arguments.fichiers:
+        print(f"{fichier} : {stockage.importer_csv(fichier)} lignes importées")
+    stockage.fermer()
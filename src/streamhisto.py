@@ -3,14 +3,19 @@ import pandas as pd
 import matplotlib.pyplot as plt
 
 # Import de votre manager et constantes
-from csv_manager import CSVManager
+import os
+
+from devis_manager import DevisManager
 from histogramme_manager import HistogrammeManager
-from constants import FICHIER_CLIENTS, FICHIER_DEVIS
+from pdf_manager import PDFManager
+from constants import FICHIER_CLIENTS, FICHIER_DEVIS, STOCKAGE
+from sqlite_manager import creer_stockage
 
 
-# 1) Instanciation des outils CSVManager et HistogrammeManager
-csv_manager = CSVManager()
+# 1) Instanciation du stockage (CSV ou SQLite) et du HistogrammeManager
+csv_manager = creer_stockage(os.getenv("STOCKAGE", STOCKAGE))
 histogram_manager = HistogrammeManager(csv_manager)
+pdf_manager = PDFManager(csv_manager)
 
 
 # 2) Titre de l'application
@@ -40,13 +45,17 @@ if st.button("Générer l'histogramme des devis"):
 st.header("Diagramme en barres - Clients par département")
 
 if st.button("Générer le diagramme des clients"):
-    # Lecture du fichier "clients.csv" (adaptez le chemin si besoin)
-    try:
-        df_clients = pd.read_csv(FICHIER_CLIENTS, sep=",", encoding="utf-8")
-    except FileNotFoundError:
+    # Lecture des clients via le CSVManager (qui rejoue le journal des mutations)
+    clients = csv_manager.read_csv(FICHIER_CLIENTS)
+    if not clients:
         st.error("Le fichier 'clients.csv' est introuvable.")
     else:
-        # 1) Nettoyage : on enlève les lignes sans code postal
+        df_clients = pd.DataFrame(clients)
+        # 1) Nettoyage : on enlève les lignes sans code postal (les valeurs
+        # lues du CSV sont des chaînes : un code absent est une chaîne vide)
+        df_clients["Code Postal"] = (
+            df_clients["Code Postal"].str.strip().replace("", pd.NA)
+        )
         df_clients = df_clients.dropna(subset=["Code Postal"])
 
         # 2) Convertir en chaîne de caractères et extraire les 2 premiers chiffres
@@ -68,3 +77,38 @@ if st.button("Générer le diagramme des clients"):
 
         # 6) Affichage dans Streamlit
         st.pyplot(fig)
+
+
+# =====================================================================
+# PARTIE C : Téléchargement des devis en PDF
+# =====================================================================
+st.header("Devis en PDF")
+
+nom_client = st.text_input("Nom du client")
+if nom_client:
+    devis_client = DevisManager(csv_manager).lister_devis_client(nom_client)
+    if not devis_client:
+        st.info("Aucun devis pour ce client.")
+    else:
+        devis = st.selectbox(
+            "Devis",
+            devis_client,
+            format_func=lambda d: f"{d['Date']} - {d['Métal']} - {d['Prix Total']} €",
+        )
+        # Le PDF est généré en mémoire et envoyé tel quel, sans fichier sur le disque
+        st.download_button(
+            "Télécharger le PDF",
+            data=pdf_manager.rendre_pdf(devis),
+            file_name=os.path.basename(pdf_manager.chemin_pdf(devis)),
+            mime="application/pdf",
+        )
+        # Relevé de tous les devis du client, écrit page par page sur le disque
+        if st.button("Générer le relevé des devis"):
+            chemin_releve = pdf_manager.generer_releve(nom_client)
+            with open(chemin_releve, "rb") as releve:
+                st.download_button(
+                    "Télécharger le relevé",
+                    data=releve,
+                    file_name=os.path.basename(chemin_releve),
+                    mime="application/pdf",
+                )